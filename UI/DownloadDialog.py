@@ -1,12 +1,13 @@
 # UI/DownloadDialog.py 
-import subprocess
-from PyQt6.QtWidgets import QDialog, QVBoxLayout, QProgressBar, QPushButton, QMessageBox
-from PyQt6.QtCore import QTimer, QThread, pyqtSignal
+import threading
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QProgressBar, QPushButton, QMessageBox, QLabel
+from PyQt6.QtCore import QThread, pyqtSignal
 from PyQt6.QtGui import QIcon
 
 class Worker(QThread):
     finished = pyqtSignal(bool)
     error = pyqtSignal(Exception)
+    progress = pyqtSignal(object, object, str)  # 已下載位元組, 總位元組, 狀態（位元組數可能超過 int32）
 
     def __init__(self, fn, *args, **kwargs):
         super().__init__()
@@ -30,6 +31,7 @@ class DownloadDialog(QDialog):
         self.ollama_client = ollama_client
         self.model_name = model_name
         self.completed = False
+        self.cancel_event = threading.Event()
 
         self.init_ui()
         self.start_download()
@@ -38,9 +40,12 @@ class DownloadDialog(QDialog):
         # 佈局
         layout = QVBoxLayout()
 
-        # 進度條
+        # 狀態與進度（來自 Ollama /api/pull 的實際下載位元組數）
+        self.status_label = QLabel("準備下載...")
+        layout.addWidget(self.status_label)
+
         self.progress_bar = QProgressBar(self)
-        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setRange(0, 1000)
         self.progress_bar.setValue(0)
         layout.addWidget(self.progress_bar)
 
@@ -51,33 +56,32 @@ class DownloadDialog(QDialog):
 
         self.setLayout(layout)
 
-        # 定時器模擬進度（若有真實進度可替換）
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_progress)
-        self.timer.start(100)  # 每 100 毫秒更新一次
-
     def start_download(self):
         # 在工作執行緒中啟動下載
-        self.worker = Worker(self.ollama_client.pull_model, self.model_name)
+        self.worker = Worker(self.ollama_client.pull_model, self.model_name, cancel_event=self.cancel_event)
+        self.worker.kwargs["on_progress"] = self.worker.progress.emit
+        self.worker.progress.connect(self.update_progress)
         self.worker.finished.connect(self.on_download_finished)
         self.worker.error.connect(self.on_download_error)
         self.worker.start()
 
-    def update_progress(self):
-        """模擬進度更新，若 ollama 提供真實進度可替換此邏輯"""
-        if self.completed:
-            self.timer.stop()
-            self.accept()  # 下載完成後關閉對話框
-            return
-        current_value = self.progress_bar.value()
-        if current_value < 95:  # 保持低於 100，直到完成
-            self.progress_bar.setValue(current_value + 1)
+    def update_progress(self, completed, total, status):
+        if total:
+            self.progress_bar.setValue(int(completed * 1000 / total))
+            self.status_label.setText(f"{status}：{completed / 2**20:.1f} / {total / 2**20:.1f} MB")
+        else:
+            self.status_label.setText(status)
 
     def on_download_finished(self, success):
         self.completed = True
-        self.progress_bar.setValue(100)
-        if not success:
+        self.worker.wait(5000)
+        if success:
+            self.progress_bar.setValue(1000)
+            self.accept()  # 下載完成後關閉對話框
+            return
+        if not self.cancel_event.is_set():
             QMessageBox.warning(self, "下載失敗", f"無法下載模型 {self.model_name}。")
+        self.reject()
 
     def on_download_error(self, error):
         self.completed = True
@@ -85,6 +89,14 @@ class DownloadDialog(QDialog):
         QMessageBox.critical(self, "錯誤", f"下載模型時發生錯誤: {str(error)}")
         self.reject()
 
+    def reject(self):
+        # 取消時中止串流並等待工作執行緒結束，避免對話框關閉後執行緒仍在執行
+        self.cancel_event.set()
+        if self.worker.isRunning():
+            self.status_label.setText("正在取消...")
+            self.worker.wait(5000)
+        super().reject()
+
 if __name__ == "__main__":
     from PyQt6.QtWidgets import QApplication
     import sys
@@ -93,4 +105,4 @@ if __name__ == "__main__":
     client = OllamaClient()
     dialog = DownloadDialog("test-model", client)
     dialog.exec()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
\ No newline at end of file
@@ -1,9 +1,17 @@
 # UI/FileListWidget.py
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QListWidget, QListWidgetItem, QLabel, QFileDialog, QMessageBox
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QListWidget, QListWidgetItem, QLabel, QFileDialog, QMessageBox, QSpinBox, QCheckBox
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from function.SpeechTranslator import SpeechTranslator
-from function.ollama_client import OllamaClient
+from function.ollama_client import OllamaClient, AsyncOllamaClient
+from function.parallel_transcriber import ParallelTranscriber
+from function.stage_pipeline import StagePipeline
+from function.audio_prefetch import AudioPrefetcher
+from function.metrics import get_metrics
+from function.transcript import Transcript
+import asyncio
 import os
+import threading
+import time
 
 class BatchProcessor(QThread):
     progress = pyqtSignal(int, str)
@@ -11,29 +19,106 @@ class BatchProcessor(QThread):
     result = pyqtSignal(str, str, object)
     error = pyqtSignal(str, str, Exception)
 
-    def __init__(self, files, fn, result_key, extra_args_func=None):
+    def __init__(self, files, fn, result_key, extra_args_func=None, parallel=None):
         super().__init__()
         self.files = files
         self.fn = fn
         self.result_key = result_key
         self.extra_args_func = extra_args_func
+        self.parallel = parallel
         self.is_running = True
 
     def run(self):
+        if self.parallel:
+            self.run_parallel()
+        else:
+            self.run_sequential()
+        self.finished.emit()
+
+    def run_parallel(self):
+        # 由多個工作程序同時辨識，結果依檔案列表順序送回；每個檔案的耗時為送出到取得結果的時間
+        started = {}
+
+        def on_start(index, file_path):
+            started[index] = time.perf_counter()
+            self.progress.emit(index, file_path)
+
+        for i, file_path, result, error in self.parallel.transcribe_files(self.files, on_start):
+            get_metrics().record("batch_item", time.perf_counter() - started.pop(i), stage=self.result_key,
+                                 file=os.path.basename(file_path), workers=self.parallel.workers,
+                                 status="ok" if error is None else "error")
+            if error is None:
+                self.result.emit(file_path, self.result_key, result)
+            else:
+                self.error.emit(file_path, self.result_key, error)
+
+    def run_sequential(self):
         for i, file_path in enumerate(self.files, 1):
             if not self.is_running:
                 break
             self.progress.emit(i, file_path)
             try:
                 args = [file_path] if self.result_key == "transcription" else [self.extra_args_func(file_path)] + ([] if not self.extra_args_func else self.extra_args_func(file_path)[1:])
-                result = self.fn(*args)
+                with get_metrics().timer("batch_item", stage=self.result_key, file=os.path.basename(file_path)):
+                    result = self.fn(*args)
                 self.result.emit(file_path, self.result_key, result)
             except Exception as e:
                 self.error.emit(file_path, self.result_key, e)
+
+    def stop(self):
+        self.is_running = False
+        if self.parallel:
+            self.parallel.stop()
+
+class PipelineProcessor(BatchProcessor):
+    """以 StagePipeline 讓轉換、翻譯、總結重疊進行，結果沿用 BatchProcessor 的訊號送回"""
+
+    def __init__(self, files, pipeline):
+        super().__init__(files, None, "pipeline")
+        self.pipeline = pipeline
+
+    def run(self):
+        self.pipeline.run(self.files, on_start=self.progress.emit, on_result=self.result.emit, on_error=self.error.emit)
         self.finished.emit()
 
     def stop(self):
         self.is_running = False
+        self.pipeline.stop()
+
+class SummaryBatchProcessor(BatchProcessor):
+    """以 AsyncOllamaClient 同時送出所有檔案的總結請求，結果依完成順序送回"""
+
+    def __init__(self, files, client, texts, model_name):
+        super().__init__(files, None, "summary")
+        self.client = client
+        self.texts = texts
+        self.model_name = model_name
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        # 先載入模型再同時送出請求，避免所有請求一起等待模型載入而逾時
+        self.client.warm_up(self.model_name)
+        asyncio.run(self.run_async())
+        self.finished.emit()
+
+    async def run_async(self):
+        items = [(file_path, self.texts.get(file_path, "")) for file_path in self.files]
+        completed = 0
+        start = time.perf_counter()
+        async for file_path, summary, error in self.client.summarize_many(items, self.model_name, self.cancel_event):
+            completed += 1
+            # 所有請求同時送出，耗時為批次開始到此檔案完成的時間
+            get_metrics().record("batch_item", time.perf_counter() - start, stage=self.result_key,
+                                 file=os.path.basename(file_path), status="ok" if error is None else "error")
+            self.progress.emit(completed, file_path)
+            if error is None:
+                self.result.emit(file_path, self.result_key, summary)
+            else:
+                self.error.emit(file_path, self.result_key, error)
+
+    def stop(self):
+        self.is_running = False
+        self.cancel_event.set()
 
 class FileListWidget(QWidget):
     def __init__(self, parent=None):
@@ -41,8 +126,11 @@ class FileListWidget(QWidget):
         self.parent = parent
         self.speech_translator = None
         self.ollama_client = OllamaClient(preferred_model="deepseek-r1:14b")
+        self.async_ollama_client = AsyncOllamaClient(preferred_model="deepseek-r1:14b")
         self.file_paths = []
         self.batch_processor = None
+        self.prefetcher = None
+        self.pinned_summary_model = None
         self.init_ui()
 
     def init_ui(self):
@@ -65,6 +153,19 @@ class FileListWidget(QWidget):
         layout.addLayout(file_buttons)
 
         batch_buttons = QVBoxLayout()
+        workers_layout = QHBoxLayout()
+        self.workers_label = QLabel("並行轉換數:")
+        workers_layout.addWidget(self.workers_label)
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.workers_spin.setValue(1)
+        self.workers_spin.setToolTip("大於 1 時以多個程序平行轉換，每個程序各自載入一份 Whisper 模型")
+        workers_layout.addWidget(self.workers_spin)
+        self.pin_model_checkbox = QCheckBox("常駐總結模型")
+        self.pin_model_checkbox.setToolTip("批次處理期間讓 Ollama 模型常駐記憶體，不在檔案之間卸載；批次結束後恢復")
+        workers_layout.addWidget(self.pin_model_checkbox)
+        batch_buttons.addLayout(workers_layout)
+
         self.batch_transcribe_button = QPushButton("依序轉換")
         self.batch_transcribe_button.clicked.connect(self.batch_transcribe)
         batch_buttons.addWidget(self.batch_transcribe_button)
@@ -73,10 +174,14 @@ class FileListWidget(QWidget):
         self.batch_translate_button.clicked.connect(self.batch_translate)
         batch_buttons.addWidget(self.batch_translate_button)
 
-        self.batch_summarize_button = QPushButton("依序總結")
+        self.batch_summarize_button = QPushButton("同時總結")
         self.batch_summarize_button.clicked.connect(self.batch_summarize)
         batch_buttons.addWidget(self.batch_summarize_button)
 
+        self.batch_pipeline_button = QPushButton("完整流程（轉換→翻譯/總結）")
+        self.batch_pipeline_button.clicked.connect(self.batch_pipeline)
+        batch_buttons.addWidget(self.batch_pipeline_button)
+
         self.stop_batch_button = QPushButton("停止批次處理")
         self.stop_batch_button.clicked.connect(self.stop_batch)
         self.stop_batch_button.setEnabled(False)
@@ -117,8 +222,20 @@ class FileListWidget(QWidget):
         if not self.file_paths:
             QMessageBox.warning(self, "警告", "請先載入音訊檔案。")
             return
-        self.speech_translator = SpeechTranslator(whisper_model_name=self.parent.processing_widget.model_combo.currentText())
-        self.start_batch(self.speech_translator.speech_to_text, "transcription")
+        if self.batch_processor and self.batch_processor.isRunning():
+            QMessageBox.warning(self, "警告", "已有批次處理任務在執行中。")
+            return
+        model_name = self.parent.processing_widget.model_combo.currentText()
+        precision = self.parent.processing_widget.precision_combo.currentText()
+        asr_backend = self.parent.processing_widget.selected_asr_backend()
+        self.speech_translator = SpeechTranslator(whisper_model_name=model_name, whisper_precision=precision, asr_backend=asr_backend)
+        workers = self.workers_spin.value()
+        if workers > 1:
+            parallel = ParallelTranscriber(model_name, workers=workers, whisper_precision=precision, asr_backend=asr_backend)
+            self.start_batch(self.speech_translator.speech_to_text, "transcription", parallel=parallel)
+        else:
+            # 單一程序轉換時，於背景預先解碼後續檔案，讓 ffmpeg 解碼與辨識重疊
+            self.start_batch(self.start_prefetch().wrap(self.speech_translator.speech_to_text), "transcription")
 
     def batch_translate(self):
         if not self.file_paths or not self.speech_translator:
@@ -131,23 +248,85 @@ class FileListWidget(QWidget):
         if not self.file_paths:
             QMessageBox.warning(self, "警告", "請先進行語音轉換以提供內容。")
             return
-        self.start_batch(self.ollama_client.generate_summary, "summary", lambda fp: [self.parent.results.get(fp, {}).get("transcription", ""), self.parent.processing_widget.summary_model_combo.currentText()])
+        if self.batch_processor and self.batch_processor.isRunning():
+            QMessageBox.warning(self, "警告", "已有批次處理任務在執行中。")
+            return
+        # 所有檔案的總結請求同時送出（同時進行的數量由 AsyncOllamaClient 限制），先完成的先顯示
+        texts = {fp: self.parent.results.get(fp, {}).get("transcription", "") for fp in self.file_paths}
+        model_name = self.parent.processing_widget.summary_model_combo.currentText()
+        self.pin_summary_model(self.async_ollama_client, model_name, texts.values())
+        self.start_processor(SummaryBatchProcessor(self.file_paths, self.async_ollama_client, texts, model_name), "summary")
 
-    def start_batch(self, fn, result_key, extra_args_func=None):
+    def batch_pipeline(self):
+        if not self.file_paths:
+            QMessageBox.warning(self, "警告", "請先載入音訊檔案。")
+            return
         if self.batch_processor and self.batch_processor.isRunning():
             QMessageBox.warning(self, "警告", "已有批次處理任務在執行中。")
             return
-        self.batch_processor = BatchProcessor(self.file_paths, fn, result_key, extra_args_func)
+        processing_widget = self.parent.processing_widget
+        precision = processing_widget.precision_combo.currentText()
+        self.speech_translator = SpeechTranslator(
+            whisper_model_name=processing_widget.model_combo.currentText(), whisper_precision=precision,
+            asr_backend=processing_widget.selected_asr_backend(),
+        )
+        self.speech_translator.set_translation_params(
+            *processing_widget.selected_translation_langs(), translator_precision=precision
+        )
+        summary_model = processing_widget.summary_model_combo.currentText()
+
+        # 每個檔案轉換完成後立即進入翻譯與總結，三個階段各自在自己的執行緒池中重疊執行
+        # 轉換第一個檔案時即在背景載入總結模型
+        self.pin_summary_model(self.ollama_client, summary_model)
+        self.ollama_client.preload(summary_model)
+        pipeline = StagePipeline(queue_size=4)
+        pipeline.add_stage("transcription", self.start_prefetch().wrap(self.speech_translator.speech_to_text))
+        pipeline.add_stage("translation", self.speech_translator.translate_text, after="transcription")
+        pipeline.add_stage("summary", lambda text: self.ollama_client.generate_summary(text, summary_model), after="transcription", workers=2)
+        self.start_processor(PipelineProcessor(self.file_paths, pipeline), "完整流程")
+
+    def pin_summary_model(self, client, model_name, texts=()):
+        if self.pin_model_checkbox.isChecked():
+            client.pin_model(model_name, list(texts))
+            self.pinned_summary_model = (client, model_name)
+
+    def release_summary_model(self):
+        if self.pinned_summary_model:
+            client, model_name = self.pinned_summary_model
+            self.pinned_summary_model = None
+            threading.Thread(target=client.unpin_model, args=(model_name,), daemon=True).start()
+
+    def start_prefetch(self):
+        self.stop_prefetch()
+        # 已有辨識結果快取的檔案不預先解碼
+        self.prefetcher = AudioPrefetcher(self.file_paths, is_cached=self.speech_translator.has_cached_transcription).start()
+        return self.prefetcher
+
+    def stop_prefetch(self):
+        if self.prefetcher:
+            self.prefetcher.close()
+            self.prefetcher = None
+
+    def start_batch(self, fn, result_key, extra_args_func=None, parallel=None):
+        if self.batch_processor and self.batch_processor.isRunning():
+            QMessageBox.warning(self, "警告", "已有批次處理任務在執行中。")
+            return
+        self.start_processor(BatchProcessor(self.file_paths, fn, result_key, extra_args_func, parallel), result_key)
+
+    def start_processor(self, processor, name):
+        self.batch_processor = processor
         self.batch_processor.progress.connect(self.on_batch_progress)
         self.batch_processor.result.connect(self.on_batch_result)
         self.batch_processor.error.connect(self.on_batch_error)
         self.batch_processor.finished.connect(self.on_batch_finished)
-        self.batch_status_label.setText(f"批次處理狀態：開始 ({result_key})")
+        self.summary_cache_start = self.ollama_client.cache_stats()
+        self.metrics_start = get_metrics().snapshot()
+        self.set_batch_status(f"開始 ({name})")
         self.set_batch_buttons_enabled(False)
         self.batch_processor.start()
 
     def on_batch_progress(self, index, file_path):
-        self.batch_status_label.setText(f"批次處理狀態：處理中 {index}/{len(self.file_paths)}")
+        self.set_batch_status(f"處理中 {index}/{len(self.file_paths)}")
         for i in range(self.file_list.count()):
             item = self.file_list.item(i)
             if item.data(Qt.ItemDataRole.UserRole) == file_path:
@@ -155,7 +334,13 @@ class FileListWidget(QWidget):
                 break
 
     def on_batch_result(self, file_path, result_key, result):
+        if result_key == "transcription" and isinstance(result, str):
+            # 批次轉換只有文字（沒有時間戳記），依句子切成片段，之後單檔編輯再翻譯時只翻譯變動的片段
+            transcript = Transcript.from_text(result)
+            self.parent.results.setdefault(file_path, {})["transcript"] = transcript
+            result = transcript.text()
         self.parent.results.setdefault(file_path, {})[result_key] = result
+        self.set_batch_status(self.batch_status)
         for i in range(self.file_list.count()):
             item = self.file_list.item(i)
             if item.data(Qt.ItemDataRole.UserRole) == file_path:
@@ -166,6 +351,9 @@ class FileListWidget(QWidget):
 
     def on_batch_error(self, file_path, result_key, error):
         self.parent.results.setdefault(file_path, {})[result_key] = f"處理錯誤: {str(error)}"
+        if result_key == "transcription":
+            self.parent.results[file_path].pop("transcript", None)
+        self.set_batch_status(self.batch_status)
         for i in range(self.file_list.count()):
             item = self.file_list.item(i)
             if item.data(Qt.ItemDataRole.UserRole) == file_path:
@@ -175,10 +363,28 @@ class FileListWidget(QWidget):
             self.parent.update_display()
 
     def on_batch_finished(self):
-        self.batch_status_label.setText("批次處理狀態：完成")
+        self.stop_prefetch()
+        self.release_summary_model()
+        self.set_batch_status("完成")
         self.set_batch_buttons_enabled(True)
         self.update_file_list()
 
+    def set_batch_status(self, status):
+        # 批次包含總結時，在狀態後附上本次批次的總結快取命中/未命中次數；
+        # 下一行顯示本次批次的耗時摘要（辨識即時率、翻譯與總結耗時、快取命中、記憶體峰值）
+        self.batch_status = status
+        text = f"批次處理狀態：{status}"
+        if self.batch_processor and self.batch_processor.result_key in ("summary", "pipeline"):
+            stats = self.ollama_client.cache_stats()
+            hits = stats["hits"] - self.summary_cache_start["hits"]
+            misses = stats["misses"] - self.summary_cache_start["misses"]
+            text += f"（總結快取 命中 {hits} / 未命中 {misses}）"
+        if self.batch_processor:
+            summary = get_metrics().format_summary(self.metrics_start)
+            if summary:
+                text += f"\n{summary}"
+        self.batch_status_label.setText(text)
+
     def stop_batch(self):
         if self.batch_processor and self.batch_processor.isRunning():
             self.batch_processor.stop()
@@ -189,12 +395,17 @@ class FileListWidget(QWidget):
         self.batch_transcribe_button.setEnabled(enabled)
         self.batch_translate_button.setEnabled(enabled)
         self.batch_summarize_button.setEnabled(enabled)
+        self.batch_pipeline_button.setEnabled(enabled)
+        self.workers_spin.setEnabled(enabled)
+        self.pin_model_checkbox.setEnabled(enabled)
         self.stop_batch_button.setEnabled(not enabled)
 
     def close(self):
         if self.batch_processor and self.batch_processor.isRunning():
             self.batch_processor.stop()
             self.batch_processor.wait()
+        self.stop_prefetch()
+        self.release_summary_model()
 
     def set_font(self, font):
         self.file_list.setFont(font)
@@ -203,5 +414,9 @@ class FileListWidget(QWidget):
         self.batch_transcribe_button.setFont(font)
         self.batch_translate_button.setFont(font)
         self.batch_summarize_button.setFont(font)
+        self.batch_pipeline_button.setFont(font)
         self.stop_batch_button.setFont(font)
-        self.batch_status_label.setFont(font)
\ No newline at end of file
+        self.batch_status_label.setFont(font)
+        self.workers_label.setFont(font)
+        self.workers_spin.setFont(font)
+        self.pin_model_checkbox.setFont(font)
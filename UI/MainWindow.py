@@ -36,6 +36,8 @@ class MainWindow(QMainWindow):
         file_menu = menu_bar.addMenu("檔案")
         file_menu.addAction("儲存語音辨識結果", self.save_transcript)
         file_menu.addAction("儲存翻譯結果", self.save_translation)
+        file_menu.addAction("匯出原文字幕 (SRT/VTT)...", self.export_subtitles)
+        file_menu.addAction("匯出翻譯字幕 (SRT/VTT)...", self.export_translated_subtitles)
         file_menu.addSeparator()
         file_menu.addAction("結束", self.close)
 
@@ -43,6 +45,13 @@ class MainWindow(QMainWindow):
         view_menu.addAction("放大字體 (110%)", self.font_manager.increase_font)
         view_menu.addAction("縮小字體 (90%)", self.font_manager.decrease_font)
         view_menu.addAction("重設字體", self.font_manager.reset_font)
+        view_menu.addSeparator()
+        view_menu.addAction("已載入的模型...", self.show_model_resources)
+
+    def show_model_resources(self):
+        from .ModelResourceDialog import ModelResourceDialog
+        dialog = ModelResourceDialog(self.file_list_widget.ollama_client, self)
+        dialog.show()
 
     def save_transcript(self):
         self.processing_widget.save_transcript()
@@ -50,6 +59,12 @@ class MainWindow(QMainWindow):
     def save_translation(self):
         self.processing_widget.save_translation()
 
+    def export_subtitles(self):
+        self.processing_widget.export_subtitles()
+
+    def export_translated_subtitles(self):
+        self.processing_widget.export_subtitles(translated=True)
+
     def update_display(self):
         self.processing_widget.update_display(self.current_file, self.results.get(self.current_file, {}))
 
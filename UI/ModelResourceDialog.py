@@ -0,0 +1,136 @@
+# UI/ModelResourceDialog.py
+import threading
+import time
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView,
+)
+from PyQt6.QtCore import Qt, QTimer
+from function.metrics import current_rss_bytes
+from function.model_pool import resource_manager
+
+
+def format_bytes(n):
+    return f"{n / 2**30:.2f} GB" if n >= 2**30 else f"{n / 2**20:.0f} MB"
+
+
+def format_idle(seconds):
+    if seconds < 60:
+        return f"閒置 {seconds:.0f} 秒"
+    return f"閒置 {seconds / 60:.0f} 分鐘"
+
+
+class ModelResourceDialog(QDialog):
+    """顯示目前載入的 Whisper、翻譯模型與 Ollama 模型所佔用的記憶體，並可手動卸載閒置的模型"""
+
+    COLUMNS = ["類型", "模型", "權重大小", "載入時增加的記憶體", "狀態", "載入耗時"]
+
+    def __init__(self, ollama_client=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("已載入的模型")
+        self.setMinimumSize(720, 320)
+        self.ollama_client = ollama_client
+        self.ollama_models = []
+        self.ollama_thread = None
+        self.entries = []
+
+        self.init_ui()
+        self.refresh()
+        # 每 2 秒更新一次（閒置時間、背景卸載與 Ollama 模型狀態）
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(2000)
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        self.unload_button = QPushButton("卸載選取的模型")
+        self.unload_button.clicked.connect(self.unload_selected)
+        buttons.addWidget(self.unload_button)
+        self.unload_idle_button = QPushButton("卸載所有閒置模型")
+        self.unload_idle_button.clicked.connect(self.unload_all_idle)
+        buttons.addWidget(self.unload_idle_button)
+        buttons.addStretch()
+        close_button = QPushButton("關閉")
+        close_button.clicked.connect(self.accept)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+    def fetch_ollama_models(self):
+        # 在背景執行緒查詢 Ollama，避免伺服器無回應時阻塞介面
+        if self.ollama_client is None or (self.ollama_thread is not None and self.ollama_thread.is_alive()):
+            return
+
+        def _run():
+            self.ollama_models = self.ollama_client.running_models()
+
+        self.ollama_thread = threading.Thread(target=_run, daemon=True)
+        self.ollama_thread.start()
+
+    def refresh(self):
+        self.fetch_ollama_models()
+        now = time.time()
+        self.entries = sorted(resource_manager.loaded_models(), key=lambda e: (e["pool"], -e["last_used"]))
+        rows = []
+        for entry in self.entries:
+            status = "使用中" if entry["in_use"] else format_idle(now - entry["last_used"])
+            rows.append([
+                "Whisper" if entry["pool"] == "whisper" else "翻譯",
+                " / ".join(str(part) for part in entry["key"]),
+                format_bytes(entry["bytes"]),
+                format_bytes(entry["rss_bytes"]),
+                status,
+                f"{entry['load_seconds']:.1f} 秒",
+            ])
+        for model in self.ollama_models:
+            vram = f"（GPU {format_bytes(model['size_vram'])}）" if model.get("size_vram") else ""
+            rows.append(["Ollama", model["name"], format_bytes(model["size"]) + vram, "（Ollama 程序）", model["status"], ""])
+
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column in (2, 3, 5):
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+        total = resource_manager.total_bytes()
+        budget = f" / 預算 {format_bytes(resource_manager.max_bytes)}" if resource_manager.max_bytes else "（不限制）"
+        idle = resource_manager.idle_timeout
+        idle_text = f"閒置 {idle / 60:.0f} 分鐘後自動卸載" if idle else "不自動卸載閒置模型"
+        ollama_total = sum(model["size"] for model in self.ollama_models)
+        ollama_text = f"｜Ollama {format_bytes(ollama_total)}" if self.ollama_models else ""
+        # 無法取得常駐記憶體的平台（current_rss_bytes 回傳 0）不顯示載入時增加的記憶體
+        rss = current_rss_bytes()
+        self.table.setColumnHidden(3, not rss)
+        rss_text = f"｜本程式常駐記憶體 {format_bytes(rss)}" if rss else ""
+        self.summary_label.setText(
+            f"Whisper 與翻譯模型 {format_bytes(total)}{budget}｜{idle_text}{rss_text}{ollama_text}"
+        )
+
+    def unload_selected(self):
+        for row in sorted({index.row() for index in self.table.selectedIndexes()}):
+            if row < len(self.entries) and not self.entries[row]["in_use"]:
+                resource_manager.unload(self.entries[row]["pool"], self.entries[row]["key"])
+        self.refresh()
+
+    def unload_all_idle(self):
+        for entry in resource_manager.loaded_models():
+            if not entry["in_use"]:
+                resource_manager.unload(entry["pool"], entry["key"])
+        self.refresh()
+
+    def done(self, result):
+        self.timer.stop()
+        super().done(result)
@@ -1,7 +1,15 @@
 # UI/ProcessingWidget.py
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QTextEdit, QFileDialog, QMessageBox
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QTextEdit, QFileDialog, QMessageBox, QCheckBox
 from PyQt6.QtCore import QThread, pyqtSignal, Qt
+import os
+import threading
+from functools import partial
 from function.SpeechTranslator import SpeechTranslator
+from function.asr_backends import BACKENDS, default_backend_name
+from function.model_pool import preload_translation_pipeline
+from function.model_prefetch import get_model_prefetcher
+from function.quantization import PRECISIONS, default_precision
+from function.transcript import Transcript
 from UI.DownloadDialog import DownloadDialog
 
 
@@ -23,13 +31,28 @@ class Worker(QThread):
             self.error.emit(e)
 
 
+class StreamWorker(Worker):
+    """將 partial 訊號的 emit 以關鍵字參數傳給 fn，讓 fn 在執行中逐步送出部分結果"""
+    partial = pyqtSignal(object)
+
+    def __init__(self, fn, *args, stream_kwarg="on_segment", **kwargs):
+        super().__init__(fn, *args, **kwargs)
+        self.kwargs[stream_kwarg] = self.partial.emit
+
+
 class ProcessingWidget(QWidget):
+    prefetch_progress = pyqtSignal(object)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
         self.speech_translator = None  # 延遲初始化
         self.lang_mapping = {"英文": "en", "中文(簡體)": "zh", "中文": "zh", "中文(繁體)": "zh", "法文": "fr", "西班牙文": "es", "德文": "de"}
         self.current_worker = None  # 用於追蹤當前運行中的 Worker
+        self.models_worker = None
+        self.summary_cancel_event = None
+        self.transcript = None  # 目前顯示的辨識結果（function.transcript.Transcript）
+        self.transcription_segments = []  # 串流辨識中收到的片段
         self.init_ui()
 
     def init_ui(self):
@@ -49,12 +72,40 @@ class ProcessingWidget(QWidget):
         layout.addLayout(file_layout)
 
         model_layout = QHBoxLayout()
+        self.backend_label = QLabel("辨識引擎:")
+        model_layout.addWidget(self.backend_label)
+        self.backend_combo = QComboBox()
+        for index, backend in enumerate(BACKENDS.values()):
+            self.backend_combo.addItem(backend.label, backend.name)
+            # 未安裝的引擎顯示但不可選取，提示安裝方式
+            if not backend.is_available():
+                self.backend_combo.model().item(index).setEnabled(False)
+                self.backend_combo.setItemData(index, f"需要安裝 {backend.requires}（pip install {backend.requires}）",
+                                               Qt.ItemDataRole.ToolTipRole)
+        self.backend_combo.setCurrentIndex(self.backend_combo.findData(default_backend_name()))
+        model_layout.addWidget(self.backend_combo)
         self.model_label = QLabel("選擇語音辨識模型:")
         model_layout.addWidget(self.model_label)
         self.model_combo = QComboBox()
-        self.model_combo.addItems(["tiny", "tiny.en", "base", "base.en", "small", "small.en", "medium", "medium.en", "large"])
+        self.model_combo.addItems(BACKENDS[self.selected_asr_backend()].models)
         model_layout.addWidget(self.model_combo)
+        self.backend_combo.currentIndexChanged.connect(self.on_backend_changed)
+        self.precision_label = QLabel("推論精度:")
+        model_layout.addWidget(self.precision_label)
+        self.precision_combo = QComboBox()
+        self.precision_combo.addItems(PRECISIONS)
+        self.precision_combo.setCurrentText(default_precision())
+        self.precision_combo.setToolTip(
+            "int8-dynamic：在 CPU 上將翻譯模型與 Whisper decoder 的 Linear 層量化為 int8，速度較快、記憶體較少，"
+            "結果可能與 fp32 略有差異；第一次使用時轉換並存入快取（使用 GPU 時自動改用 fp32）"
+        )
+        model_layout.addWidget(self.precision_combo)
+        self.long_audio_checkbox = QCheckBox("長音訊模式")
+        self.long_audio_checkbox.setToolTip("以 VAD 略過靜音並將語音區塊平行解碼（程序數沿用左側「並行轉換數」）")
+        model_layout.addWidget(self.long_audio_checkbox)
         layout.addLayout(model_layout)
+        self.prefetch_label = QLabel("")
+        layout.addWidget(self.prefetch_label)
 
         translation_lang_layout = QHBoxLayout()
         self.source_lang_label = QLabel("原文語言:")
@@ -71,6 +122,23 @@ class ProcessingWidget(QWidget):
         translation_lang_layout.addWidget(self.target_lang_label)
         translation_lang_layout.addWidget(self.target_lang_combo)
         layout.addLayout(translation_lang_layout)
+        # 切換語言時於背景預載翻譯 pipeline（設定 VOICEFLOW_PRELOAD_TRANSLATION=0 可關閉）
+        if os.environ.get("VOICEFLOW_PRELOAD_TRANSLATION", "1") != "0":
+            self.source_lang_combo.currentTextChanged.connect(self.preload_translation)
+            self.target_lang_combo.currentTextChanged.connect(self.preload_translation)
+            self.precision_combo.currentTextChanged.connect(self.preload_translation)
+
+        # 使用者選擇模型或語言時於背景預先下載權重（設定 VOICEFLOW_PREFETCH_MODELS=0 可關閉）；
+        # 啟動時不連線，設定 VOICEFLOW_PREFETCH_ON_START=1 才在啟動時下載預設選擇的模型
+        if os.environ.get("VOICEFLOW_PREFETCH_MODELS", "1") != "0":
+            self.prefetch_progress.connect(self.update_prefetch_status)
+            get_model_prefetcher().add_listener(self.prefetch_progress.emit)
+            self.model_combo.textActivated.connect(self.prefetch_whisper)
+            self.source_lang_combo.textActivated.connect(self.prefetch_translation)
+            self.target_lang_combo.textActivated.connect(self.prefetch_translation)
+            if os.environ.get("VOICEFLOW_PREFETCH_ON_START", "0") == "1":
+                self.prefetch_whisper(self.model_combo.currentText())
+                self.prefetch_translation()
 
         self.transcribe_button = QPushButton("語音辨識")
         self.transcribe_button.clicked.connect(self.perform_transcription)
@@ -95,11 +163,24 @@ class ProcessingWidget(QWidget):
         self.summary_model_combo = QComboBox()
         self.load_ollama_models()
         summary_layout.addWidget(self.summary_model_combo)
+        # 使用者選擇總結模型時於背景預先載入（設定 VOICEFLOW_PRELOAD_SUMMARY=0 可關閉）
+        if os.environ.get("VOICEFLOW_PRELOAD_SUMMARY", "1") != "0":
+            self.summary_model_combo.textActivated.connect(self.parent.file_list_widget.ollama_client.preload)
 
         self.summarize_button = QPushButton("總結語音內容")
         self.summarize_button.clicked.connect(self.perform_summarization)
         summary_layout.addWidget(self.summarize_button)
 
+        self.refresh_summary_checkbox = QCheckBox("重新生成")
+        self.refresh_summary_checkbox.setToolTip("略過總結快取，重新向模型請求（單檔與批次總結皆適用）")
+        self.refresh_summary_checkbox.toggled.connect(self.set_summary_cache_bypass)
+        summary_layout.addWidget(self.refresh_summary_checkbox)
+
+        self.stop_summary_button = QPushButton("停止總結")
+        self.stop_summary_button.setEnabled(False)
+        self.stop_summary_button.clicked.connect(self.stop_summarization)
+        summary_layout.addWidget(self.stop_summary_button)
+
         self.translate_summary_button = QPushButton("翻譯總結")
         self.translate_summary_button.clicked.connect(self.perform_summary_translation)
         summary_layout.addWidget(self.translate_summary_button)
@@ -110,9 +191,49 @@ class ProcessingWidget(QWidget):
         layout.addWidget(self.summary_text_edit)
 
     def load_ollama_models(self):
-        models = self.parent.file_list_widget.ollama_client.check_available_models()
+        # 先顯示預設模型，再於背景查詢本地模型清單，避免阻塞視窗建立
+        if not self.summary_model_combo.count():
+            self.summary_model_combo.addItems(sorted(self.parent.file_list_widget.ollama_client.PREDEFINED_MODELS))
+        self.models_worker = Worker(self.parent.file_list_widget.ollama_client.check_available_models)
+        self.models_worker.finished.connect(self.on_models_loaded)
+        self.models_worker.start()
+
+    def on_models_loaded(self, models):
+        current = self.summary_model_combo.currentText()
         self.summary_model_combo.clear()
         self.summary_model_combo.addItems(models)
+        if current in models:
+            self.summary_model_combo.setCurrentText(current)
+
+    def selected_asr_backend(self):
+        return self.backend_combo.currentData()
+
+    def on_backend_changed(self):
+        # 各引擎可用的模型不同，切換時更新模型清單並盡量保留目前選擇的模型
+        current = self.model_combo.currentText()
+        self.model_combo.clear()
+        self.model_combo.addItems(BACKENDS[self.selected_asr_backend()].models)
+        if self.model_combo.findText(current) >= 0:
+            self.model_combo.setCurrentText(current)
+
+    def prefetch_whisper(self, model_name):
+        # 只有 openai-whisper 的權重由 model_prefetch 下載，其他引擎在載入時自行下載
+        if self.selected_asr_backend() == "whisper":
+            get_model_prefetcher().prefetch_whisper(model_name)
+
+    def prefetch_translation(self, *_):
+        source_lang, target_lang, _ = self.selected_translation_langs()
+        if source_lang != target_lang:
+            get_model_prefetcher().prefetch_translation(source_lang, target_lang)
+
+    def update_prefetch_status(self, job):
+        if not job.done.is_set():
+            progress = f" {job.fraction:.0%}" if job.total else ""
+            self.prefetch_label.setText(f"模型下載中：{job.description}{progress}")
+        elif job.error is not None:
+            self.prefetch_label.setText(f"模型下載失敗：{job.description}（使用時將重新嘗試）")
+        else:
+            self.prefetch_label.setText("")
 
     def perform_transcription(self):
         if self.current_worker and self.current_worker.isRunning():
@@ -123,8 +244,21 @@ class ProcessingWidget(QWidget):
             self.transcription_text_edit.setPlainText("請先選擇或拖曳一個音訊檔案。")
             return
         self.transcription_text_edit.setPlainText("正在載入語音辨識模型...")
-        self.speech_translator = SpeechTranslator(whisper_model_name=self.model_combo.currentText())
-        self.run_worker(self.speech_translator.speech_to_text, file_path, result_key="transcription", process_name="語音辨識")
+        self.speech_translator = SpeechTranslator(
+            whisper_model_name=self.model_combo.currentText(), whisper_precision=self.precision_combo.currentText(),
+            asr_backend=self.selected_asr_backend(),
+        )
+        transcribe = self.speech_translator.speech_to_text
+        if self.long_audio_checkbox.isChecked():
+            transcribe = partial(transcribe, long_audio=True, workers=self.parent.file_list_widget.workers_spin.value())
+        # 串流辨識：每解碼出一個片段就附加到辨識結果欄位（每個片段一行）
+        self.transcription_segments = []
+        self.run_worker(transcribe, file_path, result_key="transcription", process_name="語音辨識",
+                        on_partial=self.collect_segment)
+
+    def collect_segment(self, segment):
+        self.transcription_segments.append(segment)
+        return segment["text"].strip() + "\n"
 
     def perform_translation(self):
         if self.current_worker and self.current_worker.isRunning():
@@ -144,7 +278,31 @@ class ProcessingWidget(QWidget):
             self.translation_text_edit.setPlainText("沒有可翻譯的文字。")
             return
         self.set_translation_params()
-        self.run_worker(self.speech_translator.translate_text, text, result_key="translation", process_name="翻譯")
+        # 與上次的片段比對，只重新翻譯編輯過（或尚未翻譯）的片段，其餘沿用先前的譯文
+        transcript = self.current_transcript()
+        transcript.apply_edit(text)
+        self.run_worker(transcript.retranslate, self.speech_translator.translate_segments, self.translation_key(),
+                        result_key="translation", process_name="翻譯")
+
+    def current_transcript(self):
+        """目前的辨識結果；尚未建立時（例如手動輸入的文字）建立空的結果，由 apply_edit 填入片段"""
+        if self.transcript is None:
+            self.transcript = Transcript()
+            if self.parent.current_file:
+                self.parent.results.setdefault(self.parent.current_file, {})["transcript"] = self.transcript
+        return self.transcript
+
+    def show_transcript(self, transcript):
+        self.transcript = transcript
+        text = transcript.text()
+        self.transcription_text_edit.setPlainText(text)
+        if self.parent.current_file:
+            result = self.parent.results.setdefault(self.parent.current_file, {})
+            result["transcript"] = transcript
+            result["transcription"] = text
+
+    def translation_key(self):
+        return (*self.selected_translation_langs(), self.precision_combo.currentText())
 
     def perform_summarization(self):
         if self.current_worker and self.current_worker.isRunning():
@@ -155,7 +313,22 @@ class ProcessingWidget(QWidget):
             self.summary_text_edit.setPlainText("請先進行語音辨識以提供內容。")
             return
         model_name = self.summary_model_combo.currentText()
-        self.run_worker(self.parent.file_list_widget.ollama_client.generate_summary, text, model_name, result_key="summary", process_name="總結")
+        # 串流總結：token 產生後即附加到總結欄位，可隨時按「停止總結」中止
+        self.summary_cancel_event = threading.Event()
+        summarize = partial(self.parent.file_list_widget.ollama_client.generate_summary, cancel_event=self.summary_cancel_event)
+        self.stop_summary_button.setEnabled(True)
+        self.run_worker(summarize, text, model_name, result_key="summary", process_name="總結",
+                        on_partial=lambda token: token, stream_kwarg="on_token")
+
+    def set_summary_cache_bypass(self, bypass):
+        file_list_widget = self.parent.file_list_widget
+        file_list_widget.ollama_client.bypass_cache = bypass
+        file_list_widget.async_ollama_client.bypass_cache = bypass
+
+    def stop_summarization(self):
+        if self.summary_cancel_event is not None:
+            self.summary_cancel_event.set()
+        self.stop_summary_button.setEnabled(False)
 
     def perform_summary_translation(self):
         if self.current_worker and self.current_worker.isRunning():
@@ -177,20 +350,36 @@ class ProcessingWidget(QWidget):
         self.set_translation_params()
         self.run_worker(self.speech_translator.translate_text, text, result_key="summary", process_name="總結翻譯")
 
-    def run_worker(self, fn, *args, result_key, process_name):
+    def run_worker(self, fn, *args, result_key, process_name, on_partial=None, stream_kwarg="on_segment"):
         text_edit = {
             "transcription": self.transcription_text_edit,
             "translation": self.translation_text_edit,
             "summary": self.summary_text_edit
         }[result_key]
         text_edit.setPlainText(f"正在{process_name}...")
-        self.current_worker = Worker(fn, *args)
+        if on_partial:
+            # on_partial 將部分結果轉成要附加的文字；第一次收到時先清除「正在...」提示
+            self.current_worker = StreamWorker(fn, *args, stream_kwarg=stream_kwarg)
+            self._partial_started = False
+            self.current_worker.partial.connect(lambda partial: self.append_partial(text_edit, on_partial(partial)))
+        else:
+            self.current_worker = Worker(fn, *args)
         self.current_worker.finished.connect(lambda result: self.on_finished(result, result_key))
         self.current_worker.error.connect(lambda error: self.on_error(error, result_key))
         self.current_worker.finished.connect(self.clear_worker)  # 清理完成後的 Worker
         self.current_worker.start()
 
+    def append_partial(self, text_edit, text):
+        if not self._partial_started:
+            text_edit.clear()
+            self._partial_started = True
+        cursor = text_edit.textCursor()
+        cursor.movePosition(cursor.MoveOperation.End)
+        cursor.insertText(text)
+
     def on_finished(self, result, result_key):
+        if result_key == "summary":
+            self.stop_summary_button.setEnabled(False)
         text_edit = {
             "transcription": self.transcription_text_edit,
             "translation": self.translation_text_edit,
@@ -214,15 +403,20 @@ class ProcessingWidget(QWidget):
                     text_edit.setPlainText(f"模型 {model_name} 下載失敗，無法進行總結。")
             else:
                 text_edit.setPlainText("請選擇一個已安裝的模型或下載新模型。")
+        elif result_key == "transcription":
+            # 以片段保存辨識結果，之後編輯再翻譯時只翻譯變動的片段，並可匯出字幕
+            segments = self.transcription_segments
+            self.show_transcript(Transcript.from_segments(segments) if segments else Transcript.from_text(result))
+            self.translation_text_edit.clear()
+            self.summary_text_edit.clear()
         else:
             text_edit.setPlainText(result)
             if self.parent.current_file:
                 self.parent.results.setdefault(self.parent.current_file, {})[result_key] = result
-            if result_key == "transcription":
-                self.translation_text_edit.clear()
-                self.summary_text_edit.clear()
 
     def on_error(self, error, result_key):
+        if result_key == "summary":
+            self.stop_summary_button.setEnabled(False)
         text_edit = {
             "transcription": self.transcription_text_edit,
             "translation": self.translation_text_edit,
@@ -239,11 +433,22 @@ class ProcessingWidget(QWidget):
                 target_lang=self.lang_mapping.get(self.target_lang_combo.currentText(), "zh"),
                 target_traditional=self.target_lang_combo.currentText() == "中文(繁體)"
             )
+        source_lang, target_lang, target_traditional = self.selected_translation_langs()
+        self.speech_translator.set_translation_params(
+            source_lang, target_lang, target_traditional, translator_precision=self.precision_combo.currentText()
+        )
+
+    def selected_translation_langs(self):
         source_lang = self.lang_mapping.get(self.source_lang_combo.currentText(), "en")
         target_lang_text = self.target_lang_combo.currentText()
         target_traditional = target_lang_text == "中文(繁體)"
         target_lang = self.lang_mapping.get(target_lang_text, "zh") if target_lang_text in ["中文(繁體)", "中文"] else self.lang_mapping.get(target_lang_text, "en")
-        self.speech_translator.set_translation_params(source_lang, target_lang, target_traditional)
+        return source_lang, target_lang, target_traditional
+
+    def preload_translation(self):
+        source_lang, target_lang, _ = self.selected_translation_langs()
+        if source_lang != target_lang:
+            preload_translation_pipeline(source_lang, target_lang, precision=self.precision_combo.currentText())
 
     def save_transcript(self):
         file_name, _ = QFileDialog.getSaveFileName(self, "儲存語音辨識結果", "", "文字檔案 (*.txt);;所有檔案 (*)")
@@ -257,7 +462,32 @@ class ProcessingWidget(QWidget):
             with open(file_name, "w", encoding="utf-8") as f:
                 f.write(self.translation_text_edit.toPlainText())
 
+    def export_subtitles(self, translated=False):
+        text = self.transcription_text_edit.toPlainText().strip()
+        if not text:
+            QMessageBox.warning(self, "警告", "沒有可匯出的語音辨識結果。")
+            return
+        # 先套用文字框中的編輯，修改過的片段需重新翻譯後才能匯出譯文
+        transcript = self.current_transcript()
+        transcript.apply_edit(text)
+        try:
+            subtitles = {".srt": transcript.to_srt(translated), ".vtt": transcript.to_vtt(translated)}
+        except ValueError as e:
+            QMessageBox.warning(self, "無法匯出字幕", str(e))
+            return
+        title = "匯出翻譯字幕" if translated else "匯出原文字幕"
+        file_name, selected_filter = QFileDialog.getSaveFileName(self, title, "", "SRT 字幕 (*.srt);;WebVTT 字幕 (*.vtt)")
+        if not file_name:
+            return
+        extension = os.path.splitext(file_name)[1].lower()
+        if extension not in subtitles:
+            extension = ".vtt" if selected_filter.startswith("WebVTT") else ".srt"
+            file_name += extension
+        with open(file_name, "w", encoding="utf-8") as f:
+            f.write(subtitles[extension])
+
     def update_display(self, current_file, result):
+        self.transcript = result.get("transcript")
         self.transcription_text_edit.setPlainText(result.get("transcription", ""))
         self.translation_text_edit.setPlainText(result.get("translation", ""))
         self.summary_text_edit.setPlainText(result.get("summary", ""))
@@ -269,7 +499,13 @@ class ProcessingWidget(QWidget):
         self.translate_button.setFont(font)
         self.summarize_button.setFont(font)
         self.translate_summary_button.setFont(font)
+        self.stop_summary_button.setFont(font)
+        self.refresh_summary_checkbox.setFont(font)
         self.model_combo.setFont(font)
+        self.backend_combo.setFont(font)
+        self.backend_label.setFont(font)
+        self.long_audio_checkbox.setFont(font)
+        self.prefetch_label.setFont(font)
         self.source_lang_combo.setFont(font)
         self.target_lang_combo.setFont(font)
         self.summary_model_combo.setFont(font)
@@ -285,7 +521,11 @@ class ProcessingWidget(QWidget):
         self.current_worker = None  # 清理完成的 Worker
 
     def close(self):
+        if self.summary_cancel_event is not None:
+            self.summary_cancel_event.set()
         if self.current_worker and self.current_worker.isRunning():
             self.current_worker.quit()
-            self.current_worker.wait(timeout=5000)  # 設定超時，避免無限等待
-        self.current_worker = None
\ No newline at end of file
+            self.current_worker.wait(5000)  # 設定超時，避免無限等待
+        self.current_worker = None
+        if self.models_worker and self.models_worker.isRunning():
+            self.models_worker.wait(5000)
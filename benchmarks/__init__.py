@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# 可重現的效能量測（python -m benchmarks），以合成音訊、合成語料與本機模擬的 Ollama 伺服器離線執行
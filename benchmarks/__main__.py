@@ -0,0 +1,6 @@
+# benchmarks/__main__.py
+import sys
+from benchmarks.run import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+# benchmarks/ollama_stub.py
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubOllamaServer:
+    """
+    在本機模擬 Ollama HTTP API 的小型伺服器，供測試（tests/）與效能量測離線驗證總結流程與並行效果：
+      - 支援 GET /api/tags、POST /api/chat（串流與非串流）、POST /api/generate（空 prompt 的預載請求）
+        與 POST /api/pull（串流回報逐位元組的下載進度，完成後模型出現在 /api/tags）
+      - 每個請求固定延遲後回覆，可模擬模型生成時間
+      - 可指定前幾個請求回傳 503，驗證重試與退避
+      - 記錄請求數、同時進行中的最大請求數，以及每個請求的 options 與 keep_alive
+    """
+
+    def __init__(self, models=("stub:latest",), latency=0.2, token_delay=0.01, fail_first=0, host="127.0.0.1", port=0,
+                 pull_bytes=4 * 2**20, pull_steps=8):
+        """
+        Args:
+            models (tuple): /api/tags 回報的模型名稱。
+            latency (float): 每個 chat 請求回覆前的延遲（秒）。
+            token_delay (float): 串流回覆時每個 token 之間的延遲（秒）。
+            fail_first (int): 前幾個 chat 請求回傳 HTTP 503。
+            host (str): 監聽位址。
+            port (int): 監聽埠號；0 表示由系統指定。
+            pull_bytes (int): /api/pull 模擬下載的模型大小（位元組）。
+            pull_steps (int): /api/pull 回報進度的次數。
+        """
+        self.models = list(models)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.fail_first = fail_first
+        self.pull_bytes = pull_bytes
+        self.pull_steps = pull_steps
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []  # (path, model, options, keep_alive)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def latency_for(self, prompt):
+        """回覆 prompt 前的延遲（秒）；子類別可依內容改變，模擬長短不一的生成時間"""
+        return self.latency
+
+    def reply_for(self, prompt):
+        """依 prompt 產生固定格式的回覆，方便比對結果屬於哪個請求"""
+        return f"摘要：{prompt.strip().splitlines()[-1][:40]}"
+
+    def _enter(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return self.requests
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, obj, status=200):
+                body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_chunk(self, obj):
+                line = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+
+            def _read_json(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": m, "model": m} for m in stub.models]})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def _pull(self, model):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                self._send_chunk({"status": "pulling manifest"})
+                digest = "sha256:" + "0" * 64
+                for step in range(1, stub.pull_steps + 1):
+                    completed = stub.pull_bytes * step // stub.pull_steps
+                    self._send_chunk({"status": f"pulling {digest[7:19]}", "digest": digest, "total": stub.pull_bytes, "completed": completed})
+                    time.sleep(stub.token_delay)
+                for status in ("verifying sha256 digest", "writing manifest", "success"):
+                    self._send_chunk({"status": status})
+                self.wfile.write(b"0\r\n\r\n")
+                with stub._lock:
+                    if model not in stub.models:
+                        stub.models.append(model)
+
+            def do_POST(self):
+                body = self._read_json()
+                with stub._lock:
+                    stub.calls.append((self.path, body.get("model"), body.get("options"), body.get("keep_alive")))
+                if self.path == "/api/generate":
+                    self._send_json({"model": body.get("model"), "response": "", "done": True})
+                    return
+                if self.path == "/api/pull":
+                    try:
+                        self._pull(body.get("model") or body.get("name"))
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+                    return
+                if self.path != "/api/chat":
+                    self._send_json({"error": "not found"}, 404)
+                    return
+                number = stub._enter()
+                try:
+                    if number <= stub.fail_first:
+                        self._send_json({"error": "server busy"}, 503)
+                        return
+                    messages = body.get("messages") or [{"content": ""}]
+                    time.sleep(stub.latency_for(messages[-1].get("content", "")))
+                    reply = stub.reply_for(messages[-1].get("content", ""))
+                    model = body.get("model")
+                    if not body.get("stream", True):
+                        self._send_json({"model": model, "message": {"role": "assistant", "content": reply}, "done": True})
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for token in reply:
+                        self._send_chunk({"model": model, "message": {"role": "assistant", "content": token}, "done": False})
+                        time.sleep(stub.token_delay)
+                    self._send_chunk({"model": model, "message": {"role": "assistant", "content": ""}, "done": True, "eval_count": len(reply)})
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    stub._leave()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    # 比較依序總結與 AsyncOllamaClient 並行總結所需時間（python -m benchmarks.ollama_stub）
+    from function.ollama_client import AsyncOllamaClient, OllamaClient
+
+    texts = [(f"file{i}.mp3", f"第 {i} 個檔案的語音內容。") for i in range(8)]
+    with StubOllamaServer(latency=0.5) as server:
+        client = OllamaClient(preferred_model="stub:latest", use_cache=False, host=server.url)
+        start = time.perf_counter()
+        for _, text in texts:
+            client.generate_summary(text)
+        print(f"依序總結 {len(texts)} 個檔案: {time.perf_counter() - start:.2f} 秒")
+
+        server.fail_first = server.requests + 1  # 並行時第一個請求失敗，驗證重試
+        server.max_in_flight = 0
+        async_client = AsyncOllamaClient(preferred_model="stub:latest", use_cache=False, host=server.url, max_in_flight=4, backoff=0.1)
+        start = time.perf_counter()
+        async_client.summarize_all(texts, on_result=lambda key, summary, error: print(f"  {key}: {summary or error}"))
+        print(f"並行總結 {len(texts)} 個檔案: {time.perf_counter() - start:.2f} 秒，伺服器同時處理最多 {server.max_in_flight} 個請求")
@@ -0,0 +1,255 @@
+# benchmarks/precision_report.py
+import argparse
+import datetime
+import difflib
+import json
+import sys
+import tempfile
+from types import SimpleNamespace
+
+from benchmarks.fixtures import make_corpus, make_speech_audio
+from benchmarks.run import collect_meta, format_metrics, load_translation, load_whisper, run_isolated
+from function.asr_backends import DEFAULT_BACKEND
+from function.quantization import FP32, INT8_DYNAMIC, PRECISIONS
+
+# 報告中的速度與記憶體比較列：(標題, 量測, 指標)
+SPEED_ROWS = [
+    ("Whisper 權重 (MB)", "load_whisper", "weights_mb"),
+    ("Whisper 載入 (秒)", "load_whisper", "load_seconds"),
+    ("Whisper 量化轉換 (秒，僅第一次)", "load_whisper", "convert_seconds"),
+    ("語音辨識 (秒)", "asr", "seconds"),
+    ("語音辨識即時率", "asr", "rtf"),
+    ("語音辨識記憶體峰值 (MB)", "asr", "peak_rss_mb"),
+    ("翻譯模型權重 (MB)", "load_translation", "weights_mb"),
+    ("翻譯模型載入 (秒)", "load_translation", "load_seconds"),
+    ("翻譯模型量化轉換 (秒，僅第一次)", "load_translation", "convert_seconds"),
+    ("翻譯 (秒)", "translate", "seconds"),
+    ("翻譯速度 (句/秒)", "translate", "sentences_per_second"),
+    ("翻譯記憶體峰值 (MB)", "translate", "peak_rss_mb"),
+]
+ACCURACY_LABELS = {
+    "top1_agreement": "逐 token 預測一致率（teacher forcing）",
+    "logits_relative_error": "logits 相對誤差",
+    "greedy_agreement": "greedy 解碼 token 一致率",
+    "word_error_rate": "辨識結果 WER（以 fp32 為參考）",
+    "exact_match": "譯文完全相同的比例",
+    "char_similarity": "譯文平均字元相似度",
+}
+
+
+def word_error_rate(reference, hypothesis):
+    """以字詞為單位的編輯距離除以參考文字的字數"""
+    ref, hyp = reference.split(), hypothesis.split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def compare_logits(reference, quantized):
+    """比較同一輸入下 fp32 與量化模型的 logits：top-1 一致率與相對誤差"""
+    agreement = (reference.argmax(-1) == quantized.argmax(-1)).float().mean().item()
+    error = ((reference - quantized).norm() / reference.norm()).item()
+    return {"top1_agreement": round(agreement, 4), "logits_relative_error": round(error, 4)}
+
+
+def token_agreement(reference, candidate):
+    """兩個 token 序列在相同位置相同的比例（以較長者為分母）"""
+    same = sum(1 for a, b in zip(reference, candidate) if a == b)
+    return round(same / max(1, len(reference), len(candidate)), 4)
+
+
+def whisper_accuracy(mode, model_name, audio_file=None, max_tokens=64):
+    """
+    比較 fp32 與 int8-dynamic Whisper 的輸出：兩者使用相同的 encoder 輸出，
+    以 fp32 greedy 解碼的 token 做 teacher forcing 比較 decoder logits，並各自 greedy 解碼比較 token；
+    real 模式且指定音訊檔時另外比較完整辨識結果的 WER
+
+    Returns:
+        dict: 各項一致性指標。
+    """
+    import torch
+    import whisper
+    from whisper.decoding import DecodingOptions
+    reference = load_whisper(mode, model_name, FP32)
+    quantized = load_whisper(mode, model_name, INT8_DYNAMIC)
+    audio = whisper.load_audio(audio_file) if audio_file else make_speech_audio(30)
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio)).unsqueeze(0)
+    options = DecodingOptions(fp16=False, without_timestamps=True, sample_len=max_tokens,
+                              language=None if reference.is_multilingual else "en")
+    with torch.no_grad():
+        decoded = whisper.decode(reference, mel, options)[0]
+        decoded_int8 = whisper.decode(quantized, mel, options)[0]
+        tokenizer = whisper.tokenizer.get_tokenizer(reference.is_multilingual, num_languages=reference.num_languages,
+                                                    language=decoded.language, task="transcribe")
+        tokens = torch.tensor([list(tokenizer.sot_sequence_including_notimestamps) + decoded.tokens])
+        features = reference.embed_audio(mel)
+        metrics = compare_logits(reference.logits(tokens, features), quantized.logits(tokens, features))
+    metrics["greedy_agreement"] = token_agreement(decoded.tokens, decoded_int8.tokens)
+    if mode == "real" and audio_file:
+        text = reference.transcribe(audio_file, fp16=False)["text"]
+        metrics["word_error_rate"] = round(word_error_rate(text, quantized.transcribe(audio_file, fp16=False)["text"]), 4)
+    return metrics
+
+
+def translation_accuracy(mode, n_sentences, source_lang="en", target_lang="zh"):
+    """
+    比較 fp32 與 int8-dynamic 翻譯模型的輸出：以 fp32 greedy 解碼的 token 做 teacher forcing 比較 logits，
+    並比較兩者各自 greedy 解碼的 token；real 模式另外比較 pipeline 產生的譯文
+
+    Returns:
+        dict: 各項一致性指標。
+    """
+    import torch
+    from benchmarks.synthetic import SyntheticTranslationPipeline
+    reference = load_translation(mode, source_lang, target_lang, FP32)
+    quantized = load_translation(mode, source_lang, target_lang, INT8_DYNAMIC)
+    from function.SpeechTranslator import SpeechTranslator
+    sentences = SpeechTranslator.split_into_sentences(make_corpus(n_sentences, repeat_ratio=0))
+    if isinstance(reference, SyntheticTranslationPipeline):
+        ids = reference.tokenizer(sentences)["input_ids"]
+        longest = max(len(row) for row in ids)
+        input_ids = torch.tensor([row + [reference.pad_token_id] * (longest - len(row)) for row in ids])
+        inputs = {"input_ids": input_ids, "attention_mask": (input_ids != reference.pad_token_id).long()}
+    else:
+        inputs = reference.tokenizer(sentences, return_tensors="pt", padding=True, truncation=True)
+    generate = dict(num_beams=1, do_sample=False, max_new_tokens=64)
+    with torch.no_grad():
+        output = reference.model.generate(**inputs, **generate)
+        output_int8 = quantized.model.generate(**inputs, **generate)
+        metrics = compare_logits(
+            reference.model(**inputs, decoder_input_ids=output).logits,
+            quantized.model(**inputs, decoder_input_ids=output).logits,
+        )
+    metrics["greedy_agreement"] = round(sum(
+        token_agreement(a.tolist(), b.tolist()) for a, b in zip(output, output_int8)
+    ) / len(sentences), 4)
+    if mode == "real":
+        texts = [r["translation_text"] for r in reference(sentences, max_length=512)]
+        texts_int8 = [r["translation_text"] for r in quantized(sentences, max_length=512)]
+        pairs = list(zip(texts, texts_int8))
+        metrics["exact_match"] = round(sum(a == b for a, b in pairs) / len(pairs), 4)
+        metrics["char_similarity"] = round(
+            sum(difflib.SequenceMatcher(None, a, b).ratio() for a, b in pairs) / len(pairs), 4
+        )
+    return metrics
+
+
+def collect_speed(args, cache_dir):
+    """每種精度各在獨立程序中量測載入、辨識與翻譯"""
+    speed = {}
+    cases = [
+        ("load_whisper", dict(model_name=args.whisper_model)),
+        ("load_translation", {}),
+        ("asr", dict(model_name=args.whisper_model, seconds=args.audio_seconds, method="standard")),
+        ("translate", dict(n_sentences=args.sentences)),
+    ]
+    for precision in PRECISIONS:
+        speed[precision] = {}
+        for function_name, kwargs in cases:
+            print(f"[{precision}] {function_name} ...", file=sys.stderr, flush=True)
+            kwargs = dict(kwargs, mode=args.mode, repeat=args.repeat, precision=precision)
+            metrics = run_isolated(function_name, kwargs, args.threads, cache_dir)
+            speed[precision][function_name] = metrics
+            print(f"    {format_metrics(metrics)}", file=sys.stderr, flush=True)
+    return speed
+
+
+def format_report(report):
+    """將報告整理為 Markdown 表格"""
+    meta = report["meta"]
+    lines = [
+        f"# 推論精度比較（{meta['mode']} 模式，Whisper {report['whisper_model']}）",
+        "",
+        f"- 時間：{meta['time']}，commit {meta['commit']}",
+        f"- 平台：{meta['platform']}（{meta['cpu_count']} 核心，torch 執行緒 {meta['threads'] or '預設'}）",
+        f"- 音訊 {report['audio_seconds']} 秒，翻譯 {report['sentences']} 句",
+        "",
+        f"| 項目 | {FP32} | {INT8_DYNAMIC} | {INT8_DYNAMIC} / {FP32} |",
+        "| --- | ---: | ---: | ---: |",
+    ]
+    speed = report["speed"]
+    for label, case, metric in SPEED_ROWS:
+        values = [speed.get(p, {}).get(case, {}).get(metric) for p in (FP32, INT8_DYNAMIC)]
+        if all(v is None for v in values):
+            continue
+        base, value = values
+        ratio = f"{value / base:.2f}x" if isinstance(base, (int, float)) and isinstance(value, (int, float)) and base else ""
+        lines.append(f"| {label} | {'' if base is None else base} | {'' if value is None else value} | {ratio} |")
+    errors = [f"{p}/{case}: {m['error']}" for p, cases in speed.items() for case, m in cases.items() if "error" in m]
+    for component, title in (("whisper", "Whisper"), ("translation", "翻譯模型")):
+        metrics = report["accuracy"].get(component, {})
+        if "error" in metrics:
+            errors.append(f"{component} accuracy: {metrics['error']}")
+            continue
+        lines += ["", f"**{title}：{INT8_DYNAMIC} 與 {FP32} 的一致性**", "", "| 指標 | 數值 |", "| --- | ---: |"]
+        lines += [f"| {ACCURACY_LABELS.get(key, key)} | {value} |" for key, value in metrics.items()]
+    if meta["mode"] == "synthetic":
+        lines += ["", "合成模式使用隨機權重，一致性指標只反映量化造成的數值誤差；實際的辨識與翻譯品質請以 `--mode real` 量測。"]
+    if errors:
+        lines += ["", "失敗的量測：", *[f"- {error}" for error in errors]]
+    return "\n".join(lines) + "\n"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.precision_report",
+        description="比較 fp32 與 int8-dynamic 的載入時間、權重大小、辨識與翻譯速度以及輸出一致性",
+    )
+    parser.add_argument("--mode", choices=["synthetic", "real"], default="synthetic",
+                        help="synthetic（預設）使用隨機權重的同架構模型；real 使用已下載的真實模型")
+    parser.add_argument("--whisper-model", default="tiny", help="Whisper 模型（預設 tiny）")
+    parser.add_argument("--audio", default=None, help="real 模式下用於比較辨識結果 WER 的音訊檔")
+    parser.add_argument("--audio-seconds", type=int, default=120, help="量測辨識速度的合成音訊長度（預設 120 秒）")
+    parser.add_argument("--sentences", type=int, default=100, help="量測翻譯速度的句數（預設 100）")
+    parser.add_argument("--accuracy-sentences", type=int, default=32, help="比較翻譯一致性的句數（預設 32）")
+    parser.add_argument("--repeat", type=int, default=1, help="每項量測重複次數，取中位數（預設 1）")
+    parser.add_argument("--threads", type=int, default=None, help="torch 執行緒數（預設由 torch 決定）")
+    parser.add_argument("-o", "--output", default=None, help="結果 JSON 路徑（預設 precision-<時間>.json）")
+    parser.add_argument("--markdown", default=None, help="另將報告寫入此 Markdown 檔")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    meta_args = SimpleNamespace(mode=args.mode, quick=False, repeat=args.repeat, threads=args.threads,
+                                precision=list(PRECISIONS), asr_backends=[DEFAULT_BACKEND])
+    report = {
+        "meta": collect_meta(meta_args),
+        "whisper_model": args.whisper_model,
+        "audio_seconds": args.audio_seconds,
+        "sentences": args.sentences,
+    }
+    with tempfile.TemporaryDirectory(prefix="voiceflow-precision-") as cache_dir:
+        report["speed"] = collect_speed(args, cache_dir)
+        if args.threads:
+            import torch
+            torch.set_num_threads(args.threads)
+        report["accuracy"] = {}
+        for component, fn, kwargs in (
+            ("whisper", whisper_accuracy, dict(model_name=args.whisper_model, audio_file=args.audio)),
+            ("translation", translation_accuracy, dict(n_sentences=args.accuracy_sentences)),
+        ):
+            print(f"[accuracy] {component} ...", file=sys.stderr, flush=True)
+            try:
+                report["accuracy"][component] = fn(args.mode, **kwargs)
+            except Exception as e:
+                report["accuracy"][component] = {"error": str(e) or type(e).__name__}
+
+    markdown = format_report(report)
+    print(markdown)
+    output = args.output or f"precision-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果已寫入 {output}", file=sys.stderr)
+    if args.markdown:
+        with open(args.markdown, "w", encoding="utf-8") as f:
+            f.write(markdown)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
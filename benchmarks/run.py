@@ -0,0 +1,483 @@
+# benchmarks/run.py
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from multiprocessing import get_context
+
+from benchmarks.fixtures import (
+    AUDIO_SECONDS, CORPUS_SENTENCES, QUICK_AUDIO_SECONDS, QUICK_CORPUS_SENTENCES, make_corpus, make_speech_audio,
+)
+from function.asr_backends import BACKENDS, DEFAULT_BACKEND
+from function.quantization import FP32, INT8_DYNAMIC, PRECISIONS
+
+RESULTS_VERSION = 1
+CASE_GROUPS = ("load", "asr", "translate", "summary")
+ASR_METHODS = ("standard", "stream", "long_audio")
+# 各指標的比較方向：lower 表示數值越小越好，higher 表示越大越好
+METRIC_DIRECTIONS = {
+    "seconds": "lower",
+    "rtf": "lower",
+    "load_seconds": "lower",
+    "convert_seconds": "lower",
+    "encode_seconds": "lower",
+    "warm_seconds": "lower",
+    "ttft_seconds": "lower",
+    "peak_rss_mb": "lower",
+    "sentences_per_second": "higher",
+    "warm_sentences_per_second": "higher",
+    "tokens_per_second": "higher",
+}
+
+
+def measure(fn, repeat):
+    """執行 fn repeat 次，回傳耗時的中位數（秒）與最後一次的結果"""
+    durations = []
+    result = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), result
+
+
+def load_whisper(mode, model_name, precision=FP32):
+    if mode == "synthetic":
+        from benchmarks.synthetic import build_whisper
+        model = build_whisper(model_name)
+        if precision == INT8_DYNAMIC:
+            from function.quantization import quantize_linear_layers
+            quantize_linear_layers(model.decoder)
+        return model
+    if precision == INT8_DYNAMIC:
+        from function.quantization import load_quantized_whisper
+        return load_quantized_whisper(model_name)
+    import whisper
+    return whisper.load_model(model_name, device="cpu")
+
+
+def load_translation(mode, source_lang="en", target_lang="zh", precision=FP32):
+    if mode == "synthetic":
+        from benchmarks.synthetic import SyntheticTranslationPipeline
+        return SyntheticTranslationPipeline(target_lang, precision)
+    model_name = f"Helsinki-NLP/opus-mt-{source_lang}-{target_lang}"
+    if precision == INT8_DYNAMIC:
+        from function.quantization import load_quantized_translation
+        return load_quantized_translation(model_name)
+    from transformers import pipeline
+    return pipeline("translation", model=model_name, device=-1)
+
+
+def _measure_load(load, mode, precision, repeat):
+    # real 模式的 int8-dynamic 第一次載入包含量化與寫入磁碟快取，另外記錄為 convert_seconds，load_seconds 為由快取載入的時間
+    metrics = {}
+    if mode == "real" and precision == INT8_DYNAMIC:
+        convert_seconds, _ = measure(load, 1)
+        metrics["convert_seconds"] = round(convert_seconds, 3)
+    load_seconds, model = measure(load, repeat)
+    metrics["load_seconds"] = round(load_seconds, 3)
+    return metrics, model
+
+
+def bench_load_whisper(mode, model_name, repeat=1, precision=FP32):
+    """Whisper 模型的載入時間、權重大小，以及對 30 秒音訊執行一次 encoder 的時間"""
+    import torch
+    import whisper
+    from function.model_pool import estimate_model_bytes
+    metrics, model = _measure_load(lambda: load_whisper(mode, model_name, precision), mode, precision, repeat)
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(make_speech_audio(30)))
+    with torch.no_grad():
+        model.embed_audio(mel.unsqueeze(0))  # 第一次執行包含記憶體配置，不列入計時
+        encode_seconds, _ = measure(lambda: model.embed_audio(mel.unsqueeze(0)), repeat)
+    metrics["weights_mb"] = round(estimate_model_bytes(model) / 2**20, 1)
+    metrics["encode_seconds"] = round(encode_seconds, 3)
+    return metrics
+
+
+def bench_load_translation(mode, source_lang="en", target_lang="zh", repeat=1, precision=FP32):
+    """翻譯 pipeline 的載入時間與權重大小"""
+    from function.model_pool import estimate_model_bytes
+    load = lambda: load_translation(mode, source_lang, target_lang, precision)
+    metrics, translator = _measure_load(load, mode, precision, repeat)
+    metrics["weights_mb"] = round(estimate_model_bytes(translator) / 2**20, 1)
+    return metrics
+
+
+def bench_asr(mode, model_name, seconds, method, repeat=1, precision=FP32, backend=DEFAULT_BACKEND):
+    """以 SpeechTranslator.speech_to_text 辨識合成音訊，回傳耗時與即時率（不含模型載入）"""
+    from function.SpeechTranslator import SpeechTranslator
+    if mode == "synthetic":
+        from benchmarks.synthetic import install_synthetic_models
+        install_synthetic_models()
+    translator = SpeechTranslator(whisper_model_name=model_name, whisper_device="cpu", whisper_precision=precision,
+                                  use_cache=False, use_translation_memory=False, asr_backend=backend)
+    translator.whisper_model  # 先載入模型
+    audio = make_speech_audio(seconds)
+    segments = []
+
+    def run():
+        segments.clear()
+        if method == "stream":
+            return translator.speech_to_text(audio, on_segment=segments.append)
+        return translator.speech_to_text(audio, long_audio=method == "long_audio")
+
+    elapsed, text = measure(run, repeat)
+    return {
+        "audio_seconds": seconds,
+        "seconds": round(elapsed, 3),
+        "rtf": round(elapsed / seconds, 4),
+        "words": len(text.split()),
+    }
+
+
+def bench_translate(mode, n_sentences, repeat=1, source_lang="en", target_lang="zh", precision=FP32):
+    """
+    以 SpeechTranslator.translate_text 翻譯合成語料（使用預設的翻譯記憶設定）：
+    seconds 為空的翻譯記憶（每個句子都送入模型），warm_seconds 為再次翻譯同一份語料（全部命中翻譯記憶）
+    """
+    from function.SpeechTranslator import SpeechTranslator
+    from function.translation_memory import TranslationMemory
+    if mode == "synthetic":
+        from benchmarks.synthetic import install_synthetic_models
+        install_synthetic_models()
+    translator = SpeechTranslator(use_cache=False, source_lang=source_lang, target_lang=target_lang,
+                                  translator_device=-1, translator_precision=precision)
+    translator.translator  # 先載入模型
+    corpus = make_corpus(n_sentences)
+    sentences = translator.split_into_sentences(corpus)
+    workdir = tempfile.mkdtemp(prefix="voiceflow-bench-")
+    runs = []
+
+    def cold():
+        translator.translation_memory = TranslationMemory(os.path.join(workdir, f"tm{len(runs)}.sqlite"))
+        runs.append(translator.translation_memory)
+        return translator.translate_text(corpus)
+
+    elapsed, result = measure(cold, repeat)
+    if result is None:
+        raise RuntimeError("翻譯失敗")
+    warm_seconds, _ = measure(lambda: translator.translate_text(corpus), repeat)
+    return {
+        "sentences": len(sentences),
+        "input_tokens": sum(translator.count_tokens(sentences)),
+        "seconds": round(elapsed, 3),
+        "sentences_per_second": round(len(sentences) / elapsed, 2),
+        "warm_seconds": round(warm_seconds, 4),
+        "warm_sentences_per_second": round(len(sentences) / warm_seconds, 1),
+    }
+
+
+def make_stub_server():
+    from benchmarks.ollama_stub import StubOllamaServer
+
+    class BenchmarkOllamaServer(StubOllamaServer):
+        # 回覆長度隨輸入增加（約為 prompt 的 1/20，40–400 字），讓 tokens/sec 有足夠的樣本
+        def reply_for(self, prompt):
+            length = min(400, max(40, len(prompt) // 20))
+            return ("摘要：" + prompt.strip().splitlines()[-1] * 2)[:length].ljust(length, "。")
+
+    return BenchmarkOllamaServer(latency=0.05, token_delay=0.002)
+
+
+def bench_summary(mode, n_sentences, repeat=1, model_name="stub:latest", host=None):
+    """
+    以 OllamaClient.generate_summary 串流總結合成語料（預設使用本機模擬的 Ollama 伺服器）：
+    回傳第一個 token 的延遲、生成速度與送出的請求數（長篇內容會以 map-reduce 分段總結）
+    """
+    from function.ollama_client import OllamaClient, estimate_tokens
+    server = make_stub_server().start() if host is None else None
+    try:
+        client = OllamaClient(preferred_model=model_name, use_cache=False, host=host or server.url)
+        text = make_corpus(n_sentences)
+        samples = []
+
+        def run():
+            start = time.perf_counter()
+            first = []
+            tokens = []
+
+            def on_token(token):
+                if not first:
+                    first.append(time.perf_counter() - start)
+                tokens.append(token)
+
+            summary = client.generate_summary(text, model_name, on_token=on_token)
+            if summary.startswith(("無法生成總結", "總結生成失敗")):
+                raise RuntimeError(summary)
+            elapsed = time.perf_counter() - start
+            samples.append((first[0] if first else elapsed, len(tokens), elapsed))
+
+        requests_before = server.requests if server else 0
+        elapsed, _ = measure(run, repeat)
+        ttft = statistics.median(s[0] for s in samples)
+        n_tokens = statistics.median(s[1] for s in samples)
+        generating = statistics.median(s[2] - s[0] for s in samples)
+        metrics = {
+            "input_tokens": estimate_tokens(text),
+            "seconds": round(elapsed, 3),
+            "ttft_seconds": round(ttft, 3),
+            "tokens": n_tokens,
+            "tokens_per_second": round(n_tokens / generating, 1) if generating > 0 else None,
+        }
+        if server is not None:
+            metrics["requests"] = (server.requests - requests_before) // max(1, repeat)
+        return metrics
+    finally:
+        if server is not None:
+            server.stop()
+
+
+CASE_FUNCTIONS = {
+    "load_whisper": bench_load_whisper,
+    "load_translation": bench_load_translation,
+    "asr": bench_asr,
+    "translate": bench_translate,
+    "summary": bench_summary,
+}
+
+
+def _init_worker(threads, cache_dir):
+    # 每個量測在全新的程序中執行：停用結果快取與指標日誌、快取目錄指向暫存目錄，並固定 torch 的執行緒數
+    os.environ["VOICEFLOW_CACHE"] = "0"
+    os.environ["VOICEFLOW_OLLAMA_CACHE"] = "0"
+    os.environ["VOICEFLOW_METRICS"] = "0"
+    os.environ["VOICEFLOW_CACHE_DIR"] = cache_dir
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def _run_case(function_name, kwargs):
+    from function.metrics import peak_rss_bytes
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics = CASE_FUNCTIONS[function_name](**kwargs)
+    metrics["peak_rss_mb"] = round(peak_rss_bytes() / 2**20, 1)
+    return metrics
+
+
+def run_isolated(function_name, kwargs, threads=None, cache_dir=None):
+    """
+    在獨立的 spawn 程序中執行一個量測，讓 peak RSS 與模型載入時間不受其他量測影響
+
+    Returns:
+        dict: 量測結果；失敗時為 {"error": 訊息}。
+    """
+    context = get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_worker,
+                             initargs=(threads, cache_dir or tempfile.gettempdir())) as executor:
+        try:
+            return executor.submit(_run_case, function_name, kwargs).result()
+        except Exception as e:
+            return {"error": str(e) or type(e).__name__}
+
+
+def build_cases(args):
+    """
+    依命令列參數列出所有量測
+
+    Returns:
+        list: (名稱, 函式名稱, 參數) 列表。
+    """
+    audio_lengths = QUICK_AUDIO_SECONDS if args.quick else AUDIO_SECONDS
+    corpus_sizes = QUICK_CORPUS_SENTENCES if args.quick else CORPUS_SENTENCES
+    cases = []
+    for precision in args.precision:
+        # fp32 的量測名稱不加後綴，與先前的結果相容
+        suffix = "" if precision == FP32 else f"/{precision}"
+        common = {"repeat": args.repeat, "mode": args.mode, "precision": precision}
+        if "load" in args.cases:
+            for model_name in args.whisper_models:
+                cases.append((f"load/whisper/{model_name}{suffix}", "load_whisper", dict(common, model_name=model_name)))
+            cases.append((f"load/translation/en-zh{suffix}", "load_translation", dict(common)))
+        if "asr" in args.cases:
+            for backend in args.asr_backends:
+                # 預設的 whisper 引擎不加後綴；其他引擎（synthetic 模式下使用其實際模型）加上引擎名稱
+                backend_suffix = "" if backend == DEFAULT_BACKEND else f"/{backend}"
+                for method in args.asr_methods:
+                    for seconds in audio_lengths:
+                        cases.append((f"asr/{args.asr_model}/{method}/{seconds}s{suffix}{backend_suffix}", "asr",
+                                      dict(common, model_name=args.asr_model, seconds=seconds, method=method, backend=backend)))
+        if "translate" in args.cases:
+            for n in corpus_sizes:
+                cases.append((f"translate/en-zh/{n}{suffix}", "translate", dict(common, n_sentences=n)))
+    common = {"repeat": args.repeat}
+    if "summary" in args.cases:
+        model = "stub:latest" if args.ollama_host is None else args.summary_model
+        for n in corpus_sizes:
+            cases.append((f"summary/{model}/{n}", "summary",
+                          dict(common, mode=args.mode, n_sentences=n, model_name=model, host=args.ollama_host)))
+    return cases
+
+
+def _package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def collect_meta(args):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "mode": args.mode,
+        "quick": args.quick,
+        "repeat": args.repeat,
+        "threads": args.threads,
+        "precision": args.precision,
+        "asr_backends": args.asr_backends,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "packages": {name: _package_version(name) for name in ("torch", "openai-whisper", "faster-whisper", "transformers", "numpy", "ollama")},
+    }
+
+
+def format_metrics(metrics):
+    if "error" in metrics:
+        return f"失敗：{metrics['error']}"
+    return "  ".join(f"{key}={value}" for key, value in metrics.items())
+
+
+def run_benchmarks(args):
+    cases = build_cases(args)
+    report = {"version": RESULTS_VERSION, "meta": collect_meta(args), "results": {}}
+    print(f"共 {len(cases)} 項量測（模式：{args.mode}）", file=sys.stderr)
+    with tempfile.TemporaryDirectory(prefix="voiceflow-bench-") as cache_dir:
+        for index, (name, function_name, kwargs) in enumerate(cases, 1):
+            print(f"[{index}/{len(cases)}] {name} ...", file=sys.stderr, flush=True)
+            metrics = run_isolated(function_name, kwargs, args.threads, cache_dir)
+            report["results"][name] = metrics
+            print(f"    {format_metrics(metrics)}", file=sys.stderr, flush=True)
+    return report
+
+
+def load_report(path):
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    if report.get("version") != RESULTS_VERSION:
+        raise ValueError(f"{path} 的結果格式版本 {report.get('version')} 不支援")
+    return report
+
+
+def compare_reports(baseline, current, threshold=0.1):
+    """
+    比較兩次量測結果
+
+    Args:
+        baseline (dict): 基準結果。
+        current (dict): 本次結果。
+        threshold (float): 變差超過此比例即視為退步（例如 0.1 表示 10%）。
+
+    Returns:
+        list: 各指標的比較 (名稱, 指標, 基準值, 本次值, 變化比例, 是否退步)。
+    """
+    rows = []
+    for name, metrics in current["results"].items():
+        base_metrics = baseline["results"].get(name)
+        if base_metrics is None:
+            continue
+        for metric, direction in METRIC_DIRECTIONS.items():
+            old, new = base_metrics.get(metric), metrics.get(metric)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or old <= 0:
+                continue
+            change = (new - old) / old
+            worse = change if direction == "lower" else -change
+            rows.append((name, metric, old, new, change, worse > threshold))
+    return rows
+
+
+def print_comparison(baseline, current, threshold):
+    """輸出比較表，回傳退步的指標數"""
+    for key in ("mode", "machine", "cpu_count", "threads"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"注意：兩次量測的 {key} 不同（{baseline['meta'].get(key)} / {current['meta'].get(key)}），結果可能無法直接比較")
+    rows = compare_reports(baseline, current, threshold)
+    for name, metric, old, new, change, regressed in rows:
+        flag = "  <-- 退步" if regressed else ""
+        print(f"{name:40s} {metric:26s} {old:>10g} -> {new:>10g} {change:+8.1%}{flag}")
+    regressions = sum(1 for row in rows if row[-1])
+    missing = [name for name in baseline["results"] if name not in current["results"]]
+    if missing:
+        print(f"本次沒有的量測: {', '.join(missing)}")
+    errors = [name for name, metrics in current["results"].items() if "error" in metrics]
+    if errors:
+        print(f"本次失敗的量測: {', '.join(errors)}")
+    print(f"比較 {len(rows)} 項指標，退步 {regressions} 項（門檻 {threshold:.0%}）；基準 {baseline['meta'].get('commit')}，本次 {current['meta'].get('commit')}")
+    return regressions + len(errors)
+
+
+def _comma_list(choices=None):
+    def parse(value):
+        items = [item.strip() for item in value.split(",") if item.strip()]
+        unknown = [item for item in items if choices is not None and item not in choices]
+        if unknown:
+            raise argparse.ArgumentTypeError(f"未知的項目: {', '.join(unknown)}（可用: {', '.join(choices)}）")
+        return items
+    return parse
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="VoiceFlow 效能量測：離線、僅需 CPU")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="執行量測並將結果寫入 JSON")
+    run.add_argument("--mode", choices=["synthetic", "real"], default="synthetic",
+                     help="synthetic（預設）使用隨機權重的同架構模型，不需下載；real 使用已下載的真實模型")
+    run.add_argument("--cases", type=_comma_list(CASE_GROUPS), default=list(CASE_GROUPS),
+                     help=f"要執行的量測群組（預設全部：{','.join(CASE_GROUPS)}）")
+    run.add_argument("--quick", action="store_true", help="只使用最短的音訊與最小的語料")
+    run.add_argument("--repeat", type=int, default=1, help="每項量測重複次數，取中位數（預設 1）")
+    run.add_argument("--threads", type=int, default=None, help="torch 執行緒數（預設由 torch 決定）")
+    run.add_argument("--whisper-models", type=_comma_list(), default=["tiny", "base"],
+                     help="量測載入時間的 Whisper 模型（預設 tiny,base）")
+    run.add_argument("--asr-model", default="tiny", help="量測辨識速度的 Whisper 模型（預設 tiny）")
+    run.add_argument("--asr-methods", type=_comma_list(ASR_METHODS), default=["standard", "long_audio"],
+                     help=f"辨識方式（{','.join(ASR_METHODS)}；預設 standard,long_audio）")
+    run.add_argument("--asr-backends", type=_comma_list(BACKENDS), default=[DEFAULT_BACKEND],
+                     help=f"辨識引擎（{','.join(BACKENDS)}；預設 {DEFAULT_BACKEND}），可同時列出多個以比較")
+    run.add_argument("--precision", type=_comma_list(PRECISIONS), default=[FP32],
+                     help=f"Whisper 與翻譯模型的推論精度（{','.join(PRECISIONS)}；預設 fp32），可同時列出多個以比較")
+    run.add_argument("--ollama-host", default=None, help="改用實際的 Ollama 伺服器（預設使用本機模擬伺服器）")
+    run.add_argument("--summary-model", default="qwen2.5:0.5b", help="搭配 --ollama-host 使用的總結模型")
+    run.add_argument("-o", "--output", default=None, help="結果 JSON 路徑（預設 benchmark-<時間>.json）")
+    run.add_argument("--baseline", default=None, help="完成後與此結果比較，有退步時結束代碼為 1")
+    run.add_argument("--threshold", type=float, default=0.1, help="退步門檻比例（預設 0.1）")
+
+    compare = commands.add_parser("compare", help="比較兩份結果 JSON")
+    compare.add_argument("baseline", help="基準結果")
+    compare.add_argument("current", help="本次結果")
+    compare.add_argument("--threshold", type=float, default=0.1, help="退步門檻比例（預設 0.1）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "compare":
+        return 1 if print_comparison(load_report(args.baseline), load_report(args.current), args.threshold) else 0
+
+    report = run_benchmarks(args)
+    output = args.output or f"benchmark-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果已寫入 {output}", file=sys.stderr)
+    if args.baseline:
+        return 1 if print_comparison(load_report(args.baseline), report, args.threshold) else 0
+    return 1 if any("error" in metrics for metrics in report["results"].values()) else 0
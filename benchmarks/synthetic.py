@@ -0,0 +1,180 @@
+# benchmarks/synthetic.py
+import random
+import re
+import zlib
+
+import numpy as np
+
+from benchmarks.fixtures import WORDS
+from function.asr_backends import ASRModel, get_backend
+
+# 官方 Whisper 各尺寸的架構（寬度、注意力頭數、層數），用於建立隨機權重的同尺寸模型
+WHISPER_DIMS = {
+    "tiny": (384, 6, 4),
+    "base": (512, 8, 6),
+    "small": (768, 12, 12),
+    "medium": (1024, 16, 24),
+}
+# Helsinki-NLP/opus-mt-en-zh 的架構
+OPUS_MT_CONFIG = dict(
+    vocab_size=65001, d_model=512, encoder_layers=6, decoder_layers=6, encoder_attention_heads=8,
+    decoder_attention_heads=8, encoder_ffn_dim=2048, decoder_ffn_dim=2048, max_position_embeddings=512,
+    pad_token_id=65000, decoder_start_token_id=65000, eos_token_id=0,
+)
+
+
+def build_whisper(model_name):
+    """
+    建立與官方 Whisper 相同架構、但權重為隨機值的模型（不需下載權重）
+
+    Args:
+        model_name (str): Whisper 模型名稱（如 "tiny"、"base.en"）。
+
+    Returns:
+        whisper.model.Whisper: 隨機權重的模型。
+    """
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+    size = model_name.split(".")[0]
+    if size not in WHISPER_DIMS:
+        raise ValueError(f"合成模式不支援 Whisper 模型 {model_name}（可用: {', '.join(WHISPER_DIMS)}）")
+    width, heads, layers = WHISPER_DIMS[size]
+    dims = ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_audio_state=width, n_audio_head=heads, n_audio_layer=layers,
+        n_vocab=51864 if model_name.endswith(".en") else 51865,
+        n_text_ctx=448, n_text_state=width, n_text_head=heads, n_text_layer=layers,
+    )
+    torch.manual_seed(0)
+    return Whisper(dims).eval()
+
+
+class SyntheticWhisperModel(ASRModel):
+    """
+    取代 whisper 模型的合成版本，計算量與真實辨識相近、輸出為可重現的合成文字：
+      - 每 30 秒視窗計算 log-mel 並執行一次完整的 encoder
+      - 依 VAD 偵測到的語音長度（每秒約 2.5 個字）決定 decoder 以 KV cache 逐一產生的 token 數
+      - 回傳與 whisper.transcribe 相同格式的 text、segments 與 language
+    """
+
+    WORDS_PER_SECOND = 2.5
+
+    def __init__(self, model_name, precision="fp32"):
+        super().__init__(build_whisper(model_name), model_name)
+        if precision == "int8-dynamic":
+            from function.quantization import quantize_linear_layers
+            quantize_linear_layers(self.model.decoder)
+        multilingual = not model_name.endswith(".en")
+        self.sot_sequence = [50258, 50259, 50359, 50363] if multilingual else [50257, 50362]
+
+    def decode(self, audio_features, n_tokens):
+        import torch
+        cache, hooks = self.model.install_kv_cache_hooks()
+        try:
+            logits = self.model.decoder(torch.tensor([self.sot_sequence]), audio_features, kv_cache=cache)
+            for _ in range(n_tokens):
+                next_token = logits[:, -1].argmax(-1, keepdim=True)
+                logits = self.model.decoder(next_token, audio_features, kv_cache=cache)
+        finally:
+            for hook in hooks:
+                hook.remove()
+
+    def transcribe(self, audio, **options):
+        import torch
+        import whisper
+        from function.vad import detect_speech_regions
+        if isinstance(audio, str):
+            audio = whisper.load_audio(audio)
+        sample_rate = whisper.audio.SAMPLE_RATE
+        segments = []
+        for offset in range(0, len(audio), whisper.audio.N_SAMPLES):
+            piece = audio[offset : offset + whisper.audio.N_SAMPLES]
+            rng = random.Random(offset)
+            window = []
+            for start, end in detect_speech_regions(piece, sample_rate):
+                n_words = max(1, int((end - start) / sample_rate * self.WORDS_PER_SECOND))
+                text = " " + " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+                window.append({"id": len(segments) + len(window), "start": round(start / sample_rate, 2),
+                               "end": round(end / sample_rate, 2), "text": text})
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(np.asarray(piece, dtype=np.float32)))
+            # 文字 token 約為字數的 1.3 倍，每個片段另有前後兩個時間戳記 token
+            n_tokens = sum(int(len(seg["text"].split()) * 1.3) + 2 for seg in window)
+            with torch.no_grad():
+                self.decode(self.model.embed_audio(mel.unsqueeze(0)), min(n_tokens, 224))
+            segments.extend(window)
+        return {
+            "text": "".join(seg["text"] for seg in segments),
+            "segments": segments,
+            "language": options.get("language") or "en",
+        }
+
+
+class HashTokenizer:
+    """以字詞雜湊對應 token id 的簡易 tokenizer，介面與 transformers tokenizer 的 __call__ 相同"""
+
+    def __init__(self, vocab_size, eos_token_id=0):
+        self.vocab_size = vocab_size
+        self.eos_token_id = eos_token_id
+
+    def encode(self, text):
+        # 每個字詞約 1.3 個 sentencepiece token：較長的字詞拆成兩個
+        ids = []
+        for word in re.findall(r"\w+|[^\w\s]", text):
+            pieces = [word[: len(word) // 2], word[len(word) // 2 :]] if len(word) > 6 else [word]
+            ids.extend(zlib.crc32(p.encode("utf-8")) % (self.vocab_size - 2) + 1 for p in pieces)
+        return ids + [self.eos_token_id]
+
+    def __call__(self, texts):
+        return {"input_ids": [self.encode(t) for t in texts]}
+
+
+class SyntheticTranslationPipeline:
+    """
+    取代 transformers 翻譯 pipeline 的合成版本：以隨機權重的 Opus-MT 架構（MarianMTModel）
+    執行 encoder 與 greedy 解碼，產生的 token 數與輸入相同；輸出為依字詞對應的可重現中文字
+    """
+
+    def __init__(self, target_lang="zh", precision="fp32"):
+        import torch
+        from transformers import MarianConfig, MarianMTModel
+        self.target_lang = target_lang
+        config = MarianConfig(**OPUS_MT_CONFIG)
+        torch.manual_seed(0)
+        self.model = MarianMTModel(config).eval()
+        if precision == "int8-dynamic":
+            from function.quantization import quantize_linear_layers
+            quantize_linear_layers(self.model)
+        self.tokenizer = HashTokenizer(config.vocab_size, config.eos_token_id)
+        self.pad_token_id = config.pad_token_id
+
+    def pseudo_translate(self, text):
+        words = re.findall(r"\w+", text)
+        if self.target_lang != "zh":
+            return f"[{self.target_lang}] {text}"
+        return "".join(chr(0x4E00 + zlib.crc32(w.lower().encode("utf-8")) % 2000) for w in words) + "。"
+
+    def __call__(self, texts, batch_size=None, max_length=512, **kwargs):
+        import torch
+        if isinstance(texts, str):
+            texts = [texts]
+        encoded = [ids[:max_length] for ids in self.tokenizer(texts)["input_ids"]]
+        longest = max(len(ids) for ids in encoded)
+        input_ids = torch.full((len(encoded), longest), self.pad_token_id)
+        attention_mask = torch.zeros((len(encoded), longest), dtype=torch.long)
+        for row, ids in enumerate(encoded):
+            input_ids[row, : len(ids)] = torch.tensor(ids)
+            attention_mask[row, : len(ids)] = 1
+        with torch.no_grad():
+            self.model.generate(input_ids=input_ids, attention_mask=attention_mask, num_beams=1, do_sample=False,
+                                max_new_tokens=longest, min_new_tokens=longest)
+        return [{"translation_text": self.pseudo_translate(text)} for text in texts]
+
+
+def install_synthetic_models():
+    """讓 model_pool 的共用池改為載入合成模型（只影響目前程序）；whisper 以外的辨識引擎維持原本的載入方式"""
+    from function import model_pool
+    model_pool.whisper_models.loader = lambda model_name, device, precision, backend: (
+        SyntheticWhisperModel(model_name, precision) if backend == "whisper" else get_backend(backend).load(model_name, device, precision)
+    )
+    model_pool.translation_pipelines.loader = (
+        lambda source_lang, target_lang, device, precision: SyntheticTranslationPipeline(target_lang, precision)
+    )
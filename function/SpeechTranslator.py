@@ -1,18 +1,51 @@
 # function/SpeechTranslator.py
 import re
-import sys
-import opencc
-import whisper
-from transformers import pipeline
-import torch  # 用來檢查 GPU 可用性
+import json
+import time
 import warnings
+import functools
+import inspect
+from function.asr_backends import SAMPLE_RATE, default_backend_name, get_backend
+from function.metrics import get_metrics, timed
+from function.model_pool import get_whisper_model, get_translation_pipeline, hold_whisper_model, hold_translation_pipeline
+from function.result_cache import get_result_cache, hash_audio, hash_text, make_key
+from function.translation_memory import get_translation_memory
 warnings.filterwarnings('ignore', category=UserWarning)
 
 
+def _holding(model):
+    """
+    裝飾器：方法執行期間（generator 則為迭代期間）將實例使用的模型標記為使用中，
+    避免資源管理員在辨識或翻譯途中因閒置或 RAM 預算卸載該模型
+
+    Args:
+        model (str): "whisper" 或 "translator"。
+    """
+    def hold(self):
+        if model == "whisper":
+            return hold_whisper_model(self.whisper_model_name, self.whisper_device, self.whisper_precision, self.asr_backend)
+        return hold_translation_pipeline(self.source_lang, self.target_lang, self.translator_device, self.translator_precision)
+
+    def decorator(method):
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def generator_wrapper(self, *args, **kwargs):
+                with hold(self):
+                    yield from method(self, *args, **kwargs)
+            return generator_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with hold(self):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 class SpeechTranslator:
     """
     此模組提供 SpeechTranslator 類別，具有以下功能：
-      - 使用 OpenAI 的 Whisper 模型將語音轉成文字
+      - 使用 OpenAI 的 Whisper 模型將語音轉成文字（辨識引擎可切換，見 function.asr_backends）
       - 清理並分割文字句子
       - 使用 Helsinki-NLP 的 Opus MT 模型進行翻譯，支援使用者指定翻譯的原文與目標語言
 
@@ -28,6 +61,7 @@ class SpeechTranslator:
       - "large"
     """
 
+    @timed("translator_init")
     def __init__(
         self,
         whisper_model_name="medium.en",
@@ -35,6 +69,12 @@ class SpeechTranslator:
         source_lang="en",
         target_lang="zh",
         target_traditional=False,
+        whisper_device=None,
+        whisper_precision="fp32",
+        translator_precision="fp32",
+        use_cache=True,
+        use_translation_memory=True,
+        asr_backend=None,
     ):
         """
         初始化 SpeechTranslator
@@ -45,60 +85,273 @@ class SpeechTranslator:
             source_lang (str): 翻譯原文語言的語言代碼（例如 "en", "zh", "fr"）。
             target_lang (str): 翻譯目標語言的語言代碼。
             target_traditional (bool): 若為 True，且 target_lang 為 "zh"，則將輸出轉為繁體中文。
+            whisper_device: Whisper 使用的裝置；若為 None 則自動選擇。
+            whisper_precision (str): Whisper 權重精度（"fp32"、"fp16" 或 "int8-dynamic"）。
+            translator_precision (str): 翻譯模型權重精度（"fp32" 或 "int8-dynamic"）；
+                int8-dynamic 將 Linear 層動態量化為 int8，僅用於 CPU（其他裝置改用 fp32）。
+            use_cache (bool): 是否使用磁碟結果快取（相同音訊/文字與設定直接回傳先前的結果）。
+            use_translation_memory (bool): 是否使用句子層級的翻譯記憶（重複的句子不再送入模型）。
+            asr_backend (str): 語音辨識引擎（"whisper"、"faster-whisper" 或 "fake"）；
+                None 表示使用環境變數 VOICEFLOW_ASR_BACKEND（預設 whisper）。
         """
         self.whisper_model_name = whisper_model_name
-        self.whisper_model = whisper.load_model(self.whisper_model_name)
+        self.whisper_device = whisper_device
+        self.whisper_precision = whisper_precision
+        self.asr_backend = asr_backend or default_backend_name()
+        self.translator_precision = translator_precision
         self.source_lang = source_lang
         self.target_lang = target_lang
         self.target_traditional = target_traditional
+        self.translator_device = translator_device
+        self._translator = None
+        self.transcribe_options = {}
+        self.result_cache = get_result_cache() if use_cache else None
+        self.translation_memory = get_translation_memory() if use_translation_memory else None
+
+    @property
+    def whisper_model(self):
+        """
+        語音辨識模型（function.asr_backends.ASRModel），使用時才從程序層級的共用池取得，
+        相同名稱/裝置/精度/辨識引擎不會重複載入；實例不保留模型的參照，閒置的模型可由資源管理員卸載並實際釋放記憶體
+        """
+        return get_whisper_model(self.whisper_model_name, self.whisper_device, self.whisper_precision, self.asr_backend)
 
-        if translator_device is None:
-            if sys.platform == "darwin":
-                translator_device = "mps"
-            else:
-                translator_device = 0 if torch.cuda.is_available() else -1
+    @property
+    def translator(self):
+        """翻譯 pipeline，使用時才從共用池取得（只做語音辨識時不會載入翻譯模型）；以 setter 指定時改用指定的 pipeline"""
+        if self._translator is not None:
+            return self._translator
+        return get_translation_pipeline(self.source_lang, self.target_lang, self.translator_device, self.translator_precision)
 
-        model_name = f"Helsinki-NLP/opus-mt-{self.source_lang}-{self.target_lang}"
-        self.translator = pipeline("translation", model=model_name, device=translator_device)
+    @translator.setter
+    def translator(self, value):
+        self._translator = value
 
+    @timed("set_translation_params")
     def set_translation_params(
-        self, source_lang="en", target_lang="zh", target_traditional=False, translator_device=None
+        self, source_lang="en", target_lang="zh", target_traditional=False, translator_device=None,
+        translator_precision=None,
     ):
         """
-        更新翻譯參數，並重建翻譯 pipeline
+        更新翻譯參數，並切換至對應語言組合的翻譯 pipeline
 
         Args:
             source_lang (str): 原文語言代碼。
             target_lang (str): 目標語言代碼。
             target_traditional (bool): 是否將中文輸出轉為繁體（僅 target_lang 為 "zh" 時有效）。
             translator_device: 翻譯 pipeline 使用的裝置；若為 None 則自動選擇。
+            translator_precision (str): 翻譯模型權重精度（"fp32" 或 "int8-dynamic"）；若為 None 則沿用目前的設定。
         """
         self.source_lang = source_lang
         self.target_lang = target_lang
         self.target_traditional = target_traditional
+        self.translator_device = translator_device
+        if translator_precision is not None:
+            self.translator_precision = translator_precision
 
-        if translator_device is None:
-            if sys.platform == "darwin":
-                translator_device = "mps"
-            else:
-                translator_device = 0 if torch.cuda.is_available() else -1 
+        # 下次翻譯時才從共用池取得對應的 pipeline（在工作執行緒中載入，不阻塞介面）
+        self._translator = None
 
-        model_name = f"Helsinki-NLP/opus-mt-{self.source_lang}-{self.target_lang}"
-        self.translator = pipeline("translation", model=model_name, device=translator_device)
-
-    def speech_to_text(self, audio_file):
+    @timed("speech_to_text")
+    @_holding("whisper")
+    def speech_to_text(self, audio_file, on_segment=None, long_audio=False, workers=1):
         """
         使用 Whisper 將音訊檔案轉為文字
 
         Args:
-            audio_file (str): 音訊檔案的路徑。
+            audio_file (str or np.ndarray): 音訊檔案的路徑，或已解碼的 16 kHz float32 PCM（例如 AudioPrefetcher 預先解碼的結果）。
+            on_segment (callable): 若提供，改用串流辨識，每解碼出一個片段即呼叫 on_segment(segment)。
+            long_audio (bool): 使用長音訊模式（VAD 切分、略過靜音、平行解碼）。
+            workers (int): 長音訊模式的平行解碼程序數。
 
         Returns:
             str: 辨識後的文字。
         """
-        result = self.whisper_model.transcribe(audio_file)
+        if long_audio:
+            cache_key = None
+            if self.result_cache is not None:
+                cache_key = self._audio_cache_key(audio_file, "vad")
+                cached = self.result_cache.get("segments", cache_key)
+                if cached is not None:
+                    get_metrics().annotate(cache_hit=True, mode="long_audio")
+                    segments = json.loads(cached)
+                    if on_segment:
+                        for segment in segments:
+                            on_segment(segment)
+                    return "".join(segment["text"] for segment in segments)
+            segments = self.transcribe_long_audio(audio_file, workers=workers, on_segment=on_segment)
+            get_metrics().annotate(mode="long_audio", audio_seconds=self.last_transcribe_stats["audio_seconds"])
+            if cache_key is not None:
+                self.result_cache.put("segments", cache_key, json.dumps(segments, ensure_ascii=False))
+            return "".join(segment["text"] for segment in segments)
+
+        if on_segment is not None:
+            get_metrics().annotate(mode="stream")
+            texts = []
+            for segment in self.stream_segments(audio_file):
+                texts.append(segment["text"])
+                on_segment(segment)
+            return "".join(texts)
+
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self._audio_cache_key(audio_file)
+            cached = self.result_cache.get("transcription", cache_key)
+            if cached is not None:
+                get_metrics().annotate(cache_hit=True)
+                return cached
+        # 分別計時音訊解碼（ffmpeg）、取得模型（第一次使用時載入）與 Whisper 解碼
+        metrics = get_metrics()
+        with metrics.phase("decode_seconds"):
+            audio = self._load_audio(audio_file)
+        metrics.annotate(audio_seconds=round(len(audio) / SAMPLE_RATE, 2))
+        with metrics.phase("model_seconds"):
+            whisper_model = self.whisper_model
+        with metrics.phase("whisper_seconds"):
+            result = whisper_model.transcribe(audio, **self.transcribe_options)
+        if cache_key is not None:
+            self.result_cache.put("transcription", cache_key, result["text"])
         return result["text"]
 
+    def _load_audio(self, audio_file):
+        if isinstance(audio_file, str):
+            return get_backend(self.asr_backend).load_audio(audio_file)
+        return audio_file
+
+    def has_cached_transcription(self, audio_file):
+        """結果快取中是否已有此音訊（一般模式）的辨識結果；批次預取以此略過不需解碼的檔案"""
+        return self.result_cache is not None and self.result_cache.contains("transcription", self._audio_cache_key(audio_file))
+
+    def _audio_cache_key(self, audio_file, *extra):
+        # 預設的 whisper 引擎不列入 key，沿用先前的快取
+        if self.asr_backend != "whisper":
+            extra = (self.asr_backend,) + extra
+        return make_key(hash_audio(audio_file), self.whisper_model_name, self.whisper_precision, self.transcribe_options, *extra)
+
+    @_holding("whisper")
+    def transcribe_long_audio(self, audio_file, workers=1, max_chunk_seconds=30, on_segment=None):
+        """
+        長音訊模式：以能量 VAD 找出語音區段並略過非語音的部分，語音區段相接成不超過 max_chunk_seconds 的區塊，
+        各區塊（可平行）獨立解碼後，將時間戳記換算回原音訊並依序合併
+
+        Args:
+            audio_file (str or np.ndarray): 音訊檔案的路徑或已解碼的 PCM。
+            workers (int): 平行解碼的程序數；1 表示在目前程序中依序解碼。
+            max_chunk_seconds (float): 每個解碼區塊的長度上限（秒）。
+            on_segment (callable): 每個片段（依時間順序）完成時呼叫 on_segment(segment)。
+
+        Returns:
+            list: 片段列表，包含 id、start、end（秒，相對於檔案開頭）與 text。
+        """
+        from function.vad import detect_speech_regions, merge_into_chunks
+
+        start_time = time.perf_counter()
+        sample_rate = SAMPLE_RATE
+        audio = self._load_audio(audio_file)
+        chunks = merge_into_chunks(detect_speech_regions(audio, sample_rate), sample_rate, max_chunk_seconds)
+        pieces = [chunk.extract(audio) for chunk in chunks]
+        # 各區塊彼此獨立解碼，不以前一段的文字作為提示
+        options = dict(self.transcribe_options, condition_on_previous_text=False)
+
+        if workers > 1 and len(pieces) > 1:
+            from function.parallel_transcriber import ParallelTranscriber
+            parallel = ParallelTranscriber(
+                self.whisper_model_name, workers=workers, whisper_device=self.whisper_device,
+                whisper_precision=self.whisper_precision, asr_backend=self.asr_backend,
+            )
+            results = ((index, segments, error) for index, _, segments, error in parallel.transcribe_chunks(pieces, options))
+        else:
+            results = ((index, self.whisper_model.transcribe(piece, **options)["segments"], None) for index, piece in enumerate(pieces, 1))
+
+        segments = []
+        for index, chunk_segments, error in results:
+            if error is not None:
+                raise error
+            chunk = chunks[index - 1]
+            for seg in chunk_segments:
+                if not seg["text"].strip():
+                    continue
+                start = chunk.source_time(seg["start"], sample_rate)
+                end = max(start, chunk.source_time(seg["end"], sample_rate, is_end=True))
+                segment = {"id": len(segments), "start": round(start, 2), "end": round(end, 2), "text": seg["text"]}
+                segments.append(segment)
+                if on_segment:
+                    on_segment(segment)
+
+        elapsed = time.perf_counter() - start_time
+        audio_seconds = len(audio) / sample_rate
+        speech_seconds = sum(chunk.speech_samples for chunk in chunks) / sample_rate
+        self.last_transcribe_stats = {
+            "audio_seconds": round(audio_seconds, 2),
+            "speech_seconds": round(speech_seconds, 2),
+            "chunks": len(chunks),
+            "workers": workers,
+            "elapsed": round(elapsed, 2),
+            "rtf": round(elapsed / audio_seconds, 4) if audio_seconds else 0.0,
+        }
+        print(
+            f"長音訊模式：音訊 {audio_seconds:.0f} 秒，語音 {speech_seconds:.0f} 秒"
+            f"（略過 {1 - speech_seconds / max(audio_seconds, 1e-9):.0%}），{len(chunks)} 個區塊，"
+            f"耗時 {elapsed:.1f} 秒（即時率 {self.last_transcribe_stats['rtf']:.2f}）"
+        )
+        return segments
+
+    @_holding("whisper")
+    def compare_long_audio(self, audio_file, workers=1):
+        """
+        比較一般辨識與長音訊模式的耗時（不使用結果快取）
+
+        Returns:
+            dict: baseline_seconds、long_audio_seconds 與 speedup（一般模式耗時 / 長音訊模式耗時）。
+        """
+        start = time.perf_counter()
+        self.whisper_model.transcribe(self._load_audio(audio_file), **self.transcribe_options)
+        baseline = time.perf_counter() - start
+        start = time.perf_counter()
+        self.transcribe_long_audio(audio_file, workers=workers)
+        long_audio = time.perf_counter() - start
+        report = {
+            "baseline_seconds": round(baseline, 2),
+            "long_audio_seconds": round(long_audio, 2),
+            "speedup": round(baseline / long_audio, 2) if long_audio else None,
+        }
+        print(f"長音訊模式加速比: {report['speedup']}x（一般 {baseline:.1f} 秒 / 長音訊 {long_audio:.1f} 秒）")
+        return report
+
+    @_holding("whisper")
+    def stream_segments(self, audio_file, window_seconds=30):
+        """
+        串流語音辨識：逐段解碼並立即產生片段，不必等整個檔案辨識完成
+
+        片段的產生方式由辨識引擎決定（見 ASRModel.stream_segments）；結果存入結果快取。
+
+        Args:
+            audio_file (str or np.ndarray): 音訊檔案的路徑或已解碼的 PCM。
+            window_seconds (int): 每次解碼的音訊長度（秒）。
+
+        Yields:
+            dict: 片段，包含 id、start、end（秒，相對於檔案開頭）與 text。
+        """
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self._audio_cache_key(audio_file)
+            cached = self.result_cache.get("segments", cache_key)
+            if cached is not None:
+                get_metrics().annotate(cache_hit=True)
+                yield from json.loads(cached)
+                return
+
+        audio = self._load_audio(audio_file)
+        get_metrics().annotate(audio_seconds=round(len(audio) / SAMPLE_RATE, 2))
+        segments = []
+        for segment in self.whisper_model.stream_segments(audio, window_seconds, **self.transcribe_options):
+            segments.append(segment)
+            yield segment
+
+        if cache_key is not None:
+            self.result_cache.put("segments", cache_key, json.dumps(segments, ensure_ascii=False))
+            self.result_cache.put("transcription", cache_key, "".join(seg["text"] for seg in segments))
+
     @staticmethod
     def clean_text(text):
         """
@@ -114,9 +367,10 @@ class SpeechTranslator:
         text = re.sub(r"\s+([,.!?])", r"\1", text)
         return text
 
-    def split_into_sentences(self, text):
+    @staticmethod
+    def split_into_sentences(text):
         """
-        將文字根據標點分句
+        將文字根據句尾標點分句（英文的 .!? 之後需有空白，中日文的 。！？ 之後則不需要）
 
         Args:
             text (str): 要分句的文字。
@@ -124,33 +378,43 @@ class SpeechTranslator:
         Returns:
             list: 各句文字的列表。
         """
-        sentences = re.split(r"(?<=[.!?])\s+", text)
-        return [self.clean_text(s) for s in sentences if s.strip()]
+        sentences = re.split(r"(?<=[.!?])\s+|(?<=[。！？])\s*", text)
+        return [SpeechTranslator.clean_text(s) for s in sentences if s.strip()]
 
+    @_holding("translator")
     def translate_chunk(self, chunk):
         """
-        翻譯單一文字區塊
+        翻譯單一文字區塊；啟用翻譯記憶時逐句查詢，只有未命中的句子送入模型
 
         Args:
             chunk (str): 要翻譯的文字區塊。
 
         Returns:
-            str: 翻譯結果；若發生錯誤則回傳原文字區塊。
+            str: 翻譯結果；翻譯失敗的部分保留原文。
         """
+        if self.translation_memory is None:
+            translated = self._translate_single(chunk)
+            return chunk if translated is None else translated
+        sentences = self.split_into_sentences(chunk)
+        return " ".join(s if t is None else t for s, t in zip(sentences, self.translate_sentences(sentences)))
+
+    def _translate_single(self, chunk):
+        """翻譯單一區塊；失敗時回傳 None"""
         try:
             result = self.translator(chunk, max_length=512)
             return result[0]["translation_text"]
         except Exception as e:
             print(f"翻譯錯誤: {str(e)}")
             print(f"問題文本: {chunk}")
-            return chunk
+            return None
 
-    def post_process_chinese(self, text):
+    def post_process_chinese(self, text, line_breaks=True):
         """
         後處理中文文字（移除多餘空格、調整標點符號、添加換行）
 
         Args:
             text (str): 中文文字。
+            line_breaks (bool): 是否在標點後換行（逐片段翻譯時為 False，每個片段保持一行）。
 
         Returns:
             str: 處理後的中文文字。
@@ -160,44 +424,230 @@ class SpeechTranslator:
         text = text.replace(" .", "。")
         text = text.replace(" ?", "？")
         text = text.replace(" !", "！")
+        if not line_breaks:
+            return text
         text = text.replace("，", "，\n")
         text = text.replace("。", "。\n")
         text = text.replace("？", "？\n")
         text = text.replace("！", "！\n")
         return text
 
-    def translate_text(self, input_text, batch_size=3):
+    def count_tokens(self, texts):
+        """
+        計算每段文字經翻譯模型 tokenizer 編碼後的 token 數
+
+        Args:
+            texts (list): 文字列表。
+
+        Returns:
+            list: 各段文字的 token 數。
+        """
+        if not texts:
+            return []
+        tokenizer = getattr(self.translator, "tokenizer", None)
+        if tokenizer is None:
+            return [len(t.split()) + 1 for t in texts]
+        return [len(ids) for ids in tokenizer(list(texts))["input_ids"]]
+
+    def pack_sentences(self, sentences, max_tokens=256):
+        """
+        依 token 數將句子合併為區塊，每個區塊不超過 max_tokens；
+        單句超過上限時先依字詞切開，避免翻譯時被截斷
+
+        Args:
+            sentences (list): 分句後的文字列表。
+            max_tokens (int): 每個區塊的 token 上限。
+
+        Returns:
+            list: 合併後的文字區塊。
+        """
+        pieces = []
+        for sentence, n_tokens in zip(sentences, self.count_tokens(sentences)):
+            if n_tokens <= max_tokens:
+                pieces.append((sentence, n_tokens))
+                continue
+            n_parts = -(-n_tokens // max_tokens)
+            words = sentence.split(" ") if " " in sentence else list(sentence)
+            sep = " " if " " in sentence else ""
+            while True:
+                step = -(-len(words) // n_parts)
+                parts = [sep.join(words[i : i + step]) for i in range(0, len(words), step)]
+                counts = self.count_tokens(parts)
+                # 每個部分各自加上結尾等特殊 token，子詞切分也不一定平均，仍超過上限時切得更細（單一字詞無法再切）
+                if max(counts) <= max_tokens or step == 1:
+                    break
+                n_parts = max(n_parts + 1, -(-n_parts * max(counts) // max_tokens))
+            pieces.extend(zip(parts, counts))
+
+        chunks = []
+        current, current_tokens = [], 0
+        for piece, n_tokens in pieces:
+            if current and current_tokens + n_tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += n_tokens
+        if current:
+            chunks.append(" ".join(current))
+        return chunks
+
+    @_holding("translator")
+    def translate_batch(self, chunks, batch_size=8):
+        """
+        批次翻譯多個文字區塊：依 token 數排序後分桶送入 pipeline 以減少 padding，
+        完成後還原為原本順序
+
+        Args:
+            chunks (list): 要翻譯的文字區塊。
+            batch_size (int): 每次送入模型的區塊數。
+
+        Returns:
+            list: 與 chunks 順序相同的翻譯結果；某一批失敗時改為逐一翻譯，仍然失敗的區塊為 None。
+        """
+        lengths = self.count_tokens(chunks)
+        get_metrics().add(input_tokens=sum(lengths))
+        order = sorted(range(len(chunks)), key=lambda i: lengths[i])
+        translated = [None] * len(chunks)
+        for start in range(0, len(order), batch_size):
+            bucket = order[start : start + batch_size]
+            texts = [chunks[i] for i in bucket]
+            try:
+                results = self.translator(texts, batch_size=len(texts), max_length=512)
+                outputs = [r["translation_text"] for r in results]
+            except Exception as e:
+                print(f"批次翻譯錯誤，改為逐一翻譯: {str(e)}")
+                outputs = [self._translate_single(text) for text in texts]
+            for i, output in zip(bucket, outputs):
+                translated[i] = output
+        return translated
+
+    def translate_sentences(self, sentences, batch_size=8, max_tokens=256):
         """
-        將輸入文字進行翻譯，依 batch_size 分批翻譯
+        逐句翻譯：先查詢翻譯記憶，未命中的句子（去除重複後）一次批次送入模型，再寫回翻譯記憶
+
+        Args:
+            sentences (list): 已由 split_into_sentences 正規化的句子。
+            batch_size (int): 每次送入模型的區塊數。
+            max_tokens (int): 單句超過此 token 數時先切開再翻譯。
+
+        Returns:
+            list: 與 sentences 順序相同的譯文；翻譯失敗的句子為 None（不寫入翻譯記憶）。
+        """
+        memory = self.translation_memory
+        if memory is not None:
+            translations = memory.lookup(self.source_lang, self.target_lang, sentences, self.translator_precision)
+        else:
+            translations = [None] * len(sentences)
+        misses = list(dict.fromkeys(s for s, t in zip(sentences, translations) if t is None))
+        get_metrics().add(tm_hits=len(sentences) - sum(1 for t in translations if t is None))
+        if not misses:
+            return translations
+
+        pieces, owners = [], []
+        for i, sentence in enumerate(misses):
+            for piece in self.pack_sentences([sentence], max_tokens):
+                pieces.append(piece)
+                owners.append(i)
+        parts = [[] for _ in misses]
+        for owner, output in zip(owners, self.translate_batch(pieces, batch_size)):
+            parts[owner].append(output)
+        # 任一部分翻譯失敗時整句視為失敗
+        translated = {
+            sentence: None if None in part else " ".join(part) for sentence, part in zip(misses, parts)
+        }
+
+        if memory is not None:
+            pairs = [(s, t) for s, t in translated.items() if t is not None]
+            memory.update(self.source_lang, self.target_lang, pairs, self.translator_precision)
+        return [t if t is not None else translated[s] for s, t in zip(sentences, translations)]
+
+    @timed("translate_text")
+    @_holding("translator")
+    def translate_text(self, input_text, batch_size=8, max_tokens=256):
+        """
+        將輸入文字進行翻譯：啟用翻譯記憶時逐句查詢並只翻譯未命中的句子，
+        否則依 token 數將句子打包成區塊後整批送入模型
 
         Args:
             input_text (str): 要翻譯的文字。
-            batch_size (int): 每批翻譯的句子數，預設為 3。
+            batch_size (int): 每次送入模型的區塊數，預設為 8。
+            max_tokens (int): 每個區塊的 token 上限，預設為 256。
 
         Returns:
-            str or None: 翻譯後的文字；若發生錯誤則回傳 None。
+            str or None: 翻譯後的文字（翻譯失敗的部分保留原文，且結果不寫入快取）；若發生錯誤則回傳 None。
         """
+        cache_key = None
+        if self.result_cache is not None:
+            key_parts = [hash_text(input_text), self.source_lang, self.target_lang, self.target_traditional, max_tokens]
+            if self.translator_precision != "fp32":
+                # fp32 沿用原本的 key，既有的快取仍然有效
+                key_parts.append(self.translator_precision)
+            cache_key = make_key(*key_parts)
+            cached = self.result_cache.get("translation", cache_key)
+            if cached is not None:
+                get_metrics().annotate(cache_hit=True)
+                return cached
         try:
             sentences = self.split_into_sentences(input_text)
-            translated_parts = []
-
-            for i in range(0, len(sentences), batch_size):
-                batch = sentences[i : i + batch_size]
-                batch_text = " ".join(batch)
-                translation = self.translate_chunk(batch_text)
-                translated_parts.append(translation)
-
-            combined_text = "".join(translated_parts)
-            if self.target_lang == "zh":
-                combined_text = self.post_process_chinese(combined_text)
-                if self.target_traditional:
-                    converter = opencc.OpenCC("s2t")
-                    combined_text = converter.convert(combined_text)
+            get_metrics().annotate(sentences=len(sentences), characters=len(input_text))
+            if self.translation_memory is not None:
+                sources = sentences
+                translated_parts = self.translate_sentences(sentences, batch_size, max_tokens)
+            else:
+                sources = self.pack_sentences(sentences, max_tokens)
+                translated_parts = self.translate_batch(sources, batch_size)
+
+            failed = sum(1 for part in translated_parts if part is None)
+            combined_text = self._finish_translation(
+                " ".join(source if part is None else part for source, part in zip(sources, translated_parts))
+            )
+            if failed:
+                # 失敗的部分以原文代替，只回傳給呼叫端，不寫入快取，下次重新翻譯
+                print(f"有 {failed} 段翻譯失敗，以原文代替（結果不寫入快取）")
+                get_metrics().annotate(status="partial", failed=failed)
+            elif cache_key is not None:
+                self.result_cache.put("translation", cache_key, combined_text)
             return combined_text
         except Exception as e:
             print(f"翻譯過程發生錯誤: {str(e)}")
+            get_metrics().annotate(status="error", error=str(e))
             return None
 
+    def _finish_translation(self, text, line_breaks=True):
+        """目標語言為中文時整理標點，並視需要轉為繁體"""
+        if self.target_lang == "zh":
+            text = self.post_process_chinese(text, line_breaks)
+            if self.target_traditional:
+                import opencc
+                converter = opencc.OpenCC("s2t")
+                text = converter.convert(text)
+        return text
+
+    @timed("translate_segments")
+    @_holding("translator")
+    def translate_segments(self, texts, batch_size=8, max_tokens=256):
+        """
+        逐片段翻譯（例如 Transcript 中編輯過的片段）：所有片段的句子合併為一批翻譯，
+        再依片段拼回，每個片段的譯文保持一行
+
+        Args:
+            texts (list): 各片段的原文。
+            batch_size (int): 每次送入模型的區塊數。
+            max_tokens (int): 單句超過此 token 數時先切開再翻譯。
+
+        Returns:
+            list: 與 texts 順序相同的譯文；任一句翻譯失敗的片段為 None。
+        """
+        groups = [self.split_into_sentences(text) for text in texts]
+        sentences = [sentence for group in groups for sentence in group]
+        get_metrics().annotate(segments=len(texts), sentences=len(sentences))
+        translated = iter(self.translate_sentences(sentences, batch_size, max_tokens) if sentences else [])
+        results = []
+        for group in groups:
+            parts = [next(translated) for _ in group]
+            results.append(None if None in parts else self._finish_translation(" ".join(parts), line_breaks=False))
+        return results
+
     @staticmethod
     def format_output(text):
         """
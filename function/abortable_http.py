@@ -0,0 +1,96 @@
+# function/abortable_http.py
+import socket
+import threading
+
+import httpcore
+import httpx
+
+
+class AbortableBackend(httpcore.SyncBackend):
+    """
+    記錄建立的 socket 的 httpcore 網路層；abort() 以 shutdown 喚醒其他執行緒中阻塞的讀取
+    （單純 close 無法中斷進行中的 recv，要等伺服器送出下一筆資料才會返回）
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._sockets = []
+        self._lock = threading.Lock()
+        self.aborted = False
+
+    def connect_tcp(self, *args, **kwargs):
+        stream = super().connect_tcp(*args, **kwargs)
+        with self._lock:
+            self._sockets.append(stream.get_extra_info("socket"))
+        if self.aborted:
+            self.abort()
+        return stream
+
+    def abort(self):
+        self.aborted = True
+        with self._lock:
+            sockets = list(self._sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def _httpx_error(error, request):
+    # httpcore 與 httpx 的例外同名（ConnectError、ReadError 等），轉換後呼叫端只需處理 httpx 的例外
+    return getattr(httpx, type(error).__name__, httpx.TransportError)(str(error), request=request)
+
+
+class _ResponseStream(httpx.SyncByteStream):
+    def __init__(self, response, request):
+        self._response = response
+        self._request = request
+
+    def __iter__(self):
+        try:
+            yield from self._response.stream
+        except (httpcore.NetworkError, httpcore.TimeoutException, httpcore.ProtocolError) as e:
+            raise _httpx_error(e, self._request) from e
+
+    def close(self):
+        self._response.close()
+
+
+class AbortableTransport(httpx.BaseTransport):
+    """
+    可從其他執行緒中止的 httpx transport：以 httpcore 的公開 API（ConnectionPool 與自訂的網路層）送出請求，
+    abort() 立即中斷所有進行中的請求，包含尚未收到回應標頭的請求
+
+    不處理 proxy 與環境變數中的連線設定，適用於本機或區域網路的伺服器（例如 Ollama）。
+    """
+
+    def __init__(self):
+        self.backend = AbortableBackend()
+        self._pool = httpcore.ConnectionPool(network_backend=self.backend)
+
+    @property
+    def aborted(self):
+        return self.backend.aborted
+
+    def abort(self):
+        self.backend.abort()
+
+    def handle_request(self, request):
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(scheme=request.url.raw_scheme, host=request.url.raw_host, port=request.url.port,
+                             target=request.url.raw_path),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        try:
+            response = self._pool.handle_request(core_request)
+        except (httpcore.NetworkError, httpcore.TimeoutException, httpcore.ProtocolError) as e:
+            raise _httpx_error(e, request) from e
+        return httpx.Response(status_code=response.status, headers=response.headers,
+                              stream=_ResponseStream(response, request), extensions=response.extensions)
+
+    def close(self):
+        self._pool.close()
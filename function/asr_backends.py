@@ -0,0 +1,311 @@
+# function/asr_backends.py
+import abc
+import importlib.util
+import inspect
+import os
+import random
+import zlib
+from function.quantization import FP32, INT8_DYNAMIC, default_precision, is_cuda_device
+
+SAMPLE_RATE = 16000  # whisper.audio.SAMPLE_RATE，避免只為常數載入 whisper
+
+# 各 Whisper 模型的參數數量，用於載入前估算所需的記憶體
+WHISPER_PARAMS = {
+    "tiny": 39e6, "base": 74e6, "small": 244e6, "medium": 769e6, "large": 1550e6, "turbo": 809e6,
+}
+WHISPER_MODELS = ("tiny", "tiny.en", "base", "base.en", "small", "small.en", "medium", "medium.en", "large")
+
+
+def make_segment(index, start, end, text):
+    """所有後端共用的片段格式：id、start、end（秒）與 text"""
+    return {"id": index, "start": round(float(start), 2), "end": round(float(end), 2), "text": text}
+
+
+def whisper_params(model_name):
+    """依模型名稱（如 "small.en"、"large-v3"）查詢參數數量；未知的模型回傳 0"""
+    return WHISPER_PARAMS.get(model_name.split(".")[0].split("-")[0], 0)
+
+
+class ASRModel(abc.ABC):
+    """
+    已載入的語音辨識模型，所有後端提供相同的介面：
+      - transcribe(audio, **options) 回傳與 whisper.transcribe 相同格式的 {"text", "segments", "language"}，
+        每個片段只包含 id、start、end（秒，相對於 audio 開頭）與 text
+      - stream_segments(audio, **options) 逐一產生片段；預設以固定長度的視窗重複呼叫 transcribe
+      - model 為後端原本的模型物件，weight_bytes() 為權重佔用的記憶體
+    """
+
+    def __init__(self, model, model_name):
+        self.model = model
+        self.model_name = model_name
+
+    @abc.abstractmethod
+    def transcribe(self, audio, **options):
+        """
+        Args:
+            audio: 16 kHz float32 PCM 或音訊檔路徑。
+            **options: 解碼選項（language、initial_prompt 等，後端不支援的選項會被忽略）。
+
+        Returns:
+            dict: {"text", "segments", "language"}，片段由 make_segment 產生。
+        """
+
+    def weight_bytes(self):
+        from function.model_pool import estimate_model_bytes
+        return estimate_model_bytes(self.model)
+
+    def stream_segments(self, audio, window_seconds=30, **options):
+        """
+        逐段解碼並立即產生片段：每次解碼 window_seconds 長度的音訊，保留完整的片段，
+        視窗尾端可能被截斷的最後一個片段留到下一個視窗（從該片段開始處）重新解碼
+
+        Args:
+            audio (np.ndarray): 16 kHz float32 PCM。
+            window_seconds (int): 每次解碼的音訊長度（秒）。
+            **options: 傳給 transcribe 的選項。
+
+        Yields:
+            dict: 片段，時間相對於 audio 開頭。
+        """
+        window = int(window_seconds * SAMPLE_RATE)
+        options = dict(options)
+        index = 0
+        offset = 0
+        while offset < len(audio):
+            piece = audio[offset : offset + window]
+            is_last = offset + window >= len(audio)
+            result = self.transcribe(piece, **options)
+            options.setdefault("language", result.get("language"))
+            decoded = [seg for seg in result["segments"] if seg["text"].strip()]
+            if not is_last and len(decoded) > 1:
+                next_offset = offset + int(decoded[-1]["start"] * SAMPLE_RATE)
+                decoded = decoded[:-1]
+            else:
+                next_offset = offset + window
+            for seg in decoded:
+                yield make_segment(index, offset / SAMPLE_RATE + seg["start"], offset / SAMPLE_RATE + seg["end"], seg["text"])
+                index += 1
+            if decoded:
+                options["initial_prompt"] = "".join(seg["text"] for seg in decoded)[-200:]
+            offset = max(next_offset, offset + SAMPLE_RATE)
+
+
+class ASRBackend(abc.ABC):
+    """
+    語音辨識後端：負責載入模型（load）、解碼音訊檔（load_audio），並決定實際使用的精度與估算記憶體
+    """
+
+    name = None
+    label = None
+    models = WHISPER_MODELS
+    # 未安裝時提示的套件名稱；None 表示不需額外套件
+    requires = None
+
+    def is_available(self):
+        return self.requires is None or importlib.util.find_spec(self.requires.replace("-", "_")) is not None
+
+    @abc.abstractmethod
+    def load(self, model_name, device, precision):
+        """
+        Args:
+            model_name (str): 模型名稱。
+            device (str): 推論裝置（"cpu"、"cuda"）。
+            precision (str): 已由 resolve_precision 決定的精度。
+
+        Returns:
+            ASRModel: 已載入的模型。
+        """
+
+    def load_audio(self, audio_file):
+        """將音訊檔解碼為 16 kHz float32 單聲道 PCM（透過 ffmpeg）"""
+        import whisper
+        return whisper.load_audio(audio_file)
+
+    def resolve_precision(self, precision, device):
+        return precision or default_precision()
+
+    def estimate_bytes(self, model_name, precision):
+        """載入前估算模型佔用的記憶體（位元組）"""
+        return 0
+
+
+class WhisperASRModel(ASRModel):
+    def transcribe(self, audio, **options):
+        result = self.model.transcribe(audio, **options)
+        segments = [make_segment(i, seg["start"], seg["end"], seg["text"]) for i, seg in enumerate(result["segments"])]
+        return {"text": result["text"], "segments": segments, "language": result.get("language")}
+
+
+class WhisperBackend(ASRBackend):
+    """openai-whisper（PyTorch）：支援 fp16（GPU）與 int8-dynamic（CPU，見 function.quantization）"""
+
+    name = "whisper"
+    label = "Whisper (PyTorch)"
+
+    def load(self, model_name, device, precision):
+        import whisper
+        from function.model_prefetch import get_model_prefetcher
+        # 權重正在背景預先下載時等待其完成，避免同時下載兩份
+        get_model_prefetcher().wait(("whisper", model_name))
+        if precision == INT8_DYNAMIC:
+            from function.quantization import load_quantized_whisper
+            return WhisperASRModel(load_quantized_whisper(model_name), model_name)
+        model = whisper.load_model(model_name, device=device)
+        if precision == "fp16":
+            # CPU 上的 fp16 運算不是所有 kernel 都支援而且更慢；resolve_precision 已改用 fp32，這裡再防止直接呼叫的情況
+            if is_cuda_device(device):
+                model = model.half()
+            else:
+                print(f"fp16 僅支援 CUDA，Whisper {model_name} 在裝置 {device} 上以 fp32 執行")
+        return WhisperASRModel(model, model_name)
+
+    def resolve_precision(self, precision, device):
+        from function.quantization import resolve_precision
+        return resolve_precision(precision, device)
+
+    def estimate_bytes(self, model_name, precision):
+        from function.quantization import INT8_SIZE_RATIO
+        ratio = {"fp16": 0.5, INT8_DYNAMIC: INT8_SIZE_RATIO}.get(precision, 1)
+        return int(whisper_params(model_name) * 4 * ratio)
+
+
+class FasterWhisperASRModel(ASRModel):
+    def __init__(self, model, model_name, precision):
+        super().__init__(model, model_name)
+        self.precision = precision
+
+    def _segments(self, audio, options):
+        # faster-whisper 預設 beam_size=5；未指定時與 openai-whisper 的預設相同，使用 greedy 解碼
+        accepted = inspect.signature(self.model.transcribe).parameters
+        options = {key: value for key, value in options.items() if key in accepted}
+        options.setdefault("beam_size", 1)
+        return self.model.transcribe(audio, **options)
+
+    def transcribe(self, audio, **options):
+        segments, info = self._segments(audio, options)
+        segments = [make_segment(i, seg.start, seg.end, seg.text) for i, seg in enumerate(segments)]
+        return {"text": "".join(seg["text"] for seg in segments), "segments": segments, "language": info.language}
+
+    def stream_segments(self, audio, window_seconds=30, **options):
+        # faster-whisper 的 transcribe 回傳 generator，每個片段解碼完成即產生，不需另外切視窗
+        segments, _ = self._segments(audio, options)
+        index = 0
+        for seg in segments:
+            if seg.text.strip():
+                yield make_segment(index, seg.start, seg.end, seg.text)
+                index += 1
+
+    def weight_bytes(self):
+        return int(whisper_params(self.model_name) * FasterWhisperBackend.BYTES_PER_PARAM.get(self.precision, 4))
+
+
+class FasterWhisperBackend(ASRBackend):
+    """faster-whisper（CTranslate2）：CPU 上的 int8 推論明顯快於 openai-whisper，需另外安裝 faster-whisper"""
+
+    name = "faster-whisper"
+    label = "faster-whisper (CTranslate2)"
+    models = WHISPER_MODELS + ("large-v3", "distil-large-v3", "turbo")
+    requires = "faster-whisper"
+    COMPUTE_TYPES = {FP32: "float32", "fp16": "float16", INT8_DYNAMIC: "int8"}
+    BYTES_PER_PARAM = {FP32: 4, "fp16": 2, INT8_DYNAMIC: 1}
+
+    def load(self, model_name, device, precision):
+        from faster_whisper import WhisperModel
+        compute_type = self.COMPUTE_TYPES.get(precision, "default")
+        return FasterWhisperASRModel(WhisperModel(model_name, device=device, compute_type=compute_type), model_name, precision)
+
+    def load_audio(self, audio_file):
+        from faster_whisper import decode_audio
+        return decode_audio(audio_file, sampling_rate=SAMPLE_RATE)
+
+    def estimate_bytes(self, model_name, precision):
+        return int(whisper_params(model_name) * self.BYTES_PER_PARAM.get(precision, 4))
+
+
+class FakeASRModel(ASRModel):
+    """
+    決定性的假辨識模型（測試用，不需要 torch 與 Whisper 權重）：以能量 VAD 找出語音區段，
+    每個區段依模型名稱與區段位置產生固定的英文字詞（每秒約 2.5 個字）
+    """
+
+    WORDS = ("the", "meeting", "will", "start", "with", "a", "short", "review", "of", "last", "week", "and",
+             "then", "we", "discuss", "next", "steps", "for", "project", "team")
+    WORDS_PER_SECOND = 2.5
+
+    def transcribe(self, audio, **options):
+        from function.vad import detect_speech_regions
+        if isinstance(audio, str):
+            audio = FakeBackend().load_audio(audio)
+        segments = []
+        for start, end in detect_speech_regions(audio, SAMPLE_RATE):
+            rng = random.Random(zlib.crc32(f"{self.model_name}:{start}:{end}".encode("utf-8")))
+            n_words = max(1, int((end - start) / SAMPLE_RATE * self.WORDS_PER_SECOND))
+            text = " " + " ".join(rng.choice(self.WORDS) for _ in range(n_words)).capitalize() + "."
+            segments.append(make_segment(len(segments), start / SAMPLE_RATE, end / SAMPLE_RATE, text))
+        return {
+            "text": "".join(seg["text"] for seg in segments),
+            "segments": segments,
+            "language": options.get("language") or "en",
+        }
+
+    def weight_bytes(self):
+        return 0
+
+
+class FakeBackend(ASRBackend):
+    """決定性的假辨識後端：不載入任何模型，供測試與介面流程演練使用"""
+
+    name = "fake"
+    label = "Fake（測試用）"
+
+    def load(self, model_name, device, precision):
+        return FakeASRModel(None, model_name)
+
+    def load_audio(self, audio_file):
+        # WAV 以標準函式庫讀取（不需要 ffmpeg），其他格式交給 whisper.load_audio
+        if not audio_file.lower().endswith(".wav"):
+            return super().load_audio(audio_file)
+        import wave
+        import numpy as np
+        with wave.open(audio_file, "rb") as f:
+            if f.getsampwidth() != 2 or f.getframerate() != SAMPLE_RATE:
+                return super().load_audio(audio_file)
+            frames = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+            channels = f.getnchannels()
+        return frames.reshape(-1, channels).mean(axis=1).astype(np.float32) / 32768.0
+
+    def resolve_precision(self, precision, device):
+        return FP32
+
+
+BACKENDS = {backend.name: backend for backend in (WhisperBackend(), FasterWhisperBackend(), FakeBackend())}
+DEFAULT_BACKEND = WhisperBackend.name
+
+
+def default_backend_name():
+    """環境變數 VOICEFLOW_ASR_BACKEND 設定的預設辨識後端；未設定、未知或未安裝時為 whisper"""
+    name = os.environ.get("VOICEFLOW_ASR_BACKEND") or DEFAULT_BACKEND
+    backend = BACKENDS.get(name)
+    if backend is None or not backend.is_available():
+        print(f"辨識引擎 {name} 無法使用（未知或未安裝 {getattr(backend, 'requires', name)}），改用 {DEFAULT_BACKEND}")
+        return DEFAULT_BACKEND
+    return name
+
+
+def get_backend(name=None):
+    """
+    依名稱取得辨識後端
+
+    Args:
+        name (str): "whisper"、"faster-whisper" 或 "fake"；None 表示使用 default_backend_name()。
+
+    Returns:
+        ASRBackend: 辨識後端。
+    """
+    name = name or default_backend_name()
+    if name not in BACKENDS:
+        raise ValueError(f"未知的辨識引擎 {name}（可用: {', '.join(BACKENDS)}）")
+    backend = BACKENDS[name]
+    if not backend.is_available():
+        raise RuntimeError(f"辨識引擎 {name} 需要安裝 {backend.requires}（pip install {backend.requires}）")
+    return backend
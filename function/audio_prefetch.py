@@ -0,0 +1,140 @@
+# function/audio_prefetch.py
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+from function.result_cache import hash_file
+
+SAMPLE_RATE = 16000
+
+
+def _decode(file_path):
+    import whisper
+    return whisper.load_audio(file_path, sr=SAMPLE_RATE)
+
+
+class AudioPrefetcher:
+    """
+    批次轉換時在背景預先解碼後續檔案：
+      - 背景執行緒以 ffmpeg 將接下來的檔案解碼為 16 kHz float32 PCM，寫成 .npy
+      - 取用時以 memory-map 載入，不需再複製一份音訊資料；陣列的 source_hash 為原檔案的雜湊，
+        結果快取的 key 與直接傳入檔案路徑時相同
+      - 結果已在快取中的檔案（is_cached 回傳 True）不解碼，取用時直接回傳檔案路徑
+      - 已解碼但尚未取用的音訊以檔案數與總秒數限制，避免佔用過多記憶體與磁碟
+    """
+
+    def __init__(self, files, max_files=2, max_seconds=None, temp_dir=None, is_cached=None):
+        """
+        Args:
+            files (list): 依處理順序排列的音訊檔案路徑。
+            max_files (int): 最多預先解碼（尚未取用）的檔案數。
+            max_seconds (float): 預先解碼音訊的總秒數上限；None 時讀取環境變數
+                VOICEFLOW_PREFETCH_SECONDS（預設 1800）。至少會預先解碼一個檔案。
+            temp_dir (str): 存放 .npy 的目錄；None 表示使用系統暫存目錄。
+            is_cached (callable): is_cached(file_path) 為 True 時略過解碼（例如
+                SpeechTranslator.has_cached_transcription）。
+        """
+        self.files = list(files)
+        self.max_files = max_files
+        if max_seconds is None:
+            max_seconds = float(os.environ.get("VOICEFLOW_PREFETCH_SECONDS", 1800))
+        self.max_seconds = max_seconds
+        self.is_cached = is_cached
+        self._dir = tempfile.mkdtemp(prefix="voiceflow-prefetch-", dir=temp_dir)
+        self._ready = {}  # file_path -> deque of (npy_path, seconds, file_hash)、None（已快取）或 Exception
+        self._ready_count = 0
+        self._ready_seconds = 0.0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        for index, file_path in enumerate(self.files):
+            with self._cond:
+                while not self._closed and self._ready_count and (
+                    self._ready_count >= self.max_files or self._ready_seconds >= self.max_seconds
+                ):
+                    self._cond.wait()
+                if self._closed:
+                    return
+            try:
+                if self.is_cached is not None and self.is_cached(file_path):
+                    entry = None
+                else:
+                    import numpy as np
+                    file_hash = hash_file(file_path)
+                    audio = _decode(file_path)
+                    npy_path = os.path.join(self._dir, f"{index}.npy")
+                    np.save(npy_path, audio)
+                    entry = (npy_path, len(audio) / SAMPLE_RATE, file_hash)
+            except Exception as e:
+                entry = e
+            with self._cond:
+                if self._closed:
+                    return
+                self._ready.setdefault(file_path, deque()).append(entry)
+                self._ready_count += 1
+                if isinstance(entry, tuple):
+                    self._ready_seconds += entry[1]
+                self._cond.notify_all()
+
+    def get(self, file_path):
+        """
+        取得檔案解碼後的 PCM；背景尚未解碼完成時等待
+
+        Returns:
+            np.ndarray or str: 16 kHz float32 PCM（memory-mapped，唯讀，source_hash 為原檔案的雜湊）；
+                結果已快取或不在預取清單中時回傳 file_path，由辨識函式自行查詢快取與解碼。
+        """
+        with self._cond:
+            if file_path in self.files and not self._closed:
+                while not self._ready.get(file_path) and not self._closed:
+                    self._cond.wait()
+            queue = self._ready.get(file_path)
+            if not queue:
+                entry = None
+            else:
+                entry = queue.popleft()
+                self._ready_count -= 1
+                if isinstance(entry, tuple):
+                    self._ready_seconds -= entry[1]
+                self._cond.notify_all()
+        if entry is None:
+            return file_path
+        if isinstance(entry, Exception):
+            raise entry
+        import numpy as np
+        audio = np.load(entry[0], mmap_mode="r")
+        audio.source_hash = entry[2]
+        try:
+            os.remove(entry[0])  # 已 mmap 的檔案在 POSIX 上可先刪除，資料保留到映射關閉為止
+        except OSError:
+            pass
+        return audio
+
+    def wrap(self, fn):
+        """
+        包裝辨識函式：fn(file_path) 改為以預先解碼的 PCM 呼叫
+
+        Args:
+            fn (callable): 接收音訊（路徑或 PCM 陣列）的函式，例如 SpeechTranslator.speech_to_text。
+
+        Returns:
+            callable: 接收檔案路徑的函式。
+        """
+        def run(file_path, *args, **kwargs):
+            return fn(self.get(file_path), *args, **kwargs)
+        return run
+
+    def close(self):
+        """停止預取並刪除暫存檔"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        shutil.rmtree(self._dir, ignore_errors=True)
@@ -0,0 +1,584 @@
+# function/metrics.py
+import atexit
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+from function.result_cache import default_cache_dir
+
+# Prometheus 直方圖的耗時分級（秒）
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+# 批次狀態列的操作名稱
+OPERATION_LABELS = {
+    "speech_to_text": "辨識",
+    "translate_text": "翻譯",
+    "generate_summary": "總結",
+    "model_load": "載入模型",
+}
+
+
+def peak_rss_bytes():
+    """目前程序的最大常駐記憶體（位元組）；Linux 讀取 /proc 的 VmHWM，其他平台使用 getrusage"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _mach_resident_bytes():
+    # macOS：以 task_info(MACH_TASK_BASIC_INFO) 取得目前的常駐記憶體（getrusage 只有峰值）
+    import ctypes
+    import ctypes.util
+
+    class MachTaskBasicInfo(ctypes.Structure):
+        _pack_ = 4
+        _fields_ = [("virtual_size", ctypes.c_uint64), ("resident_size", ctypes.c_uint64),
+                    ("resident_size_max", ctypes.c_uint64), ("user_time", ctypes.c_int32 * 2),
+                    ("system_time", ctypes.c_int32 * 2), ("policy", ctypes.c_int32), ("suspend_count", ctypes.c_int32)]
+
+    libc = ctypes.CDLL(ctypes.util.find_library("c"))
+    info = MachTaskBasicInfo()
+    count = ctypes.c_uint32(ctypes.sizeof(info) // 4)
+    task = ctypes.c_uint32.in_dll(libc, "mach_task_self_")
+    if libc.task_info(task, 20, ctypes.byref(info), ctypes.byref(count)) != 0:  # 20 = MACH_TASK_BASIC_INFO
+        return 0
+    return info.resident_size
+
+
+def _windows_working_set_bytes():
+    # Windows：以 GetProcessMemoryInfo 取得工作集大小
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in (
+                "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage",
+            )
+        ]
+
+    kernel32, psapi = ctypes.WinDLL("kernel32"), ctypes.WinDLL("psapi")
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return 0
+    return counters.WorkingSetSize
+
+
+def current_rss_bytes():
+    """
+    目前程序的常駐記憶體（位元組）：Linux 讀取 /proc 的 VmRSS，其他平台優先使用 psutil（有安裝時），
+    否則 macOS 使用 task_info、Windows 使用 GetProcessMemoryInfo；都無法取得時回傳 0
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        if sys.platform == "darwin":
+            return _mach_resident_bytes()
+        if sys.platform == "win32":
+            return _windows_working_set_bytes()
+    except (OSError, AttributeError, ValueError):
+        pass
+    return 0
+
+
+def gpu_peak_bytes():
+    """已初始化 CUDA 時回傳 torch 配置過的最大 GPU 記憶體，否則回傳 None（不會為此載入 torch）"""
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_initialized():
+        return None
+    return torch.cuda.max_memory_allocated()
+
+
+class OperationStats:
+    """單一操作的累計統計"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.cache_hits = 0
+        self.audio_seconds = 0.0
+        self.audio_op_seconds = 0.0  # 有音訊長度的事件的耗時，用於計算整體即時率
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.last_rtf = None
+
+    def add(self, event):
+        self.count += 1
+        self.seconds += event["seconds"]
+        if event.get("status") == "error":
+            self.errors += 1
+        if event.get("cache_hit"):
+            self.cache_hits += 1
+        if event.get("audio_seconds"):
+            self.audio_seconds += event["audio_seconds"]
+            self.audio_op_seconds += event["seconds"]
+            self.last_rtf = event.get("rtf")
+        self.input_tokens += event.get("input_tokens") or 0
+        self.output_tokens += event.get("output_tokens") or 0
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if event["seconds"] <= bound:
+                self.buckets[i] += 1
+
+    def copy(self):
+        stats = OperationStats()
+        stats.__dict__.update(self.__dict__, buckets=list(self.buckets))
+        return stats
+
+
+class MetricsRecorder:
+    """
+    計時與指標記錄：
+      - timer() / @timed 量測一次操作的耗時，呼叫期間可用 annotate()、add()、phase() 補充音訊長度、
+        token 數、快取命中與各階段耗時
+      - 每個事件（含即時率與程序的記憶體峰值）以一行 JSON 寫入自動輪替的日誌
+      - 累計統計可輸出為 Prometheus 文字格式（檔案或 HTTP 端點），並可產生給批次狀態列的摘要
+      - 工作程序的事件可經由佇列轉交主程序的記錄器（見 WorkerMetricsListener）
+    """
+
+    def __init__(self, log_path=None, prometheus_path=None, max_bytes=10 * 2**20, backup_count=5, enabled=True,
+                 prometheus_interval=1.0, forward_queue=None):
+        """
+        Args:
+            log_path (str): JSONL 日誌路徑；None 表示不寫日誌。同一個檔案只能由一個程序寫入（輪替不支援多程序）。
+            prometheus_path (str): Prometheus 文字檔路徑（例如給 node_exporter 的 textfile collector）；None 表示不寫入。
+            max_bytes (int): 日誌檔超過此大小時輪替。
+            backup_count (int): 保留的舊日誌檔數量。
+            enabled (bool): False 時不記錄任何事件。
+            prometheus_interval (float): Prometheus 文字檔最多每幾秒寫入一次，期間的事件合併到下一次寫入。
+            forward_queue (multiprocessing.Queue): 另外將每個事件放入此佇列，交給主程序的 WorkerMetricsListener。
+        """
+        self.enabled = enabled
+        self.forward_queue = forward_queue
+        self.prometheus_path = prometheus_path
+        self.prometheus_interval = prometheus_interval
+        self.stats = {}
+        self.peak_rss = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._write_timer = None
+        self._last_write = 0.0
+        self._local = threading.local()
+        self._server = None
+        self._logger = None
+        if enabled and log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.getLogger(f"voiceflow.metrics.{id(self)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(handler)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def timer(self, operation, concurrent=False, **fields):
+        """
+        量測 with 區塊的耗時並記錄為一個事件；區塊拋出例外時事件的 status 為 "error"
+
+        Args:
+            operation (str): 操作名稱，例如 "speech_to_text"。
+            concurrent (bool): 在同一執行緒中與其他操作交錯進行（asyncio）時設為 True，
+                此時 annotate()、add() 不會作用在這個事件上，請直接修改 yield 的 dict。
+            **fields: 事件的其他欄位。
+
+        Yields:
+            dict: 事件欄位，可在區塊中補充。
+        """
+        info = dict(fields)
+        stack = self._stack()
+        if not concurrent:
+            stack.append(info)
+        start = time.perf_counter()
+        try:
+            yield info
+        except BaseException as e:
+            info["status"] = "error"
+            info.setdefault("error", str(e) or type(e).__name__)
+            raise
+        finally:
+            if not concurrent:
+                stack.remove(info)
+            self.record(operation, time.perf_counter() - start, **info)
+
+    def annotate(self, **fields):
+        """設定目前執行緒中最內層 timer 事件的欄位；沒有進行中的 timer 時不做任何事"""
+        stack = self._stack()
+        if stack:
+            stack[-1].update(fields)
+
+    def add(self, **counts):
+        """累加目前執行緒中最內層 timer 事件的數值欄位（例如 input_tokens）"""
+        stack = self._stack()
+        if stack:
+            for key, value in counts.items():
+                stack[-1][key] = (stack[-1].get(key) or 0) + value
+
+    @contextmanager
+    def phase(self, name):
+        """將 with 區塊的耗時累加到目前 timer 事件的 name 欄位（例如 "decode_seconds"）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(**{name: round(time.perf_counter() - start, 4)})
+
+    def record(self, operation, seconds, **fields):
+        """
+        記錄一個已完成的事件
+
+        Args:
+            operation (str): 操作名稱。
+            seconds (float): 耗時（秒）。
+            **fields: 其他欄位；audio_seconds 存在時會計算即時率 rtf（耗時 / 音訊長度）。
+
+        Returns:
+            dict: 記錄的事件；停用時回傳 None。
+        """
+        if not self.enabled:
+            return None
+        event = {"time": round(time.time(), 3), "pid": os.getpid(), "operation": operation,
+                 "seconds": round(seconds, 4), "status": "ok"}
+        event.update(fields)
+        if event.get("audio_seconds"):
+            event["rtf"] = round(seconds / event["audio_seconds"], 4)
+        rss = peak_rss_bytes()
+        event["peak_rss_mb"] = round(rss / 2**20, 1)
+        gpu = gpu_peak_bytes()
+        if gpu is not None:
+            event["gpu_peak_mb"] = round(gpu / 2**20, 1)
+        with self._lock:
+            self.peak_rss = max(self.peak_rss, rss)
+        if self.forward_queue is not None:
+            self.forward_queue.put(event)
+        return self.ingest(event)
+
+    def ingest(self, event):
+        """
+        記錄一個已建立的事件（例如工作程序轉交的事件）：計入累計統計並寫入日誌與 Prometheus 文字檔；
+        記憶體峰值只計算本程序，不受其他程序的事件影響
+
+        Args:
+            event (dict): record() 產生的事件。
+
+        Returns:
+            dict: 記錄的事件；停用時回傳 None。
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            self.stats.setdefault(event["operation"], OperationStats()).add(event)
+        if self._logger is not None:
+            self._logger.info(json.dumps(event, ensure_ascii=False, default=str))
+        if self.prometheus_path:
+            self._schedule_prometheus()
+        return event
+
+    def _schedule_prometheus(self):
+        # 由計時器在背景寫入，距離上次寫入不足 prometheus_interval 秒時延後；已排定時不重複排定
+        with self._lock:
+            if self._write_timer is not None:
+                return
+            delay = max(0.0, self._last_write + self.prometheus_interval - time.monotonic())
+            self._write_timer = threading.Timer(delay, self._scheduled_write)
+            self._write_timer.daemon = True
+            self._write_timer.start()
+
+    def _scheduled_write(self):
+        with self._lock:
+            self._write_timer = None
+            self._last_write = time.monotonic()
+        self.write_prometheus()
+
+    def flush(self):
+        """立即寫入尚未寫入 Prometheus 文字檔的事件（程式結束前由 get_metrics 註冊呼叫）"""
+        with self._lock:
+            timer, self._write_timer = self._write_timer, None
+        if timer is not None:
+            timer.cancel()
+            self.write_prometheus()
+
+    def snapshot(self):
+        """目前各操作累計統計的複本，可作為 format_summary 的起點"""
+        with self._lock:
+            return {operation: stats.copy() for operation, stats in self.stats.items()}
+
+    def format_summary(self, since=None):
+        """
+        產生簡短的文字摘要（例如批次狀態列）
+
+        Args:
+            since (dict): snapshot() 的結果；只計算之後的事件。None 表示從程式啟動開始。
+
+        Returns:
+            str: 例如「辨識 3 次 42.1 秒（RTF 0.12）｜翻譯 3 次 10.2 秒｜快取命中 2｜記憶體峰值 1.2 GB」；沒有事件時為空字串。
+        """
+        since = since or {}
+        parts = []
+        cache_hits = 0
+        for operation, label in OPERATION_LABELS.items():
+            with self._lock:
+                stats = self.stats.get(operation)
+                stats = stats.copy() if stats else None
+            if stats is None:
+                continue
+            base = since.get(operation) or OperationStats()
+            count = stats.count - base.count
+            if count <= 0:
+                continue
+            seconds = stats.seconds - base.seconds
+            text = f"{label} {count} 次 {seconds:.1f} 秒"
+            audio_seconds = stats.audio_seconds - base.audio_seconds
+            if audio_seconds > 0:
+                text += f"（RTF {(stats.audio_op_seconds - base.audio_op_seconds) / audio_seconds:.2f}）"
+            output_tokens = stats.output_tokens - base.output_tokens
+            if output_tokens:
+                text += f"（{output_tokens} tokens）"
+            errors = stats.errors - base.errors
+            if errors:
+                text += f"（失敗 {errors}）"
+            parts.append(text)
+            cache_hits += stats.cache_hits - base.cache_hits
+        if not parts:
+            return ""
+        if cache_hits:
+            parts.append(f"快取命中 {cache_hits}")
+        parts.append(f"記憶體峰值 {self.peak_rss / 2**30:.1f} GB")
+        return "｜".join(parts)
+
+    def prometheus_text(self):
+        """以 Prometheus 文字格式輸出累計統計"""
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP voiceflow_operation_seconds 各操作的耗時（秒）",
+            "# TYPE voiceflow_operation_seconds histogram",
+        ]
+        for operation, stats in sorted(snapshot.items()):
+            for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                lines.append(f'voiceflow_operation_seconds_bucket{{operation="{operation}",le="{bound}"}} {count}')
+            lines.append(f'voiceflow_operation_seconds_bucket{{operation="{operation}",le="+Inf"}} {stats.count}')
+            lines.append(f'voiceflow_operation_seconds_sum{{operation="{operation}"}} {stats.seconds:.4f}')
+            lines.append(f'voiceflow_operation_seconds_count{{operation="{operation}"}} {stats.count}')
+        counters = [
+            ("voiceflow_operation_errors_total", "失敗的操作次數", lambda s: s.errors),
+            ("voiceflow_cache_hits_total", "命中快取的操作次數", lambda s: s.cache_hits),
+            ("voiceflow_audio_seconds_total", "處理的音訊長度（秒）", lambda s: round(s.audio_seconds, 2)),
+        ]
+        for name, help_text, value in counters:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += [f'{name}{{operation="{op}"}} {value(stats)}' for op, stats in sorted(snapshot.items())]
+        lines += ["# HELP voiceflow_tokens_total 輸入與輸出的 token 數", "# TYPE voiceflow_tokens_total counter"]
+        for operation, stats in sorted(snapshot.items()):
+            if stats.input_tokens or stats.output_tokens:
+                lines.append(f'voiceflow_tokens_total{{operation="{operation}",direction="input"}} {stats.input_tokens}')
+                lines.append(f'voiceflow_tokens_total{{operation="{operation}",direction="output"}} {stats.output_tokens}')
+        lines += ["# HELP voiceflow_realtime_factor 最近一次的即時率（耗時 / 音訊長度）", "# TYPE voiceflow_realtime_factor gauge"]
+        lines += [f'voiceflow_realtime_factor{{operation="{op}"}} {stats.last_rtf}'
+                  for op, stats in sorted(snapshot.items()) if stats.last_rtf is not None]
+        lines += ["# HELP voiceflow_peak_rss_bytes 程序的最大常駐記憶體", "# TYPE voiceflow_peak_rss_bytes gauge",
+                  f"voiceflow_peak_rss_bytes {max(self.peak_rss, peak_rss_bytes())}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """
+        寫入 Prometheus 文字檔：先寫入同目錄下名稱唯一的暫存檔再改名，讀取端不會讀到寫到一半的內容，
+        同時寫入的執行緒或程序也不會共用暫存檔
+        """
+        path = path or self.prometheus_path
+        directory = os.path.dirname(os.path.abspath(path))
+        with self._write_lock:
+            part_path = None
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, part_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+                os.chmod(part_path, 0o644)  # mkstemp 建立的檔案只有擁有者可讀，textfile collector 可能以其他使用者執行
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(self.prometheus_text())
+                os.replace(part_path, path)
+            except OSError as e:
+                print(f"無法寫入指標檔案: {str(e)}")
+                if part_path is not None and os.path.exists(part_path):
+                    os.remove(part_path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        在背景執行緒提供 HTTP 端點 /metrics（Prometheus 文字格式）
+
+        Returns:
+            ThreadingHTTPServer: 已啟動的伺服器；port 為 0 時可由 server_address 取得實際埠號。
+        """
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = recorder.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+
+def timed(operation):
+    """裝飾器：以 get_metrics().timer(operation) 量測函式的每次呼叫"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with get_metrics().timer(operation):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class WorkerMetricsListener:
+    """
+    在主程序的背景執行緒接收工作程序經由佇列轉交的事件並交給 recorder.ingest()，
+    平行辨識的事件因此寫入主程序唯一的 metrics.jsonl（可正常輪替），也計入狀態列摘要與 Prometheus 統計
+    """
+
+    def __init__(self, context, recorder=None, linger=1.0):
+        """
+        Args:
+            context: 建立工作程序所用的 multiprocessing context（例如 spawn）。
+            recorder (MetricsRecorder): 接收事件的記錄器；None 表示使用 get_metrics()。
+            linger (float): close() 後繼續等待遲到事件的秒數（工作程序的佇列在背景送出，可能晚於辨識結果到達）。
+        """
+        self.recorder = recorder or get_metrics()
+        self.linger = linger
+        self.queue = context.Queue()
+        self._thread = threading.Thread(target=self._run, name="metrics-listener", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        closing = False
+        while True:
+            try:
+                event = self.queue.get(timeout=self.linger if closing else None)
+            except queue.Empty:
+                break
+            if event is None:
+                closing = True
+            else:
+                self.recorder.ingest(event)
+        self.queue.close()
+
+    def close(self, wait=False):
+        """
+        停止接收事件：背景執行緒處理完佇列中的事件，並在 linger 秒內沒有新事件後結束
+
+        Args:
+            wait (bool): 是否等待背景執行緒結束。
+        """
+        self.queue.put(None)
+        if wait:
+            self._thread.join()
+
+
+def forward_worker_metrics(metrics_queue):
+    """
+    在工作程序中呼叫（例如 ProcessPoolExecutor 的 initializer）：之後 get_metrics() 記錄的事件
+    經由 metrics_queue 轉交主程序的 WorkerMetricsListener，工作程序本身不寫日誌與 Prometheus 檔案
+
+    Args:
+        metrics_queue (multiprocessing.Queue): WorkerMetricsListener.queue；None 表示不轉交。
+    """
+    global _default_metrics
+    if metrics_queue is None:
+        return
+    with _default_lock:
+        _default_metrics = MetricsRecorder(enabled=os.environ.get("VOICEFLOW_METRICS", "1") != "0",
+                                           forward_queue=metrics_queue)
+
+
+_default_metrics = None
+_default_lock = threading.Lock()
+
+
+def get_metrics():
+    """
+    取得程序共用的指標記錄器
+
+    可用環境變數設定：VOICEFLOW_METRICS=0（停用）、VOICEFLOW_METRICS_DIR（存放 metrics.jsonl 與
+    metrics.prom 的目錄，預設為快取目錄下的 metrics）、VOICEFLOW_METRICS_LOG_MB（日誌輪替大小，預設 10）、
+    VOICEFLOW_METRICS_PORT（提供 HTTP /metrics 端點的埠號，未設定時不啟動）。
+    日誌、Prometheus 檔案與端點都由主程序負責：平行辨識的工作程序以 forward_worker_metrics() 將事件轉交主程序，
+    其他子程序只在記憶體中累計統計，不寫入檔案。
+
+    Returns:
+        MetricsRecorder: 指標記錄器。
+    """
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is not None:
+            return _default_metrics
+        if os.environ.get("VOICEFLOW_METRICS", "1") == "0":
+            _default_metrics = MetricsRecorder(enabled=False)
+            return _default_metrics
+        directory = os.environ.get("VOICEFLOW_METRICS_DIR") or os.path.join(default_cache_dir(), "metrics")
+        main_process = multiprocessing.parent_process() is None
+        try:
+            _default_metrics = MetricsRecorder(
+                log_path=os.path.join(directory, "metrics.jsonl") if main_process else None,
+                prometheus_path=os.path.join(directory, "metrics.prom") if main_process else None,
+                max_bytes=int(float(os.environ.get("VOICEFLOW_METRICS_LOG_MB", 10)) * 2**20),
+            )
+        except OSError as e:
+            print(f"無法建立指標日誌: {str(e)}")
+            _default_metrics = MetricsRecorder()
+        atexit.register(_default_metrics.flush)
+        port = os.environ.get("VOICEFLOW_METRICS_PORT")
+        if port and main_process:
+            try:
+                _default_metrics.serve(int(port))
+            except OSError as e:
+                print(f"無法啟動指標端點: {str(e)}")
+        return _default_metrics
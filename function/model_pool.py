@@ -0,0 +1,617 @@
+# function/model_pool.py
+import gc
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from function.asr_backends import get_backend
+from function.metrics import current_rss_bytes, get_metrics
+from function.model_prefetch import get_model_prefetcher
+from function.quantization import FP32, INT8_DYNAMIC, INT8_SIZE_RATIO, resolve_precision
+
+
+def estimate_model_bytes(model):
+    """
+    估算模型權重所佔用的記憶體大小（參數與 buffer 的位元組總和）
+
+    Args:
+        model: torch.nn.Module，或帶有 .model 屬性的物件（例如 transformers pipeline）。
+
+    Returns:
+        int: 估算的位元組數；無法估算時回傳 0。
+    """
+    module = getattr(model, "model", model)
+    try:
+        total = sum(p.numel() * p.element_size() for p in module.parameters())
+        total += sum(b.numel() * b.element_size() for b in module.buffers())
+        # 動態量化的 Linear 層權重存放在 packed params 中，不在 parameters() 之內（weight 為方法而非參數）
+        for child in module.modules():
+            if hasattr(child, "_weight_bias") and callable(getattr(child, "weight", None)):
+                weight, bias = child._weight_bias()
+                total += weight.numel() * weight.element_size()
+                total += bias.numel() * bias.element_size() if bias is not None else 0
+        return total
+    except Exception:
+        return 0
+
+
+class ModelBudgetError(MemoryError):
+    """載入模型會超過 RAM 預算，且在等待時間內沒有其他模型釋放記憶體"""
+
+
+def free_memory():
+    """卸載模型後回收記憶體：執行 GC，已使用 CUDA 時一併釋放 torch 快取的 GPU 記憶體"""
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_initialized():
+        torch.cuda.empty_cache()
+
+
+class ModelPool:
+    """
+    程序層級的模型共用池：
+      - 以 key 區分模型，相同 key 的呼叫者取得同一個已載入的實例
+      - 總大小超過 RAM 預算（或數量上限）時，依 LRU 逐出最久未使用的模型
+      - 以 hold() 標記使用中的模型，使用中的模型不會被逐出或因閒置而卸載
+      - 記錄命中、未命中次數、累計載入時間，以及每個模型的大小、載入時增加的常駐記憶體與最後使用時間
+    """
+
+    def __init__(self, loader, max_bytes=None, max_items=None, size_fn=estimate_model_bytes, name="models",
+                 estimate_fn=None):
+        """
+        Args:
+            loader (callable): 以 key 的各欄位為參數載入模型的函式。
+            max_bytes (int): RAM 預算（位元組）；None 表示不限制。
+            max_items (int): 最多保留的模型數量；None 表示不限制。
+            size_fn (callable): 估算單一模型大小的函式。
+            name (str): 池的名稱，用於日誌輸出。
+            estimate_fn (callable): 載入前以 key 的各欄位估算模型大小（位元組）的函式，供資源管理員判斷是否超過預算。
+        """
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.size_fn = size_fn
+        self.estimate_fn = estimate_fn
+        self.name = name
+        self.manager = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_time = 0.0
+        self._models = OrderedDict()  # key -> (model, size)
+        self._info = {}  # key -> {"rss_bytes", "loaded_at", "last_used", "load_seconds"}
+        self._holds = {}  # key -> 使用中的次數
+        self._key_locks = {}  # key -> [載入鎖, 等待或正在載入的執行緒數]；只保留載入中的 key
+        self._lock = threading.RLock()
+
+    def get(self, *key):
+        """
+        取得 key 對應的模型；若尚未載入則載入並放入池中
+
+        Returns:
+            已載入的模型實例。
+        """
+        model = self._lookup(key)
+        if model is not None:
+            return model
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        # 同一個 key 只允許一個執行緒載入，其餘等待後直接取用；最後一個離開的執行緒移除鎖，
+        # 避免載入過（之後被逐出或卸載）的 key 的鎖一直累積
+        try:
+            with entry[0]:
+                model = self._lookup(key)
+                if model is not None:
+                    return model
+                return self._load(key)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    def _load(self, key):
+        estimate = self.estimate_fn(*key) if self.estimate_fn else 0
+        if self.manager is not None:
+            # 超過 RAM 預算時先逐出閒置的模型，仍不足則等待使用中的模型釋放，逾時拋出 ModelBudgetError
+            self.manager.admit(self, key, estimate)
+        try:
+            rss_before = current_rss_bytes()
+            start = time.perf_counter()
+            model = self.loader(*key)
+            elapsed = time.perf_counter() - start
+            size = self.size_fn(model)
+            now = time.time()
+            with self._lock:
+                self.misses += 1
+                self.load_time += elapsed
+                self._models[key] = (model, size)
+                self._info[key] = {
+                    "rss_bytes": max(0, current_rss_bytes() - rss_before),
+                    "loaded_at": now,
+                    "last_used": now,
+                    "load_seconds": round(elapsed, 2),
+                }
+                self._evict(keep=key)
+        finally:
+            if self.manager is not None:
+                self.manager.release_reservation(estimate)
+        get_metrics().record("model_load", elapsed, pool=self.name, model=list(key), weights_mb=round(size / 2**20, 1))
+        print(f"[{self.name}] 已載入 {key}，耗時 {elapsed:.1f} 秒，約 {size / 2**20:.0f} MB")
+        if self.manager is not None:
+            self.manager.enforce_budget(keep=(self, key))
+        return model
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                return None
+            self._models.move_to_end(key)
+            self._info[key]["last_used"] = time.time()
+            self.hits += 1
+            return entry[0]
+
+    def _evict(self, keep=None):
+        while len(self._models) > 1:
+            over_bytes = self.max_bytes is not None and self.total_bytes() > self.max_bytes
+            over_items = self.max_items is not None and len(self._models) > self.max_items
+            if not (over_bytes or over_items):
+                break
+            # 使用中的模型即使移出池也不會釋放記憶體，因此只逐出閒置的模型
+            oldest = next((k for k in self._models if k != keep and not self._holds.get(k)), None)
+            if oldest is None:
+                break
+            self._remove(oldest)
+            self.evictions += 1
+            print(f"[{self.name}] 已逐出 {oldest}")
+
+    def _remove(self, key):
+        self._info.pop(key, None)
+        return self._models.pop(key, None) is not None
+
+    @contextmanager
+    def hold(self, *key):
+        """
+        在 with 區塊中將 key 標記為使用中（不論是否已載入），期間不會被逐出或因閒置而卸載；
+        離開時更新最後使用時間
+
+        Yields:
+            tuple: key。
+        """
+        with self._lock:
+            self._holds[key] = self._holds.get(key, 0) + 1
+        try:
+            yield key
+        finally:
+            with self._lock:
+                self._holds[key] -= 1
+                if not self._holds[key]:
+                    del self._holds[key]
+                if key in self._info:
+                    self._info[key]["last_used"] = time.time()
+            if self.manager is not None:
+                self.manager.notify()
+
+    def is_held(self, *key):
+        with self._lock:
+            return bool(self._holds.get(key))
+
+    def idle_entries(self):
+        """
+        Returns:
+            list: 未在使用中的模型 (最後使用時間, key, 大小)，依最後使用時間排序。
+        """
+        with self._lock:
+            return sorted(
+                ((self._info[key]["last_used"], key, size) for key, (_, size) in self._models.items() if not self._holds.get(key)),
+                key=lambda entry: entry[0],
+            )
+
+    def unload_idle(self, idle_seconds):
+        """
+        卸載閒置超過 idle_seconds 秒且未在使用中的模型
+
+        Returns:
+            list: 已卸載的 key。
+        """
+        deadline = time.time() - idle_seconds
+        unloaded = []
+        with self._lock:
+            for last_used, key, _ in self.idle_entries():
+                if last_used <= deadline and self._remove(key):
+                    unloaded.append(key)
+        for key in unloaded:
+            print(f"[{self.name}] {key} 閒置超過 {idle_seconds / 60:.0f} 分鐘，已卸載")
+        if unloaded:
+            free_memory()
+        return unloaded
+
+    def loaded_models(self):
+        """
+        Returns:
+            list: 每個已載入模型的 dict，包含 pool、key、bytes（權重大小）、rss_bytes（載入時增加的常駐記憶體）、
+            loaded_at、last_used、load_seconds 與 in_use。
+        """
+        with self._lock:
+            return [
+                dict(self._info[key], pool=self.name, key=key, bytes=size, in_use=bool(self._holds.get(key)))
+                for key, (_, size) in self._models.items()
+            ]
+
+    def preload(self, *key):
+        """
+        在背景執行緒預先載入模型，載入失敗只輸出訊息不拋出例外
+
+        Returns:
+            threading.Thread: 執行預載的執行緒；若已在池中則回傳 None。
+        """
+        if self.contains(*key):
+            return None
+
+        def _run():
+            try:
+                self.get(*key)
+            except Exception as e:
+                print(f"[{self.name}] 預載 {key} 失敗: {str(e)}")
+
+        thread = threading.Thread(target=_run, daemon=True)
+        thread.start()
+        return thread
+
+    def contains(self, *key):
+        with self._lock:
+            return key in self._models
+
+    def discard(self, *key):
+        """從池中移除指定模型（若存在）"""
+        with self._lock:
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._info.clear()
+
+    def set_budget(self, max_bytes=None, max_items=None):
+        """調整 RAM 預算與數量上限，並立即逐出超出的模型"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self.max_items = max_items
+            self._evict()
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+
+    def stats(self):
+        """
+        回傳池的統計資訊
+
+        Returns:
+            dict: 包含 hits、misses、evictions、load_time、loaded 與 total_bytes。
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "load_time": round(self.load_time, 3),
+                "loaded": list(self._models.keys()),
+                "total_bytes": self.total_bytes(),
+            }
+
+
+class ResourceManager:
+    """
+    跨模型池（Whisper、翻譯）的資源管理員：
+      - 所有池的模型總大小不超過共同的 RAM 預算：載入前先依 LRU 逐出閒置的模型，
+        仍不足時等待使用中的模型釋放（排隊），超過等待時間或單一模型就超過預算時拋出 ModelBudgetError
+      - 背景執行緒定期卸載閒置超過 idle_timeout 的模型
+      - 提供已載入模型的清單給介面顯示
+    """
+
+    def __init__(self, max_bytes=None, idle_timeout=None, queue_timeout=300, check_interval=30):
+        """
+        Args:
+            max_bytes (int): 所有模型池共同的 RAM 預算（位元組）；None 表示不限制。
+            idle_timeout (float): 閒置超過此秒數的模型會被卸載；None 表示不自動卸載。
+            queue_timeout (float): 超過預算時等待其他模型釋放的最長秒數。
+            check_interval (float): 檢查閒置模型的間隔秒數。
+        """
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self.queue_timeout = queue_timeout
+        self.check_interval = check_interval
+        self.pools = []
+        self._reserved = 0  # 載入中模型的預估大小
+        self._cond = threading.Condition()
+        self._reaper = None
+
+    def register(self, pool):
+        pool.manager = self
+        self.pools.append(pool)
+        return pool
+
+    def total_bytes(self):
+        """已載入模型的總大小（不含載入中的模型）"""
+        return sum(pool.total_bytes() for pool in self.pools)
+
+    def loaded_models(self):
+        """所有池中已載入模型的清單（見 ModelPool.loaded_models）"""
+        return [entry for pool in self.pools for entry in pool.loaded_models()]
+
+    def _evict_idle(self, keep=None):
+        # 逐出所有池中最久未使用、且未在使用中的一個模型
+        candidates = [
+            (last_used, pool, key) for pool in self.pools for last_used, key, _ in pool.idle_entries()
+            if (pool, key) != keep
+        ]
+        if not candidates:
+            return False
+        _, pool, key = min(candidates, key=lambda c: c[0])
+        if pool.discard(*key):
+            pool.evictions += 1
+            print(f"[{pool.name}] 超過模型 RAM 預算，已卸載 {key}")
+        return True
+
+    def admit(self, pool, key, estimate):
+        """
+        在載入 estimate 位元組的模型前預留 RAM 預算；必要時逐出閒置模型或等待，無法滿足時拋出 ModelBudgetError。
+        載入結束後（不論成功與否）必須呼叫 release_reservation(estimate)。
+        """
+        if self.max_bytes is None:
+            with self._cond:
+                self._reserved += estimate
+            return
+        if estimate > self.max_bytes:
+            raise ModelBudgetError(
+                f"{pool.name} 模型 {key} 約需 {estimate / 2**30:.1f} GB，超過模型 RAM 預算 {self.max_bytes / 2**30:.1f} GB"
+            )
+        deadline = time.monotonic() + self.queue_timeout
+        waiting = False
+        evicted = False
+        with self._cond:
+            while self.total_bytes() + self._reserved + estimate > self.max_bytes:
+                if self._evict_idle(keep=(pool, key)):
+                    evicted = True
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ModelBudgetError(
+                        f"載入 {pool.name} 模型 {key} 會超過模型 RAM 預算 {self.max_bytes / 2**30:.1f} GB，"
+                        f"且等待 {self.queue_timeout:.0f} 秒後使用中的模型仍未釋放"
+                    )
+                if not waiting:
+                    waiting = True
+                    print(f"[{pool.name}] 模型 RAM 預算不足，等待使用中的模型釋放後再載入 {key}")
+                self._cond.wait(min(remaining, 1.0))
+            self._reserved += estimate
+        if evicted:
+            free_memory()
+
+    def release_reservation(self, estimate):
+        with self._cond:
+            self._reserved -= estimate
+            self._cond.notify_all()
+
+    def enforce_budget(self, keep=None):
+        """載入後實際大小超過預估時，逐出閒置模型直到總大小不超過預算"""
+        if self.max_bytes is None:
+            return
+        evicted = False
+        with self._cond:
+            while self.total_bytes() > self.max_bytes and self._evict_idle(keep=keep):
+                evicted = True
+        if evicted:
+            free_memory()
+
+    def notify(self):
+        """模型不再使用時喚醒等待預算的載入"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def unload_idle(self):
+        """
+        卸載所有池中閒置超過 idle_timeout 的模型
+
+        Returns:
+            list: 已卸載的 (池名稱, key)。
+        """
+        if self.idle_timeout is None:
+            return []
+        unloaded = [(pool.name, key) for pool in self.pools for key in pool.unload_idle(self.idle_timeout)]
+        if unloaded:
+            self.notify()
+        return unloaded
+
+    def unload(self, pool_name, key):
+        """
+        卸載指定的模型（使用中的模型不會卸載）
+
+        Returns:
+            bool: 是否已卸載。
+        """
+        for pool in self.pools:
+            if pool.name == pool_name and not pool.is_held(*key) and pool.discard(*key):
+                print(f"[{pool.name}] 已卸載 {key}")
+                free_memory()
+                self.notify()
+                return True
+        return False
+
+    def start(self):
+        """啟動定期卸載閒置模型的背景執行緒（重複呼叫不會啟動多個）"""
+        if self.idle_timeout is None or self._reaper is not None:
+            return
+
+        def _run():
+            while True:
+                time.sleep(self.check_interval)
+                try:
+                    self.unload_idle()
+                except Exception as e:
+                    print(f"卸載閒置模型失敗: {str(e)}")
+
+        self._reaper = threading.Thread(target=_run, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+
+def resolve_whisper_device(device=None):
+    """未指定裝置時與 whisper.load_model 相同：有 CUDA 用 cuda，否則用 cpu"""
+    if device is not None:
+        return device
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def resolve_translator_device(device=None):
+    """未指定裝置時 macOS 用 mps，其他平台有 CUDA 用 GPU 0，否則用 CPU (-1)"""
+    if device is not None:
+        return device
+    if sys.platform == "darwin":
+        return "mps"
+    import torch
+    return 0 if torch.cuda.is_available() else -1
+
+
+def _load_whisper_model(model_name, device, precision, backend="whisper"):
+    return get_backend(backend).load(model_name, device, precision)
+
+
+def _budget_from_env(var, default_mb):
+    value = os.environ.get(var)
+    mb = float(value) if value else default_mb
+    return int(mb * 2**20) if mb > 0 else None
+
+
+def physical_memory_bytes():
+    """實體記憶體大小；無法取得時回傳 None"""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+# Opus-MT 模型約 7700 萬個參數
+TRANSLATION_PARAMS = 77e6
+
+
+def _estimate_whisper_bytes(model_name, device, precision, backend="whisper"):
+    return get_backend(backend).estimate_bytes(model_name, precision)
+
+
+def _estimate_translation_bytes(source_lang, target_lang, device, precision=FP32):
+    return int(TRANSLATION_PARAMS * 4 * (INT8_SIZE_RATIO if precision == INT8_DYNAMIC else 1))
+
+
+def _default_model_budget_mb():
+    # 未設定時使用實體記憶體的一半，保留另一半給 Ollama 與其他程式
+    total = physical_memory_bytes()
+    return total / 2 / 2**20 if total else 0
+
+
+# 跨模型池的資源管理員：VOICEFLOW_MODEL_RAM_MB 設定所有 Whisper 與翻譯模型的共同 RAM 預算
+# （預設為實體記憶體的一半，<= 0 表示不限制），VOICEFLOW_MODEL_IDLE_MINUTES 設定閒置多久後卸載
+# （預設 10 分鐘，<= 0 表示不自動卸載），VOICEFLOW_MODEL_QUEUE_SECONDS 設定預算不足時最多等待的秒數（預設 300）
+_idle_minutes = float(os.environ.get("VOICEFLOW_MODEL_IDLE_MINUTES") or 10)
+resource_manager = ResourceManager(
+    max_bytes=_budget_from_env("VOICEFLOW_MODEL_RAM_MB", _default_model_budget_mb()),
+    idle_timeout=_idle_minutes * 60 if _idle_minutes > 0 else None,
+    queue_timeout=float(os.environ.get("VOICEFLOW_MODEL_QUEUE_SECONDS") or 300),
+)
+
+# 語音辨識模型共用池（各辨識後端共用），以 (模型名稱, 裝置, 精度, 後端) 為 key，
+# RAM 預算可由環境變數 VOICEFLOW_WHISPER_RAM_MB 設定（<= 0 表示不限制）
+whisper_models = resource_manager.register(ModelPool(
+    _load_whisper_model,
+    max_bytes=_budget_from_env("VOICEFLOW_WHISPER_RAM_MB", 8192),
+    size_fn=lambda model: model.weight_bytes(),
+    name="whisper",
+    estimate_fn=_estimate_whisper_bytes,
+))
+
+
+def _whisper_key(model_name, device, precision, backend):
+    backend = get_backend(backend)
+    device = resolve_whisper_device(device)
+    return model_name, device, backend.resolve_precision(precision, device), backend.name
+
+
+def get_whisper_model(model_name, device=None, precision="fp32", backend=None):
+    """
+    從共用池取得語音辨識模型
+
+    Args:
+        model_name (str): Whisper 模型名稱。
+        device (str): 推論裝置；None 表示自動選擇。
+        precision (str): 權重精度，"fp32"、"fp16"（openai-whisper 僅 CUDA）或 "int8-dynamic"（openai-whisper 僅 CPU），
+            不適用於裝置時改用 fp32；
+            None 表示使用 VOICEFLOW_PRECISION。
+        backend (str): 辨識後端（見 function.asr_backends）；None 表示使用 VOICEFLOW_ASR_BACKEND。
+
+    Returns:
+        function.asr_backends.ASRModel: 已載入的模型。
+    """
+    resource_manager.start()
+    return whisper_models.get(*_whisper_key(model_name, device, precision, backend))
+
+
+def hold_whisper_model(model_name, device=None, precision="fp32", backend=None):
+    """在 with 區塊中將語音辨識模型標記為使用中，避免被閒置卸載或因 RAM 預算逐出"""
+    return whisper_models.hold(*_whisper_key(model_name, device, precision, backend))
+
+
+def _load_translation_pipeline(source_lang, target_lang, device, precision=FP32):
+    from transformers import pipeline
+    model_name = f"Helsinki-NLP/opus-mt-{source_lang}-{target_lang}"
+    get_model_prefetcher().wait(("translation", source_lang, target_lang))
+    if precision == INT8_DYNAMIC:
+        from function.quantization import load_quantized_translation
+        return load_quantized_translation(model_name)
+    return pipeline("translation", model=model_name, device=device)
+
+
+def _translation_key(source_lang, target_lang, device, precision):
+    device = resolve_translator_device(device)
+    return source_lang, target_lang, device, resolve_precision(precision, device)
+
+
+# 翻譯 pipeline 共用池，以 (原文, 目標語言, 裝置, 精度) 為 key，
+# 最多保留的語言組合數可由環境變數 VOICEFLOW_TRANSLATION_CACHE_SIZE 設定
+translation_pipelines = resource_manager.register(ModelPool(
+    _load_translation_pipeline,
+    max_items=int(os.environ.get("VOICEFLOW_TRANSLATION_CACHE_SIZE", 4)),
+    name="translation",
+    estimate_fn=_estimate_translation_bytes,
+))
+
+
+def get_translation_pipeline(source_lang, target_lang, device=None, precision="fp32"):
+    """
+    從共用池取得 Opus MT 翻譯 pipeline
+
+    Args:
+        source_lang (str): 原文語言代碼。
+        target_lang (str): 目標語言代碼。
+        device: pipeline 使用的裝置；None 表示自動選擇。
+        precision (str): "fp32" 或 "int8-dynamic"（僅 CPU，其他裝置改用 fp32）；None 表示使用 VOICEFLOW_PRECISION。
+
+    Returns:
+        transformers.Pipeline: 翻譯 pipeline。
+    """
+    resource_manager.start()
+    return translation_pipelines.get(*_translation_key(source_lang, target_lang, device, precision))
+
+
+def hold_translation_pipeline(source_lang, target_lang, device=None, precision="fp32"):
+    """在 with 區塊中將翻譯 pipeline 標記為使用中，避免被閒置卸載或因 RAM 預算逐出"""
+    return translation_pipelines.hold(*_translation_key(source_lang, target_lang, device, precision))
+
+
+def preload_translation_pipeline(source_lang, target_lang, device=None, precision="fp32"):
+    """在背景預先載入指定語言組合的翻譯 pipeline"""
+    return translation_pipelines.preload(*_translation_key(source_lang, target_lang, device, precision))
@@ -0,0 +1,317 @@
+# function/model_prefetch.py
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+class BandwidthLimiter:
+    """多個下載共用的 token bucket，限制總下載速度"""
+
+    def __init__(self, bytes_per_second=None):
+        """
+        Args:
+            bytes_per_second (float): 每秒可下載的位元組數；None 或 <= 0 表示不限制。
+        """
+        self.rate = bytes_per_second if bytes_per_second and bytes_per_second > 0 else None
+        self._allowance = 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n_bytes):
+        """取得 n_bytes 的下載額度，超過速度上限時等待"""
+        if self.rate is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate)
+            self._last = now
+            self._allowance -= n_bytes
+            wait = -self._allowance / self.rate if self._allowance < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class DownloadJob:
+    """單一預取工作的狀態（位元組進度、狀態文字、錯誤），可由多個執行緒讀取"""
+
+    def __init__(self, key, description):
+        self.key = key
+        self.description = description
+        self.status = "等待中"
+        self.completed = 0
+        self.total = 0
+        self.error = None
+        self.done = threading.Event()
+        self.notified = 0.0
+
+    @property
+    def fraction(self):
+        return self.completed / self.total if self.total else 0.0
+
+    def wait(self, timeout=None):
+        """
+        等待工作完成
+
+        Returns:
+            bool: 成功完成時為 True；逾時或失敗為 False。
+        """
+        return self.done.wait(timeout) and self.error is None
+
+
+def sha256_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def whisper_cache_dir():
+    """與 whisper.load_model 預設相同的下載目錄"""
+    default = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(os.getenv("XDG_CACHE_HOME", default), "whisper")
+
+
+class ModelPrefetcher:
+    """
+    在背景預先下載模型權重，讓第一次辨識、翻譯或總結不需等待網路：
+      - Whisper 權重依 whisper._MODELS 的網址下載到 whisper 的快取目錄，並以網址中的 SHA-256 驗證
+      - Opus-MT 權重依 Hub 的檔案清單逐檔下載到 Hugging Face 快取（與 huggingface_hub 相同的目錄結構），
+        LFS 檔案以 SHA-256 驗證；快取中已有完整的模型時不連線
+      - Ollama 模型透過 /api/pull 下載，回報伺服器端的逐位元組進度
+      - 多個工作同時進行，Whisper 與 Opus-MT 的下載共用總頻寬上限；同一模型重複要求時共用同一個工作
+    """
+
+    def __init__(self, max_workers=3, max_bytes_per_second=None, chunk_size=1 << 16, hf_endpoint=None, hf_cache_dir=None):
+        """
+        Args:
+            max_workers (int): 同時進行的下載數。
+            max_bytes_per_second (float): 總下載速度上限；None 時讀取環境變數
+                VOICEFLOW_DOWNLOAD_KBPS（KB/s，未設定或 0 表示不限制）。
+            chunk_size (int): 每次讀取的位元組數。
+            hf_endpoint (str): Hugging Face Hub 的網址；None 表示 huggingface_hub 的預設（HF_ENDPOINT）。
+            hf_cache_dir (str): Hugging Face 快取目錄；None 表示 huggingface_hub 的預設（HF_HUB_CACHE）。
+        """
+        self.hf_endpoint = hf_endpoint
+        self.hf_cache_dir = hf_cache_dir
+        if max_bytes_per_second is None:
+            max_bytes_per_second = float(os.environ.get("VOICEFLOW_DOWNLOAD_KBPS") or 0) * 1024
+        self.limiter = BandwidthLimiter(max_bytes_per_second)
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        self.jobs = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-prefetch")
+
+    def add_listener(self, fn):
+        """註冊進度回呼 fn(job)；工作進度更新或完成時於下載執行緒中呼叫"""
+        self._listeners.append(fn)
+
+    def _notify(self, job, force=False):
+        # 下載中的進度每個工作最多每 0.1 秒通知一次
+        now = time.monotonic()
+        if not force and now - job.notified < 0.1:
+            return
+        job.notified = now
+        for fn in list(self._listeners):
+            try:
+                fn(job)
+            except Exception:
+                pass
+
+    def submit(self, key, description, fn, *args):
+        """
+        提交預取工作；相同 key 的工作進行中或已成功時直接回傳既有工作
+
+        Args:
+            key (tuple): 工作識別，例如 ("whisper", "small")。
+            description (str): 顯示用的描述。
+            fn (callable): 執行下載的函式，呼叫方式為 fn(job, *args)。
+
+        Returns:
+            DownloadJob: 工作狀態。
+        """
+        with self._lock:
+            job = self.jobs.get(key)
+            if job is not None and not (job.done.is_set() and job.error is not None):
+                return job
+            job = DownloadJob(key, description)
+            self.jobs[key] = job
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        job.status = "下載中"
+        self._notify(job, force=True)
+        try:
+            fn(job, *args)
+            job.status = "完成"
+        except Exception as e:
+            job.error = e
+            job.status = "失敗"
+            print(f"預先下載 {job.description} 失敗: {str(e)}")
+        job.done.set()
+        self._notify(job, force=True)
+
+    def wait(self, key, timeout=None):
+        """若 key 的工作正在進行則等待其完成；沒有此工作時立即回傳"""
+        with self._lock:
+            job = self.jobs.get(key)
+        if job is not None:
+            job.wait(timeout)
+        return job
+
+    def download_url(self, job, url, path, sha256=None, label=None):
+        """
+        以串流方式下載網址到 path：先寫入 .part 暫存檔，驗證 SHA-256 後再改名，
+        下載中斷也不會留下不完整的檔案；檔案已存在且驗證通過時略過
+
+        下載的位元組累加到 job.completed；job.total 為 0 時設為這個檔案的大小，
+        下載多個檔案的工作可事先將 job.total 設為總大小。label 為錯誤訊息中的檔案名稱（預設為 path 的檔名）。
+        """
+        if os.path.isfile(path) and (sha256 is None or sha256_file(path) == sha256):
+            size = os.path.getsize(path)
+            job.total = job.total or size
+            job.completed += size
+            self._notify(job)
+            return path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        part_path = f"{path}.part"
+        digest = hashlib.sha256()
+        with self.session.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            job.total = job.total or int(response.headers.get("Content-Length") or 0)
+            with open(part_path, "wb") as f:
+                for block in response.iter_content(self.chunk_size):
+                    self.limiter.consume(len(block))
+                    f.write(block)
+                    digest.update(block)
+                    job.completed += len(block)
+                    self._notify(job)
+        if sha256 is not None and digest.hexdigest() != sha256:
+            os.remove(part_path)
+            raise IOError(f"{label or os.path.basename(path)} 的 SHA-256 不符，已刪除下載的檔案")
+        os.replace(part_path, path)
+        return path
+
+    def prefetch_whisper(self, model_name, root=None):
+        """
+        在背景下載 Whisper 權重
+
+        Args:
+            model_name (str): Whisper 模型名稱（如 "small"）。
+            root (str): 下載目錄；None 表示 whisper 的預設快取目錄。
+
+        Returns:
+            DownloadJob: 工作狀態。
+        """
+        def download(job):
+            import whisper
+            url = whisper._MODELS.get(model_name)
+            if url is None:
+                return  # 本機權重檔等非官方模型不需下載
+            # 官方網址的倒數第二段即為檔案的 SHA-256
+            path = os.path.join(root or whisper_cache_dir(), os.path.basename(url))
+            self.download_url(job, url, path, url.split("/")[-2])
+        return self.submit(("whisper", model_name), f"Whisper {model_name}", download)
+
+    def cached_hf_snapshot(self, repo_id):
+        """
+        Hugging Face 快取中已下載完成的模型目錄（包含 config.json、PyTorch 權重與詞彙檔），只檢查本機檔案
+
+        Args:
+            repo_id (str): 模型的 repo，例如 "Helsinki-NLP/opus-mt-en-zh"。
+
+        Returns:
+            str: 快照目錄；尚未下載或不完整時為 None。
+        """
+        from huggingface_hub import try_to_load_from_cache
+        config = try_to_load_from_cache(repo_id, "config.json", cache_dir=self.hf_cache_dir)
+        if not isinstance(config, str):
+            return None
+        snapshot = os.path.dirname(config)
+        names = os.listdir(snapshot)
+        has_weights = any(name in ("model.safetensors", "pytorch_model.bin") for name in names)
+        has_vocab = any(name.endswith((".spm", ".model")) or name in ("vocab.json", "tokenizer.json") for name in names)
+        return snapshot if has_weights and has_vocab else None
+
+    def _download_hf_repo(self, job, repo_id):
+        # 快取中已有完整的模型時不查詢 Hub（重複選擇同一語言或啟動時預取都不需連線）
+        snapshot = self.cached_hf_snapshot(repo_id)
+        if snapshot is not None:
+            job.completed = job.total = sum(os.path.getsize(os.path.join(snapshot, name)) for name in os.listdir(snapshot))
+            return
+        from huggingface_hub import HfApi, constants, hf_hub_url
+        info = HfApi(endpoint=self.hf_endpoint).model_info(repo_id, files_metadata=True)
+        files = {s.rfilename: s for s in info.siblings}
+        # 只下載 PyTorch 權重（有 safetensors 時優先）、設定檔與詞彙檔；
+        # 權重最後下載，中途中斷時快取中沒有權重，下次會重新檢查並補齊
+        weights = [f for f in files if f.endswith(".safetensors")] or [f for f in files if f == "pytorch_model.bin"]
+        wanted = [f for f in files if f.endswith((".json", ".spm", ".txt", ".model")) and "/" not in f] + weights
+        job.total = sum(files[f].size or 0 for f in wanted)
+        # 自行下載（而非 hf_hub_download）才能套用頻寬上限並回報逐位元組的進度；檔案依 huggingface_hub 的快取結構存放：
+        # blobs/<雜湊> 為內容，snapshots/<commit>/<檔名> 連結到 blob，refs/main 記錄 main 對應的 commit，
+        # 之後 transformers 與 cached_hf_snapshot 可只憑本機快取找到模型
+        repo_dir = os.path.join(self.hf_cache_dir or constants.HF_HUB_CACHE, "models--" + repo_id.replace("/", "--"))
+        snapshot = os.path.join(repo_dir, "snapshots", info.sha)
+        for filename in wanted:
+            sibling = files[filename]
+            sha256 = sibling.lfs.sha256 if sibling.lfs is not None else None
+            blob_id = sha256 or sibling.blob_id
+            path = os.path.join(snapshot, filename)
+            target = os.path.join(repo_dir, "blobs", blob_id) if blob_id else path
+            url = hf_hub_url(repo_id, filename, revision=info.sha, endpoint=self.hf_endpoint)
+            self.download_url(job, url, target, sha256, label=f"{repo_id}/{filename}")
+            if target != path:
+                self._link_blob(target, path)
+        os.makedirs(os.path.join(repo_dir, "refs"), exist_ok=True)
+        with open(os.path.join(repo_dir, "refs", "main"), "w", encoding="utf-8") as f:
+            f.write(info.sha)
+
+    @staticmethod
+    def _link_blob(blob, path):
+        # 與 huggingface_hub 相同使用相對路徑的符號連結；系統不支援時（例如未開啟開發人員模式的 Windows）改為複製
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.lexists(path):
+            os.remove(path)
+        try:
+            os.symlink(os.path.relpath(blob, os.path.dirname(path)), path)
+        except OSError:
+            shutil.copyfile(blob, path)
+
+    def prefetch_translation(self, source_lang, target_lang):
+        """在背景下載 Helsinki-NLP/opus-mt-{source_lang}-{target_lang} 的權重"""
+        repo_id = f"Helsinki-NLP/opus-mt-{source_lang}-{target_lang}"
+        return self.submit(("translation", source_lang, target_lang), repo_id, self._download_hf_repo, repo_id)
+
+    def pull_ollama(self, ollama_client, model_name):
+        """在背景以 Ollama /api/pull 下載模型"""
+        def pull(job):
+            def on_progress(completed, total, status):
+                job.completed, job.total, job.status = completed, total, status
+                self._notify(job)
+            if not ollama_client.pull_model(model_name, on_progress=on_progress):
+                raise RuntimeError(f"無法下載模型 {model_name}")
+        return self.submit(("ollama", model_name), f"Ollama {model_name}", pull)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_prefetcher = None
+_default_lock = threading.Lock()
+
+
+def get_model_prefetcher():
+    """取得程序共用的模型預取管理器"""
+    global _default_prefetcher
+    with _default_lock:
+        if _default_prefetcher is None:
+            _default_prefetcher = ModelPrefetcher()
+        return _default_prefetcher
@@ -1,36 +1,201 @@
 # function/ollama_client.py
-import ollama
-import subprocess
+import asyncio
+import datetime
+import os
+import re
+import requests
+import sqlite3
+import threading
 import time
+from function.metrics import get_metrics, timed
+from function.result_cache import ResultCache, default_cache_dir, hash_text, make_key
+
+def default_host():
+    host = os.environ.get("OLLAMA_HOST") or "127.0.0.1:11434"
+    return (host if "://" in host else f"http://{host}").rstrip("/")
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    # 程序共用的 Ollama 回應快取（ollama_responses.sqlite），依 LRU 逐出；
+    # VOICEFLOW_OLLAMA_CACHE_MB 設定大小上限（預設 256），VOICEFLOW_OLLAMA_CACHE=0 停用
+    global _response_cache
+    if os.environ.get("VOICEFLOW_OLLAMA_CACHE", "1") == "0":
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            try:
+                max_mb = float(os.environ.get("VOICEFLOW_OLLAMA_CACHE_MB", 256))
+                _response_cache = ResultCache(os.path.join(default_cache_dir(), "ollama_responses.sqlite"), int(max_mb * 2**20))
+            except (OSError, sqlite3.Error) as e:
+                print(f"無法建立 Ollama 回應快取: {str(e)}")
+                return None
+        return _response_cache
+
+def parse_keep_alive(value):
+    # Ollama 的 keep_alive 可為時間字串（"10m"）或秒數（-1 表示常駐）；純數字字串轉為數值
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+def estimate_tokens(text):
+    # 粗估 token 數：中日韓文字約一字一個 token，其餘約每 4 個字元一個 token
+    cjk = len(re.findall(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]", text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+def strip_think(text):
+    # deepseek-r1 等推理模型會輸出 <think>...</think>，合併部分摘要前先移除以節省上下文
+    return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+
+def truncate_to_tokens(text, max_tokens):
+    # 依 estimate_tokens 由尾端截斷文字，使其不超過 max_tokens
+    while len(text) > 1 and estimate_tokens(text) > max_tokens:
+        text = text[:min(len(text) - 1, len(text) * max_tokens // estimate_tokens(text))]
+    return text
+
+def split_for_context(text, max_tokens):
+    # 以 SpeechTranslator 的分句為邊界將文字切成不超過 max_tokens 的區塊，過長的單句依字元切開
+    from function.SpeechTranslator import SpeechTranslator
+    chunks, current, current_tokens = [], [], 0
+    for sentence in SpeechTranslator.split_into_sentences(text):
+        n_tokens = estimate_tokens(sentence)
+        if n_tokens > max_tokens:
+            step = max(1, len(sentence) * max_tokens // n_tokens)
+            pieces = [sentence[i:i + step] for i in range(0, len(sentence), step)]
+        else:
+            pieces = [sentence]
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
 
 class OllamaClient:
     PREDEFINED_MODELS = [
         "deepseek-r1:1.5b", "deepseek-r1:7b", "deepseek-r1:8b", "deepseek-r1:14b",
         "deepseek-r1:32b", "deepseek-r1:70b", "llama3:8b", "qwen:7b",
     ]
+    # 修改 build_prompt / build_chunk_prompt / build_reduce_prompt 的內容時遞增，使舊的快取回應失效
+    PROMPT_VERSION = 1
+    # 階層式總結最多進行的輪數；仍過長時截斷部分摘要，避免摘要未縮短時無限重複
+    MAX_REDUCE_ROUNDS = 3
 
-    def __init__(self, preferred_model="deepseek-r1:14b"):
+    def __init__(self, preferred_model="deepseek-r1:14b", use_cache=True, host=None, catalog_ttl=30,
+                 chunk_tokens=1500, max_concurrency=2, keep_alive=None, num_thread=None, max_ctx=None):
         self.preferred_model = preferred_model
+        # 每個請求附帶的執行選項：keep_alive 為模型閒置後保留在記憶體的時間，num_thread 為推論執行緒數，
+        # num_ctx 依 prompt 長度決定（上限 max_ctx）
+        self.keep_alive = parse_keep_alive(keep_alive if keep_alive is not None else os.environ.get("VOICEFLOW_OLLAMA_KEEP_ALIVE"))
+        self.num_thread = num_thread or int(os.environ.get("VOICEFLOW_OLLAMA_NUM_THREAD") or 0) or None
+        self.max_ctx = max_ctx or int(os.environ.get("VOICEFLOW_OLLAMA_MAX_CTX") or 32768)
+        # 批次期間固定的模型（keep_alive=-1）與 num_ctx，避免模型在檔案之間被卸載或因 num_ctx 改變而重新載入
+        self.pinned_models = set()
+        self.fixed_num_ctx = None
+        self._warming = set()
+        self._warm_lock = threading.Lock()
+        # 超過 chunk_tokens 的內容改用 map-reduce 總結，分段請求最多同時送出 max_concurrency 個
+        self.chunk_tokens = chunk_tokens
+        self.max_concurrency = max_concurrency
+        self.response_cache = get_response_cache() if use_cache else None
+        # 設為 True 時略過快取查詢、重新生成（新結果仍會寫入快取）
+        self.bypass_cache = False
+        self.host = host or default_host()
+        self._client = None
+        # 模型清單透過共用連線查詢 /api/tags，並在 catalog_ttl 秒內重複使用
+        self.session = requests.Session()
+        self.catalog_ttl = catalog_ttl
+        self._catalog = None
+        self._catalog_time = 0.0
+        self._catalog_lock = threading.Lock()
 
-    def check_available_models(self):
+    @property
+    def client(self):
+        # ollama（連帶 httpx、pydantic）在第一次送出請求時才載入，縮短程式啟動時間
+        if self._client is None:
+            import ollama
+            self._client = ollama.Client(host=self.host)
+        return self._client
+
+    def list_local_models(self, refresh=False):
+        with self._catalog_lock:
+            if not refresh and self._catalog is not None and time.monotonic() - self._catalog_time < self.catalog_ttl:
+                return list(self._catalog)
+            try:
+                response = self.session.get(f"{self.host}/api/tags", timeout=5)
+                response.raise_for_status()
+                models = [m.get("name") or m.get("model") for m in response.json().get("models", [])]
+            except (requests.RequestException, ValueError):
+                models = []
+            self._catalog = [m for m in models if m]
+            self._catalog_time = time.monotonic()
+            return list(self._catalog)
+
+    def running_models(self):
+        # Ollama 目前載入記憶體中的模型（/api/ps）：name、size、size_vram 與狀態文字；無法連線時回傳空列表
         try:
-            result = subprocess.run(['ollama', 'list'], capture_output=True, text=True, check=True)
-            lines = result.stdout.strip().split('\n')[1:]
-            local_models = [line.split()[0] for line in lines if line]
-        except subprocess.CalledProcessError:
-            local_models = []
+            response = self.session.get(f"{self.host}/api/ps", timeout=5)
+            response.raise_for_status()
+            models = response.json().get("models", [])
+        except (requests.RequestException, ValueError):
+            return []
+        result = []
+        for m in models:
+            status = "已載入"
+            try:
+                expires = datetime.datetime.fromisoformat(m["expires_at"])
+                minutes = (expires - datetime.datetime.now(expires.tzinfo)).total_seconds() / 60
+                status = "常駐" if expires.year > 2100 else f"{max(0, minutes):.0f} 分鐘後卸載"
+            except (KeyError, TypeError, ValueError):
+                pass
+            result.append({"name": m.get("name") or m.get("model"), "size": m.get("size") or 0,
+                           "size_vram": m.get("size_vram") or 0, "status": status})
+        return result
+
+    def invalidate_catalog(self):
+        with self._catalog_lock:
+            self._catalog = None
+
+    def check_available_models(self, refresh=False):
+        local_models = self.list_local_models(refresh)
         all_models = sorted(set(self.PREDEFINED_MODELS + local_models))
         return all_models if all_models else ["無可用模型"]
 
-    def pull_model(self, model_name):
+    def pull_model(self, model_name, on_progress=None, cancel_event=None):
+        # 透過 /api/pull 串流下載；各層（digest）的進度加總後以 on_progress(已下載位元組, 總位元組, 狀態) 回報，
+        # Ollama 會在寫入前自行驗證每一層的 SHA-256
+        import httpx
+        import ollama
         print(f"正在下載模型 {model_name}...")
+        layers = {}
+        stream = None
         try:
-            subprocess.run(['ollama', 'pull', model_name], check=True)
-            print(f"模型 {model_name} 下載完成")
-            return True
-        except subprocess.CalledProcessError as e:
+            stream = self.client.pull(model_name, stream=True)
+            for progress in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    print(f"已取消下載模型 {model_name}")
+                    return False
+                if progress.get("digest") and progress.get("total"):
+                    layers[progress["digest"]] = (progress.get("completed") or 0, progress["total"])
+                if on_progress:
+                    on_progress(sum(c for c, _ in layers.values()), sum(t for _, t in layers.values()), progress.get("status") or "")
+        except (ollama.ResponseError, ConnectionError, httpx.HTTPError) as e:
             print(f"無法下載模型 {model_name}: {e}")
             return False
+        finally:
+            if stream is not None:
+                stream.close()
+        print(f"模型 {model_name} 下載完成")
+        self.invalidate_catalog()
+        return True
 
     def select_model(self, model_name):
         available_models = self.check_available_models()
@@ -38,22 +203,379 @@ class OllamaClient:
             return None
         return model_name
 
-    def generate_summary(self, text, model_name=None):
+    def cache_key(self, text, model_name):
+        return make_key(hash_text(text), model_name, self.PROMPT_VERSION)
+
+    def cached_summary(self, cache_key):
+        if self.response_cache is None or self.bypass_cache:
+            return None
+        return self.response_cache.get("summary", cache_key)
+
+    def store_summary(self, cache_key, summary):
+        if self.response_cache is not None:
+            self.response_cache.put("summary", cache_key, summary)
+
+    def cache_stats(self):
+        if self.response_cache is None:
+            return {"hits": 0, "misses": 0}
+        return {"hits": self.response_cache.hits, "misses": self.response_cache.misses}
+
+    def context_size(self, prompt_tokens, reply_tokens=1024):
+        # num_ctx 以 2 的次方分級（最少 2048），不同長度的內容共用少數幾種設定，減少 Ollama 因 num_ctx 改變而重新載入模型
+        num_ctx = 2048
+        while num_ctx < prompt_tokens + reply_tokens and num_ctx < self.max_ctx:
+            num_ctx *= 2
+        return min(num_ctx, self.max_ctx)
+
+    def request_options(self, prompt=None, num_ctx=None):
+        if num_ctx is None:
+            num_ctx = self.fixed_num_ctx or self.context_size(estimate_tokens(prompt or ""))
+        options = {"num_ctx": num_ctx}
+        if self.num_thread:
+            options["num_thread"] = self.num_thread
+        return options
+
+    def keep_alive_for(self, model_name):
+        return -1 if model_name in self.pinned_models else self.keep_alive
+
+    def request_kwargs(self, model_name, prompt):
+        return {"options": self.request_options(prompt), "keep_alive": self.keep_alive_for(model_name)}
+
+    def warm_up(self, model_name, num_ctx=None):
+        # 以空的 prompt 呼叫 /api/generate 讓 Ollama 預先載入模型；num_ctx 需與後續請求相同，否則會重新載入，
+        # 預設使用一般長度內容的請求所送出的值（批次固定的 num_ctx，否則為最小的 2048 級距）
+        if model_name not in self.list_local_models():
+            return None
+        if num_ctx is None:
+            num_ctx = self.request_options()["num_ctx"]
+        start = time.perf_counter()
+        try:
+            self.client.generate(model=model_name, prompt="", options=self.request_options(num_ctx=num_ctx),
+                                 keep_alive=self.keep_alive_for(model_name))
+        except Exception as e:
+            print(f"模型 {model_name} 預熱失敗: {str(e)}")
+            return None
+        elapsed = time.perf_counter() - start
+        print(f"模型 {model_name} 已載入（{elapsed:.2f} 秒，num_ctx={num_ctx}）")
+        return elapsed
+
+    def preload(self, model_name):
+        # 於背景執行 warm_up；同一模型預熱中時不重複送出
+        with self._warm_lock:
+            if not model_name or model_name in self._warming:
+                return
+            self._warming.add(model_name)
+
+        def run():
+            try:
+                self.warm_up(model_name)
+            finally:
+                with self._warm_lock:
+                    self._warming.discard(model_name)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def pin_model(self, model_name, texts=()):
+        # 批次期間讓模型常駐記憶體，並以最長內容決定固定的 num_ctx（超過 chunk_tokens 的內容會分段總結）
+        self.pinned_models.add(model_name)
+        longest = max((estimate_tokens(t) for t in texts), default=self.chunk_tokens)
+        self.fixed_num_ctx = self.context_size(min(longest, self.chunk_tokens) + 200)
+
+    def unpin_model(self, model_name):
+        # 解除常駐：以原本的 keep_alive 重新設定，模型閒置後由 Ollama 依一般規則卸載
+        # （num_ctx 沿用批次的設定，否則 Ollama 會為此請求重新載入模型）
+        options = self.request_options()
+        self.pinned_models.discard(model_name)
+        self.fixed_num_ctx = None
+        if model_name in self.list_local_models():
+            try:
+                self.client.generate(model=model_name, prompt="", options=options,
+                                     keep_alive=self.keep_alive if self.keep_alive is not None else "5m")
+            except Exception as e:
+                print(f"無法解除模型 {model_name} 常駐: {str(e)}")
+
+    def build_prompt(self, text):
+        return f"請總結以下語音辨識內容，保持簡潔且重點清晰：\n\n{text}"
+
+    def build_chunk_prompt(self, text, index, total):
+        return f"以下是一段長語音辨識內容的第 {index}/{total} 部分，請條列這部分的重點：\n\n{text}"
+
+    def build_reduce_prompt(self, partial_summaries):
+        joined = "\n\n".join(f"【第 {i} 部分】\n{summary}" for i, summary in enumerate(partial_summaries, 1))
+        return f"以下是同一段語音內容各部分的重點摘要，請整合成一份完整、簡潔且重點清晰的總結：\n\n{joined}"
+
+    @timed("generate_summary")
+    def generate_summary(self, text, model_name=None, on_token=None, cancel_event=None):
         if not model_name:
             model_name = self.preferred_model
+        metrics = get_metrics()
+        metrics.annotate(model=model_name, input_tokens=estimate_tokens(text))
+        cache_key = self.cache_key(text, model_name)
+        cached = self.cached_summary(cache_key)
+        if cached is not None:
+            metrics.annotate(cache_hit=True)
+            if on_token:
+                on_token(cached)
+            return cached
         selected_model = self.select_model(model_name)
         if not selected_model:
+            metrics.annotate(status="error", error="model unavailable")
             return f"無法生成總結：模型 {model_name} 不可用，請先下載"
-        prompt = f"請總結以下語音辨識內容，保持簡潔且重點清晰：\n\n{text}"
         try:
-            response = ollama.chat(
-                model=selected_model,
-                messages=[{"role": "user", "content": prompt}],
-            )
-            return response["message"]["content"]
+            prompt = self.build_prompt(text)
+            if estimate_tokens(text) > self.chunk_tokens:
+                prompt = self.map_reduce_prompt(text, selected_model, cancel_event)
+                if cancel_event is not None and cancel_event.is_set():
+                    return "總結已取消"
+            if on_token:
+                tokens = []
+                for token in self.stream_summary(text, selected_model, cancel_event, prompt=prompt):
+                    tokens.append(token)
+                    on_token(token)
+                summary = "".join(tokens)
+                if cancel_event is not None and cancel_event.is_set():
+                    return summary  # 已取消的部分結果不寫入快取
+            else:
+                response = self.client.chat(
+                    model=selected_model,
+                    messages=[{"role": "user", "content": prompt}],
+                    **self.request_kwargs(selected_model, prompt),
+                )
+                summary = response["message"]["content"]
+                metrics.annotate(output_tokens=response.get("eval_count") or estimate_tokens(summary))
+            self.store_summary(cache_key, summary)
+            return summary
         except Exception as e:
+            metrics.annotate(status="error", error=str(e))
             return f"總結生成失敗: {str(e)}"
 
+    def map_reduce_prompt(self, text, model_name, cancel_event=None):
+        return asyncio.run(self._with_async_client(self._amap_reduce_prompt, text, model_name, cancel_event))
+
+    async def _with_async_client(self, fn, *args):
+        # 共用一個非同步 HTTP 連線池，結束後關閉
+        client = self._async_client()
+        try:
+            return await fn(client, asyncio.Semaphore(self.max_concurrency), *args)
+        finally:
+            await client.close()
+
+    def _async_client(self):
+        import ollama
+        return ollama.AsyncClient(host=self.host)
+
+    async def _achat(self, client, semaphore, model_name, prompt, cancel_event=None):
+        # 以 semaphore 限制同時進行的請求數
+        async with semaphore:
+            if cancel_event is not None and cancel_event.is_set():
+                return ""
+            return await self._arequest(client, model_name, prompt)
+
+    async def _arequest(self, client, model_name, prompt):
+        response = await client.chat(model=model_name, messages=[{"role": "user", "content": prompt}],
+                                     **self.request_kwargs(model_name, prompt))
+        return response["message"]["content"]
+
+    async def _amap_reduce_prompt(self, client, semaphore, text, model_name, cancel_event=None):
+        # 階層式總結：將長內容切成符合上下文長度的區塊並同時送出總結請求，
+        # 部分摘要合併後仍過長時再重複一輪，最後回傳整合用的 prompt
+        chunks = split_for_context(text, self.chunk_tokens)
+        for round_number in range(1, self.MAX_REDUCE_ROUNDS + 1):
+            print(f"內容過長，分為 {len(chunks)} 段同時總結")
+            prompts = [self.build_chunk_prompt(chunk, i, len(chunks)) for i, chunk in enumerate(chunks, 1)]
+            partials = await asyncio.gather(*(self._achat(client, semaphore, model_name, p, cancel_event) for p in prompts))
+            partials = [strip_think(p) for p in partials if p]
+            reduce_prompt = self.build_reduce_prompt(partials)
+            if estimate_tokens(reduce_prompt) <= self.chunk_tokens:
+                return reduce_prompt
+            if cancel_event is not None and cancel_event.is_set():
+                return reduce_prompt
+            if len(partials) <= 1:
+                break
+            chunks = split_for_context("\n".join(partials), self.chunk_tokens)
+        # 達到輪數上限（或只剩一段仍過長的摘要）：平均截斷各部分摘要，使整合用的 prompt 不超過 chunk_tokens
+        print(f"部分摘要經 {round_number} 輪後仍過長，截斷後整合")
+        budget = (self.chunk_tokens - estimate_tokens(self.build_reduce_prompt([""] * len(partials)))) // len(partials)
+        return self.build_reduce_prompt([truncate_to_tokens(p, max(budget, 1)) for p in partials])
+
+    def _stream_client(self):
+        # 每個串流請求使用獨立的連線與可中止的 transport（傳給 ollama.Client 的 httpx 參數），取消時只中止這個請求；
+        # 無法建立時（例如 httpx/httpcore 的版本不相容）改用一般的連線，取消在收到下一段輸出時生效
+        import ollama
+        try:
+            from function.abortable_http import AbortableTransport
+            transport = AbortableTransport()
+        except Exception as e:
+            print(f"無法建立可中止的連線，取消總結將在收到下一段輸出時生效: {str(e)}")
+            return ollama.Client(host=self.host), None
+        return ollama.Client(host=self.host, transport=transport), transport
+
+    def stream_summary(self, text, model_name, cancel_event=None, prompt=None):
+        # 逐一產生模型輸出的 token；cancel_event 被設定時由監看執行緒中斷連線，
+        # 即使模型仍在處理 prompt、尚未送出任何 token，HTTP 請求也會立即中止，伺服器隨之停止生成
+        import httpx
+        prompt = prompt or self.build_prompt(text)
+        client, transport = self._stream_client()
+        stream = client.chat(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            **self.request_kwargs(model_name, prompt),
+        )
+        finished = threading.Event()
+
+        def watch():
+            while not finished.is_set():
+                if cancel_event.wait(0.1):
+                    transport.abort()
+                    return
+
+        if cancel_event is not None and transport is not None:
+            threading.Thread(target=watch, daemon=True).start()
+        start = time.perf_counter()
+        first_token_time = None
+        token_count = 0
+        final = None
+        try:
+            for chunk in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                token = chunk["message"]["content"]
+                if token:
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter() - start
+                    token_count += 1
+                    yield token
+                if chunk.get("done"):
+                    final = chunk
+        except httpx.TransportError:
+            if transport is None or not transport.aborted:
+                raise
+        finally:
+            finished.set()
+            stream.close()
+            client.close()
+            elapsed = time.perf_counter() - start
+            eval_count = (final.get("eval_count") if final else None) or token_count
+            eval_seconds = (final.get("eval_duration") or 0) / 1e9 if final else 0
+            if not eval_seconds and first_token_time is not None:
+                eval_seconds = elapsed - first_token_time
+            self.last_stream_stats = {
+                "model": model_name,
+                "time_to_first_token": round(first_token_time, 3) if first_token_time is not None else None,
+                "tokens": eval_count,
+                "tokens_per_second": round(eval_count / eval_seconds, 2) if eval_seconds else None,
+                "elapsed": round(elapsed, 3),
+                "cancelled": bool(cancel_event is not None and cancel_event.is_set()),
+            }
+            # 在 generate_summary 中呼叫時，將輸出 token 數與首個 token 延遲記入其指標事件
+            get_metrics().annotate(output_tokens=eval_count, ttft_seconds=self.last_stream_stats["time_to_first_token"])
+            print(f"總結串流統計: {self.last_stream_stats}")
+
+class AsyncOllamaClient(OllamaClient):
+    # 以 asyncio 同時送出多個總結請求（伺服器端並行數由 OLLAMA_NUM_PARALLEL 決定）：
+    # 所有請求共用一個連線池，以 max_in_flight 限制同時進行的請求數，
+    # 每個請求有逾時限制，連線失敗、逾時或伺服器忙碌時以指數退避重試
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, preferred_model="deepseek-r1:14b", use_cache=True, host=None, max_in_flight=None,
+                 request_timeout=600, retries=3, backoff=1.0, **kwargs):
+        super().__init__(preferred_model, use_cache, host, **kwargs)
+        if max_in_flight is None:
+            max_in_flight = int(os.environ.get("VOICEFLOW_OLLAMA_IN_FLIGHT") or os.environ.get("OLLAMA_NUM_PARALLEL") or 4)
+        self.max_in_flight = max(1, max_in_flight)
+        self.request_timeout = request_timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def _async_client(self):
+        import httpx
+        import ollama
+        limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+        return ollama.AsyncClient(host=self.host, limits=limits)
+
+    async def _arequest(self, client, model_name, prompt):
+        # 逾時只計算送出後的時間，不包含排隊等待 semaphore 的時間
+        return await asyncio.wait_for(super()._arequest(client, model_name, prompt), self.request_timeout)
+
+    async def _achat(self, client, semaphore, model_name, prompt, cancel_event=None):
+        # 重試前的等待在 semaphore 之外進行，不佔用同時請求的名額
+        import httpx
+        import ollama
+        for attempt in range(self.retries + 1):
+            try:
+                return await super()._achat(client, semaphore, model_name, prompt, cancel_event)
+            except (ollama.ResponseError, ConnectionError, httpx.TransportError, asyncio.TimeoutError) as e:
+                if isinstance(e, ollama.ResponseError) and e.status_code not in self.RETRY_STATUS:
+                    raise
+                if attempt == self.retries or (cancel_event is not None and cancel_event.is_set()):
+                    raise
+                delay = self.backoff * 2 ** attempt
+                print(f"Ollama 請求失敗（{str(e) or type(e).__name__}），{delay:.1f} 秒後重試 ({attempt + 1}/{self.retries})")
+                await asyncio.sleep(delay)
+
+    async def agenerate_summary(self, client, semaphore, text, model_name=None, cancel_event=None):
+        if not model_name:
+            model_name = self.preferred_model
+        # 多個請求在同一執行緒中交錯進行，直接填寫事件欄位（耗時包含等待 semaphore 的時間）；
+        # 快取（SQLite）與模型清單（requests）的查詢會阻塞，交由執行緒池執行以免卡住事件迴圈中的其他請求
+        with get_metrics().timer("generate_summary", concurrent=True, model=model_name, input_tokens=estimate_tokens(text)) as info:
+            cache_key = self.cache_key(text, model_name)
+            cached = await asyncio.to_thread(self.cached_summary, cache_key)
+            if cached is not None:
+                info["cache_hit"] = True
+                return cached
+            selected_model = await asyncio.to_thread(self.select_model, model_name)
+            if not selected_model:
+                info.update(status="error", error="model unavailable")
+                return f"無法生成總結：模型 {model_name} 不可用，請先下載"
+            prompt = self.build_prompt(text)
+            if estimate_tokens(text) > self.chunk_tokens:
+                prompt = await self._amap_reduce_prompt(client, semaphore, text, selected_model, cancel_event)
+            summary = await self._achat(client, semaphore, selected_model, prompt, cancel_event)
+            if cancel_event is not None and cancel_event.is_set():
+                info["status"] = "cancelled"
+                return "總結已取消"
+            info["output_tokens"] = estimate_tokens(summary)
+            await asyncio.to_thread(self.store_summary, cache_key, summary)
+            return summary
+
+    async def summarize_many(self, items, model_name=None, cancel_event=None):
+        # 一次送出所有 (key, text) 的總結請求，依完成順序產生 (key, summary, error)；
+        # cancel_event 被設定時取消尚未完成的請求
+        client = self._async_client()
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async def run(key, text):
+            try:
+                return key, await self.agenerate_summary(client, semaphore, text, model_name, cancel_event), None
+            except Exception as e:
+                return key, None, e
+
+        pending = {asyncio.ensure_future(run(key, text)) for key, text in items}
+        try:
+            while pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                done, pending = await asyncio.wait(pending, timeout=0.2, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            await client.close()
+
+    def summarize_all(self, items, model_name=None, cancel_event=None, on_result=None):
+        async def collect():
+            results = []
+            async for result in self.summarize_many(items, model_name, cancel_event):
+                results.append(result)
+                if on_result:
+                    on_result(*result)
+            return results
+        return asyncio.run(collect())
+
 if __name__ == "__main__":
     client = OllamaClient()
     print("可用模型:", client.check_available_models())
@@ -0,0 +1,169 @@
+# function/parallel_transcriber.py
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from function.metrics import WorkerMetricsListener, forward_worker_metrics, get_metrics
+
+# 每個工作程序各自持有的 SpeechTranslator（由 _init_worker 建立）
+_worker_translator = None
+
+
+def _init_worker(whisper_model_name, whisper_device, num_threads, whisper_precision="fp32", asr_backend=None,
+                 metrics_queue=None):
+    global _worker_translator
+    forward_worker_metrics(metrics_queue)
+    import torch
+    torch.set_num_threads(num_threads)
+    from function.SpeechTranslator import SpeechTranslator
+    _worker_translator = SpeechTranslator(
+        whisper_model_name=whisper_model_name, whisper_device=whisper_device, whisper_precision=whisper_precision,
+        asr_backend=asr_backend,
+    )
+
+
+def _transcribe(audio_file):
+    return _worker_translator.speech_to_text(audio_file)
+
+
+def _transcribe_array(audio, options):
+    result = _worker_translator.whisper_model.transcribe(audio, **options)
+    return [{"start": seg["start"], "end": seg["end"], "text": seg["text"]} for seg in result["segments"]]
+
+
+def default_worker_count():
+    """預設工作程序數：CPU 核心數的一半（至少 1）"""
+    return max(1, (os.cpu_count() or 1) // 2)
+
+
+class ParallelTranscriber:
+    """
+    以多個工作程序平行進行語音辨識：
+      - 每個程序各自載入一份 Whisper 模型，並設定自己的 torch 執行緒數
+      - 同時送出的檔案數不超過工作程序數，其餘檔案保留在本地佇列，停止時可立即取消
+      - 結果依檔案列表順序回傳
+      - 工作程序的指標事件轉交主程序，寫入同一個 metrics.jsonl
+    """
+
+    def __init__(self, whisper_model_name, workers=None, threads_per_worker=None, whisper_device="cpu",
+                 whisper_precision="fp32", asr_backend=None):
+        """
+        Args:
+            whisper_model_name (str): Whisper 模型名稱。
+            workers (int): 工作程序數；None 表示使用 default_worker_count()。
+            threads_per_worker (int): 每個程序的 torch 執行緒數；None 表示平均分配 CPU 核心。
+            whisper_device (str): 工作程序使用的推論裝置。
+            whisper_precision (str): 工作程序載入的 Whisper 權重精度（"fp32"、"fp16" 或 "int8-dynamic"）。
+            asr_backend (str): 工作程序使用的辨識引擎；None 表示使用 VOICEFLOW_ASR_BACKEND。
+        """
+        self.whisper_model_name = whisper_model_name
+        self.workers = workers or default_worker_count()
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.whisper_device = whisper_device
+        self.whisper_precision = whisper_precision
+        self.asr_backend = asr_backend
+        self.is_running = True
+        self._executor = None
+        self._metrics_listener = None
+
+    def transcribe_files(self, files, on_start=None):
+        """
+        平行辨識多個音訊檔案，依 files 的順序逐一產生結果
+
+        Args:
+            files (list): 音訊檔案路徑列表。
+            on_start (callable): 檔案送出辨識時呼叫 on_start(index, file_path)，index 從 1 開始。
+
+        Yields:
+            tuple: (index, file_path, text, error)；成功時 error 為 None，失敗時 text 為 None。
+        """
+        yield from self._run(_transcribe, files, on_start)
+
+    def transcribe_chunks(self, chunks, options=None):
+        """
+        平行解碼多段 PCM 音訊（例如長音訊依靜音切出的區塊），依 chunks 的順序逐一產生結果
+
+        Args:
+            chunks (list): 16 kHz float32 PCM 陣列列表。
+            options (dict): 傳給 whisper transcribe 的解碼選項。
+
+        Yields:
+            tuple: (index, chunk, segments, error)；segments 的時間相對於該區塊開頭。
+        """
+        yield from self._run(_transcribe_array, chunks, extra_args=(options or {},))
+
+    def _make_executor(self):
+        # 使用 spawn 避免 fork 複製 Qt 與 torch 的執行緒狀態
+        context = multiprocessing.get_context("spawn")
+        metrics_queue = None
+        if get_metrics().enabled:
+            self._metrics_listener = WorkerMetricsListener(context)
+            metrics_queue = self._metrics_listener.queue
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.whisper_model_name, self.whisper_device, self.threads_per_worker, self.whisper_precision,
+                      self.asr_backend, metrics_queue),
+        )
+
+    def _shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        if self._metrics_listener is not None:
+            self._metrics_listener.close()
+            self._metrics_listener = None
+
+    def start(self):
+        """建立常駐的工作程序池，供 transcribe_file 使用；用完後呼叫 close()"""
+        self._executor = self._make_executor()
+        return self
+
+    def transcribe_file(self, audio_file):
+        """
+        在工作程序中辨識單一檔案並等待結果，可由多個執行緒同時呼叫（例如 StagePipeline 的辨識階段）
+
+        Returns:
+            str: 辨識後的文字。
+        """
+        if not self.is_running:
+            raise RuntimeError("辨識已停止")
+        return self._executor.submit(_transcribe, audio_file).result()
+
+    def close(self):
+        if self._executor is not None:
+            self._shutdown()
+
+    def _run(self, fn, items, on_start=None, extra_args=()):
+        """在工作程序中執行 fn(item, *extra_args)，最多同時送出 workers 個，依 items 順序產生結果"""
+        self._executor = self._make_executor()
+        pending = {}
+        finished = {}
+        queue = list(enumerate(items, 1))
+        next_index = 1
+        try:
+            while self.is_running and (queue or pending):
+                while self.is_running and queue and len(pending) < self.workers:
+                    index, item = queue.pop(0)
+                    if on_start:
+                        on_start(index, item)
+                    try:
+                        pending[self._executor.submit(fn, item, *extra_args)] = (index, item)
+                    except Exception as e:  # 例如工作程序異常結束導致 BrokenProcessPool
+                        finished[index] = (item, None, e)
+                done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, item = pending.pop(future)
+                    try:
+                        finished[index] = (item, future.result(), None)
+                    except Exception as e:
+                        finished[index] = (item, None, e)
+                while next_index in finished and self.is_running:
+                    item, result, error = finished.pop(next_index)
+                    yield next_index, item, result, error
+                    next_index += 1
+        finally:
+            self._shutdown()
+
+    def stop(self):
+        """停止辨識：尚未送出的檔案不再處理，已排入的工作在下一次檢查時取消"""
+        self.is_running = False
@@ -0,0 +1,245 @@
+# function/quantization.py
+import hashlib
+import os
+import re
+import threading
+import time
+from function.result_cache import default_cache_dir
+
+FP32 = "fp32"
+INT8_DYNAMIC = "int8-dynamic"
+# 可選的推論精度："fp32" 為原始權重；"int8-dynamic" 在 CPU 上將 Opus-MT 的 Linear 層與 Whisper decoder 的
+# Linear 層動態量化為 int8（權重以 int8 保存，activation 於推論時動態量化）
+PRECISIONS = (FP32, INT8_DYNAMIC)
+# int8-dynamic 模型大小約為 fp32 的比例（embedding 與 Whisper encoder 維持 fp32），用於載入前估算記憶體
+INT8_SIZE_RATIO = 0.65
+
+_convert_lock = threading.Lock()
+_fallback_warned = set()
+
+
+def default_precision():
+    """環境變數 VOICEFLOW_PRECISION 設定的預設精度；未設定或不支援時為 fp32"""
+    precision = os.environ.get("VOICEFLOW_PRECISION", FP32)
+    return precision if precision in PRECISIONS else FP32
+
+
+def quantization_supported():
+    """torch 是否提供可用的量化後端（x86/fbgemm 或 ARM 的 qnnpack）"""
+    import torch
+    return any(engine != "none" for engine in torch.backends.quantized.supported_engines)
+
+
+def is_cuda_device(device):
+    """device 是否為 CUDA 裝置（"cuda"、"cuda:1"、torch.device 或 transformers pipeline 的 GPU 編號）"""
+    if isinstance(device, int):
+        return device >= 0
+    return str(device).startswith("cuda")
+
+
+def resolve_precision(precision, device):
+    """
+    決定實際使用的精度：fp16 只適用於 CUDA，int8-dynamic 只適用於 CPU，其他裝置或沒有量化後端時改用 fp32
+
+    Args:
+        precision (str): 要求的精度；None 表示使用 default_precision()。
+        device: 推論裝置（"cpu"、-1 表示 CPU；"cuda"、"cuda:1" 或 >= 0 的整數表示 GPU）。
+
+    Returns:
+        str: "fp32"、"fp16" 或 "int8-dynamic"。
+    """
+    precision = precision or default_precision()
+    if precision == "fp16" and not is_cuda_device(device):
+        reason = f"fp16 僅支援 CUDA，裝置 {device} 改用 fp32"
+    elif precision != INT8_DYNAMIC:
+        return precision
+    elif device not in ("cpu", -1):
+        reason = f"int8-dynamic 僅支援 CPU，裝置 {device} 改用 fp32"
+    elif not quantization_supported():
+        reason = "目前的 torch 沒有可用的量化後端，改用 fp32"
+    else:
+        return precision
+    # 每次取得模型都會解析精度，同一原因只提示一次
+    if reason not in _fallback_warned:
+        _fallback_warned.add(reason)
+        print(reason)
+    return FP32
+
+
+def quantized_cache_dir():
+    """量化後權重的存放目錄，預設為結果快取目錄下的 quantized，可由 VOICEFLOW_QUANTIZED_DIR 設定"""
+    return os.environ.get("VOICEFLOW_QUANTIZED_DIR") or os.path.join(default_cache_dir(), "quantized")
+
+
+def _cache_path(kind, model_name, revision=""):
+    import torch
+    # 量化權重的格式與 torch 版本、量化後端相關，因此一併列入檔名
+    name = re.sub(r"[^\w.-]", "_", model_name)
+    parts = [kind, name, revision, f"torch{torch.__version__}", torch.backends.quantized.engine]
+    return os.path.join(quantized_cache_dir(), "-".join(part for part in parts if part) + ".pt")
+
+
+def _as_plain_linear(module):
+    """將 nn.Linear 的子類別（例如 whisper.model.Linear）換成共用相同權重的 nn.Linear，quantize_dynamic 只接受 nn.Linear"""
+    import torch
+    for name, child in module.named_children():
+        if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+            linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None, device="meta")
+            linear.weight = child.weight
+            linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            _as_plain_linear(child)
+    return module
+
+
+def quantize_linear_layers(module):
+    """
+    將 module 中所有 Linear 層動態量化為 int8（原地替換）
+
+    Args:
+        module (torch.nn.Module): 要量化的模型或子模組。
+
+    Returns:
+        torch.nn.Module: 量化後的 module。
+    """
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+    module.eval()
+    return quantize_dynamic(_as_plain_linear(module), {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _empty_model(factory):
+    """以 meta 裝置建立模型後配置記憶體並填 0，略過隨機初始化（權重隨後由快取載入）"""
+    import torch
+    with torch.device("meta"):
+        model = factory()
+    model.to_empty(device="cpu")
+    with torch.no_grad():
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            tensor.zero_()
+    return model
+
+
+def _save(path, checkpoint):
+    import torch
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.save(checkpoint, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _load(path):
+    import torch
+    if not os.path.exists(path):
+        return None
+    try:
+        # 量化後的 Linear 以 torch 的 packed params 物件保存，無法以 weights_only 載入；檔案由本程式產生
+        return torch.load(path, map_location="cpu", weights_only=False)
+    except Exception as e:
+        print(f"讀取量化權重快取失敗，重新轉換: {str(e)}")
+        return None
+
+
+def _whisper_revision(model_name):
+    import whisper
+    # 官方模型的下載網址含有權重的 SHA-256，權重更新時快取檔名隨之改變
+    url = whisper._MODELS.get(model_name, "")
+    return url.split("/")[-2][:12] if url else ""
+
+
+def _translation_revision(model_name):
+    """
+    翻譯模型權重的版本（只讀取本機檔案）：Hugging Face 快取中 main 對應的 commit，模型更新後改變；
+    本機目錄則以權重檔的大小與修改時間計算。尚未下載時回傳 None
+    """
+    if os.path.isdir(model_name):
+        for name in ("model.safetensors", "pytorch_model.bin"):
+            path = os.path.join(model_name, name)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                return hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:12]
+        return None
+    from huggingface_hub import try_to_load_from_cache
+    config = try_to_load_from_cache(model_name, "config.json")
+    if not isinstance(config, str):
+        return None
+    # 路徑為 .../snapshots/<commit>/config.json
+    return os.path.basename(os.path.dirname(config))[:12]
+
+
+def load_quantized_whisper(model_name):
+    """
+    載入 decoder Linear 層量化為 int8 的 Whisper 模型（僅 CPU）；第一次載入時轉換並存入磁碟快取，
+    之後直接由快取建立模型，不需再讀取 fp32 權重與重新量化
+
+    Args:
+        model_name (str): Whisper 模型名稱。
+
+    Returns:
+        whisper.model.Whisper: 量化後的模型。
+    """
+    import whisper
+    from dataclasses import asdict
+    from whisper.model import ModelDimensions, Whisper
+
+    path = _cache_path("whisper", model_name, _whisper_revision(model_name))
+    checkpoint = _load(path)
+    if checkpoint is not None:
+        model = Whisper(ModelDimensions(**checkpoint["dims"]))
+        quantize_linear_layers(model.decoder)
+        model.load_state_dict(checkpoint["state_dict"])
+    else:
+        with _convert_lock:
+            start = time.perf_counter()
+            model = whisper.load_model(model_name, device="cpu")
+            quantize_linear_layers(model.decoder)
+            _save(path, {"dims": asdict(model.dims), "state_dict": model.state_dict()})
+            print(f"Whisper {model_name} 已量化為 int8 並存入 {path}，耗時 {time.perf_counter() - start:.1f} 秒")
+    if model_name in whisper._ALIGNMENT_HEADS:
+        model.set_alignment_heads(whisper._ALIGNMENT_HEADS[model_name])
+    return model.eval()
+
+
+def load_quantized_translation(model_name):
+    """
+    載入 Linear 層量化為 int8 的 Opus-MT 翻譯 pipeline（僅 CPU）；第一次載入時轉換並存入磁碟快取，
+    快取檔名包含原始權重的版本，模型更新後重新轉換
+
+    Args:
+        model_name (str): Hugging Face 模型名稱，例如 "Helsinki-NLP/opus-mt-en-zh"。
+
+    Returns:
+        transformers.Pipeline: 使用量化模型的翻譯 pipeline。
+    """
+    from transformers import AutoConfig, AutoModelForSeq2SeqLM, AutoTokenizer, GenerationConfig, pipeline
+
+    revision = _translation_revision(model_name)
+    # 尚未下載原始權重時無法確認版本，直接轉換（from_pretrained 會下載），完成後再以實際版本存入快取
+    checkpoint = _load(_cache_path("translation", model_name, revision)) if revision else None
+    if checkpoint is not None:
+        config = AutoConfig.for_model(**checkpoint["config"])
+        model = _empty_model(lambda: AutoModelForSeq2SeqLM.from_config(config))
+        # 配置記憶體時共用的 embedding 會被拆開，需在量化前重新綁定
+        model.tie_weights()
+        quantize_linear_layers(model)
+        model.load_state_dict(checkpoint["state_dict"])
+        model.generation_config = GenerationConfig.from_dict(checkpoint["generation_config"])
+    else:
+        with _convert_lock:
+            start = time.perf_counter()
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+            quantize_linear_layers(model)
+            revision = _translation_revision(model_name)
+            if revision:
+                path = _cache_path("translation", model_name, revision)
+                _save(path, {
+                    "config": model.config.to_dict(),
+                    "generation_config": model.generation_config.to_dict(),
+                    "state_dict": model.state_dict(),
+                })
+                print(f"{model_name} 已量化為 int8 並存入 {path}，耗時 {time.perf_counter() - start:.1f} 秒")
+            else:
+                print(f"無法確認 {model_name} 的權重版本，量化結果不存入快取")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    return pipeline("translation", model=model.eval(), tokenizer=tokenizer, device=-1)
@@ -0,0 +1,251 @@
+# function/result_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+
+# 程序內記住已計算的檔案雜湊，以 (路徑, 大小, 修改時間) 判斷檔案是否變動（批次預取與辨識會對同一檔案各查一次快取）
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+
+def hash_file(path, block_size=1 << 20):
+    """計算檔案內容的 SHA-256（依內容而非路徑，檔案改名或搬移後仍可命中快取）"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _file_hashes_lock:
+        if memo_key in _file_hashes:
+            return _file_hashes[memo_key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    with _file_hashes_lock:
+        if len(_file_hashes) >= 4096:
+            _file_hashes.clear()
+        _file_hashes[memo_key] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+def hash_audio(audio):
+    """
+    音訊檔案路徑以檔案內容計算雜湊；已解碼的 PCM 陣列以其資料計算雜湊，
+    但帶有 source_hash 屬性（例如 AudioPrefetcher 預先解碼的檔案）時沿用原檔案的雜湊，與直接傳入路徑共用快取
+    """
+    if isinstance(audio, (str, os.PathLike)):
+        return hash_file(audio)
+    source_hash = getattr(audio, "source_hash", None)
+    if source_hash:
+        return source_hash
+    import numpy as np
+    return hashlib.sha256(np.ascontiguousarray(audio).data).hexdigest()
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_key(*parts):
+    """將多個欄位（雜湊值、模型名稱、選項等）組合為單一快取 key"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    以內容定址的磁碟結果快取（SQLite + zlib 壓縮）：
+      - 以 (namespace, key) 存取文字結果，例如 ("transcription", 音訊雜湊 + 模型 + 選項)
+      - 總大小超過上限時依最後存取時間逐出（LRU）；為避免每次寫入都加總整個資料表，
+        每寫入 evict_every 筆或上限的 5% 才檢查一次，超過時逐出到上限的 90%
+      - 每次操作使用獨立連線，可同時被多個執行緒與工作程序使用
+    """
+
+    # 逐出時降到上限的比例，之後不會每次寫入都再次觸發
+    EVICT_TARGET = 0.9
+
+    def __init__(self, path, max_bytes=1024 * 2**20, evict_every=64):
+        """
+        Args:
+            path (str): SQLite 資料庫檔案路徑。
+            max_bytes (int): 壓縮後資料的總大小上限（位元組）；兩次檢查之間最多超出 evict_every 筆或上限的 5%。
+            evict_every (int): 每寫入幾筆檢查一次總大小。
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._unchecked_rows = 0
+        self._unchecked_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,"
+                " size INTEGER NOT NULL, accessed REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            # 上限可能因設定變更而變小，開啟時檢查一次
+            self._evict(conn)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, namespace, key):
+        """
+        讀取快取結果
+
+        Returns:
+            str or None: 快取的文字；未命中時回傳 None。
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM entries WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?", (time.time(), namespace, key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def contains(self, namespace, key):
+        """是否有快取結果（不計入命中統計，也不更新存取時間）"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM entries WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+        return row is not None
+
+    def get_many(self, namespace, keys):
+        """
+        一次讀取多個快取結果
+
+        Returns:
+            dict: 命中的 key 與文字；未命中的 key 不會出現在結果中。
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+        with self._connect() as conn:
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                marks = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, value FROM entries WHERE namespace = ? AND key IN ({marks})", (namespace, *batch)
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?", [(now, namespace, k) for k, _ in rows]
+                )
+                found.update((k, zlib.decompress(v).decode("utf-8")) for k, v in rows)
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, namespace, items):
+        """一次寫入多個 (key, value)，並在超過大小上限時逐出最久未存取的項目"""
+        now = time.time()
+        rows = []
+        for key, value in items:
+            blob = zlib.compress(value.encode("utf-8"))
+            rows.append((namespace, key, blob, len(blob), now))
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, accessed) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._maybe_evict(conn, len(rows), sum(row[3] for row in rows))
+
+    def put(self, namespace, key, value):
+        """寫入快取結果，並在超過大小上限時逐出最久未存取的項目"""
+        blob = zlib.compress(value.encode("utf-8"))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, accessed) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, blob, len(blob), time.time()),
+            )
+            self._maybe_evict(conn, 1, len(blob))
+
+    def _maybe_evict(self, conn, n_rows, n_bytes):
+        with self._lock:
+            self._unchecked_rows += n_rows
+            self._unchecked_bytes += n_bytes
+            if self._unchecked_rows < self.evict_every and self._unchecked_bytes < self.max_bytes // 20:
+                return
+            self._unchecked_rows = self._unchecked_bytes = 0
+        self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * self.EVICT_TARGET)
+        while total > target:
+            # 依 accessed 索引每次取出最舊的一批，不讀取整個資料表
+            rows = conn.execute("SELECT namespace, key, size FROM entries ORDER BY accessed LIMIT 256").fetchall()
+            if not rows:
+                break
+            for namespace, key, size in rows:
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                total -= size
+
+    def clear(self, namespace=None):
+        with self._connect() as conn:
+            if namespace is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+    def stats(self):
+        """
+        Returns:
+            dict: 命中/未命中次數、項目數與壓縮後總大小。
+        """
+        with self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "total_bytes": total}
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache_dir():
+    return os.environ.get("VOICEFLOW_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "voiceflow")
+
+
+def get_result_cache():
+    """
+    取得程序共用的結果快取
+
+    可用環境變數設定：VOICEFLOW_CACHE_DIR（存放目錄）、VOICEFLOW_CACHE_MB（大小上限，預設 1024）、
+    VOICEFLOW_CACHE=0（停用快取）。
+
+    Returns:
+        ResultCache or None: 停用或無法建立時回傳 None。
+    """
+    global _default_cache
+    if os.environ.get("VOICEFLOW_CACHE", "1") == "0":
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            try:
+                max_mb = float(os.environ.get("VOICEFLOW_CACHE_MB", 1024))
+                _default_cache = ResultCache(os.path.join(default_cache_dir(), "results.sqlite"), int(max_mb * 2**20))
+            except (OSError, sqlite3.Error) as e:
+                print(f"無法建立結果快取: {str(e)}")
+                return None
+        return _default_cache
@@ -0,0 +1,145 @@
+# function/stage_pipeline.py
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, queue_size=4):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.children = []
+
+
+class StagePipeline:
+    """
+    小型的階段排程器，將批次工作串成 DAG（例如 轉換 → 翻譯、轉換 → 總結）：
+      - 每個階段有自己的執行緒池與有界佇列，上游產生結果後立刻交給下游
+      - 下游佇列滿時上游會等待（背壓），避免中間結果無限累積
+      - 某個項目在某階段失敗時，只略過該項目的下游階段
+    """
+
+    def __init__(self, queue_size=4):
+        """
+        Args:
+            queue_size (int): 每個階段輸入佇列的容量。
+        """
+        self.queue_size = queue_size
+        self.stages = []
+        self.is_running = True
+        self._closed = False
+        self._outstanding = 0
+        self._cond = threading.Condition()
+        self._on_start = None
+        self._on_result = None
+        self._on_error = None
+
+    def add_stage(self, name, fn, after=None, workers=1):
+        """
+        新增階段
+
+        Args:
+            name (str): 階段名稱，同時作為結果的 key（例如 "transcription"）。
+            fn (callable): 處理函式；第一個階段接收項目本身，其餘階段接收上游階段的結果。
+            after (str): 上游階段名稱；None 表示此階段直接接收輸入項目（只能有一個）。
+            workers (int): 此階段同時執行的工作數。
+
+        Returns:
+            StagePipeline: 自身，方便串接呼叫。
+        """
+        stage = Stage(name, fn, workers, self.queue_size)
+        if after is None:
+            if any(s for s in self.stages if s not in self._children()):
+                raise ValueError("只能有一個直接接收輸入項目的階段")
+        else:
+            self._stage(after).children.append(stage)
+        self.stages.append(stage)
+        return self
+
+    def _stage(self, name):
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(f"找不到階段: {name}")
+
+    def _children(self):
+        return [child for stage in self.stages for child in stage.children]
+
+    def run(self, items, on_start=None, on_result=None, on_error=None):
+        """
+        執行管線，直到所有項目走完所有階段或被停止
+
+        Args:
+            items (list): 輸入項目（例如音訊檔案路徑）。
+            on_start (callable): 項目進入第一個階段時呼叫 on_start(index, item)，index 從 1 開始。
+            on_result (callable): 某階段完成時呼叫 on_result(item, stage_name, result)。
+            on_error (callable): 某階段失敗時呼叫 on_error(item, stage_name, error)。
+        """
+        self._on_start, self._on_result, self._on_error = on_start, on_result, on_error
+        self._closed = False
+        root = self.stages[0]
+        executors = []
+        try:
+            for stage in self.stages:
+                executor = ThreadPoolExecutor(max_workers=stage.workers, thread_name_prefix=f"stage-{stage.name}")
+                for _ in range(stage.workers):
+                    executor.submit(self._worker_loop, stage, stage is root)
+                executors.append(executor)
+            for index, item in enumerate(items, 1):
+                if not self._put(root, (index, item, item)):
+                    break
+            with self._cond:
+                while self._outstanding and self.is_running:
+                    self._cond.wait(0.2)
+        finally:
+            # 例外（包含 Ctrl-C）離開時下游的工作執行緒會結束，_put 看到 _closed 後不再等待下游佇列的空位
+            self._closed = True
+            for executor in executors:
+                executor.shutdown(wait=True)
+
+    def stop(self):
+        """停止管線：佇列中尚未開始的項目不再處理，執行中的工作完成後結束"""
+        self.is_running = False
+
+    def _put(self, stage, entry):
+        with self._cond:
+            self._outstanding += 1
+        while self.is_running and not self._closed:
+            try:
+                stage.queue.put(entry, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        self._done()
+        return False
+
+    def _done(self):
+        with self._cond:
+            self._outstanding -= 1
+            self._cond.notify_all()
+
+    def _worker_loop(self, stage, is_root):
+        while not self._closed:
+            try:
+                index, item, value = stage.queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                if not self.is_running:
+                    continue
+                if is_root and self._on_start:
+                    self._on_start(index, item)
+                try:
+                    result = stage.fn(value)
+                except Exception as e:
+                    if self._on_error:
+                        self._on_error(item, stage.name, e)
+                    continue
+                if self._on_result:
+                    self._on_result(item, stage.name, result)
+                for child in stage.children:
+                    self._put(child, (index, item, result))
+            finally:
+                self._done()
@@ -0,0 +1,225 @@
+# function/transcript.py
+import difflib
+import re
+
+
+def format_timestamp(seconds, separator=","):
+    """將秒數格式化為字幕時間戳記：SRT 為 00:01:02,345，VTT（separator="."）為 00:01:02.345"""
+    millis = int(round(max(seconds, 0) * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+class Transcript:
+    """
+    以片段為單位的辨識結果與各片段的譯文：
+      - 每個片段為 {"id", "start", "end", "text", "translation"}，id 在整個編輯過程中保持不變
+      - 文字框中每行對應一個片段；使用者編輯後以 difflib 比對新舊各行，未變動的片段保留 id、時間與譯文，
+        只有修改或新增的片段需要重新翻譯
+      - 可匯出 SRT/VTT 字幕（原文或譯文）
+    """
+
+    def __init__(self):
+        self.segments = []
+        self.next_id = 0
+        # 產生目前譯文的翻譯設定（語言、繁簡、精度）；設定改變時所有譯文失效
+        self.translation_key = None
+
+    @classmethod
+    def from_segments(cls, segments):
+        """
+        由辨識產生的片段建立（例如 stream_segments、transcribe_long_audio 的結果）
+
+        Args:
+            segments (list): 包含 start、end（秒）與 text 的片段。
+
+        Returns:
+            Transcript: 新的辨識結果，片段 id 從 0 開始重新編號。
+        """
+        transcript = cls()
+        for seg in segments:
+            if seg["text"].strip():
+                transcript.segments.append(transcript._new_segment(seg["text"], seg.get("start"), seg.get("end")))
+        return transcript
+
+    @classmethod
+    def from_text(cls, text):
+        """
+        由純文字建立（例如批次轉換的結果），依行與句尾標點切成片段；沒有時間戳記
+
+        Args:
+            text (str): 辨識後的文字。
+
+        Returns:
+            Transcript: 新的辨識結果。
+        """
+        transcript = cls()
+        for line in text.splitlines():
+            for sentence in re.split(r"(?<=[.!?。！？])\s+", line):
+                if sentence.strip():
+                    transcript.segments.append(transcript._new_segment(sentence))
+        return transcript
+
+    def _new_segment(self, text, start=None, end=None):
+        segment = {"id": self.next_id, "start": start, "end": end, "text": text.strip(), "translation": None}
+        self.next_id += 1
+        return segment
+
+    def text(self):
+        """原文，每個片段一行"""
+        return "\n".join(seg["text"] for seg in self.segments)
+
+    def translation_text(self):
+        """譯文，每個片段一行（尚未翻譯的片段為空行）"""
+        return "\n".join(seg["translation"] or "" for seg in self.segments)
+
+    def pending(self):
+        """尚未翻譯（或編輯後譯文失效）的片段"""
+        return [seg for seg in self.segments if seg["translation"] is None]
+
+    def apply_edit(self, text):
+        """
+        套用使用者編輯後的文字：與目前的片段逐行比對，未變動的片段保留譯文；
+        修改的行若與原本的片段一一對應則沿用原 id 與時間，否則以新 id 取代，並依字數分配原本的時間範圍
+
+        Args:
+            text (str): 編輯後的文字，每行一個片段。
+
+        Returns:
+            list: 需要重新翻譯的片段 id。
+        """
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        matcher = difflib.SequenceMatcher(None, [seg["text"] for seg in self.segments], lines, autojunk=False)
+        segments = []
+        changed = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                segments.extend(self.segments[i1:i2])
+                continue
+            old, new = self.segments[i1:i2], lines[j1:j2]
+            if len(old) == len(new):
+                for seg, line in zip(old, new):
+                    segments.append(dict(seg, text=line, translation=None))
+                    changed.append(seg["id"])
+                continue
+            previous = segments[-1] if segments else None
+            following = self.segments[i2] if i2 < len(self.segments) else None
+            for line, (start, end) in zip(new, self._split_span(old, previous, following, new)):
+                segment = self._new_segment(line, start, end)
+                segments.append(segment)
+                changed.append(segment["id"])
+        self.segments = segments
+        return changed
+
+    @staticmethod
+    def _split_span(old, previous, following, lines):
+        """
+        為取代或新增的各行分配時間範圍：取代時依各行字數分配被取代片段的時間範圍；新增時使用前後片段之間的空隙，
+        沒有空隙（前後片段相鄰或新增在結尾）時改與相鄰的片段依字數分享該片段的時間範圍（並縮短該片段）。
+        沒有可沿用的時間（例如沒有時間戳記的辨識結果）時為 (None, None)，匯出字幕時會要求重新辨識
+        """
+        none = [(None, None)] * len(lines)
+        if old:
+            start, end = old[0]["start"], old[-1]["end"]
+            if start is None or end is None:
+                return none
+            return Transcript._distribute(start, end, lines)
+        start = previous["end"] if previous else (0.0 if following else None)
+        end = following["start"] if following else None
+        if start is not None and end is not None and end > start:
+            return Transcript._distribute(start, end, lines)
+        neighbour = previous or following
+        if neighbour is None or neighbour["start"] is None or neighbour["end"] is None:
+            return none
+        if neighbour is previous:
+            spans = Transcript._distribute(previous["start"], previous["end"], [previous["text"]] + lines)
+            previous["end"] = spans[0][1]
+            return spans[1:]
+        spans = Transcript._distribute(following["start"], following["end"], lines + [following["text"]])
+        following["start"] = spans[-1][0]
+        return spans[:-1]
+
+    @staticmethod
+    def _distribute(start, end, texts):
+        # 將 start–end 依各段文字的字數比例切分
+        total = sum(len(text) for text in texts) or 1
+        duration = end - start
+        spans = []
+        for text in texts:
+            length = duration * len(text) / total
+            spans.append((round(start, 2), round(start + length, 2)))
+            start += length
+        return spans
+
+    def retranslate(self, translate_fn, translation_key=None):
+        """
+        只翻譯尚未翻譯的片段；翻譯設定與上次不同時先清除所有譯文
+
+        Args:
+            translate_fn (callable): translate_fn(texts) 回傳與 texts 順序相同的譯文列表
+                （例如 SpeechTranslator.translate_segments）。
+            translation_key (tuple): 翻譯設定，例如 (原文語言, 目標語言, 是否繁體, 精度)。
+
+        Returns:
+            str: 全部片段的譯文，每個片段一行。
+
+        Raises:
+            RuntimeError: 有片段翻譯失敗（translate_fn 回傳 None）；其他片段的譯文仍會保留，失敗的片段下次重新翻譯。
+        """
+        if translation_key != self.translation_key:
+            for seg in self.segments:
+                seg["translation"] = None
+            self.translation_key = translation_key
+        pending = self.pending()
+        if pending:
+            for seg, translation in zip(pending, translate_fn([seg["text"] for seg in pending])):
+                seg["translation"] = translation
+        failed = len(self.pending())
+        if failed:
+            raise RuntimeError(f"{failed} 個片段翻譯失敗，其餘片段的譯文已保留，請再按一次「翻譯」重試")
+        return self.translation_text()
+
+    def has_timestamps(self):
+        return bool(self.segments) and all(seg["start"] is not None and seg["end"] is not None for seg in self.segments)
+
+    def _cues(self, translated):
+        if not self.has_timestamps():
+            raise ValueError("辨識結果沒有時間戳記（例如批次轉換的結果），請以單檔「語音辨識」重新辨識後再匯出字幕")
+        if translated and self.pending():
+            raise ValueError("部分片段尚未翻譯，請先按「翻譯」")
+        return [(seg["start"], max(seg["end"], seg["start"]), seg["translation"] if translated else seg["text"])
+                for seg in self.segments]
+
+    def to_srt(self, translated=False):
+        """
+        匯出 SRT 字幕
+
+        Args:
+            translated (bool): 為 True 時輸出譯文，否則輸出原文。
+
+        Returns:
+            str: SRT 內容。
+        """
+        blocks = [
+            f"{index}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n"
+            for index, (start, end, text) in enumerate(self._cues(translated), 1)
+        ]
+        return "\n".join(blocks)
+
+    def to_vtt(self, translated=False):
+        """
+        匯出 WebVTT 字幕
+
+        Args:
+            translated (bool): 為 True 時輸出譯文，否則輸出原文。
+
+        Returns:
+            str: VTT 內容。
+        """
+        blocks = [
+            f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n"
+            for start, end, text in self._cues(translated)
+        ]
+        return "\n".join(["WEBVTT\n"] + blocks)
@@ -0,0 +1,100 @@
+# function/translation_memory.py
+import os
+import sqlite3
+import threading
+from function.result_cache import ResultCache, default_cache_dir, hash_text
+
+
+class TranslationMemory:
+    """
+    句子層級的翻譯記憶：
+      - 以語言組合與正規化後的句子（SpeechTranslator.clean_text）為 key 保存譯文
+      - 會議、系列課程中重複出現的句子直接取用先前的譯文，只有未命中的句子需要送入模型
+      - 資料存於獨立的 SQLite 檔案，總大小有上限並依 LRU 逐出
+    """
+
+    def __init__(self, path, max_bytes=256 * 2**20):
+        """
+        Args:
+            path (str): SQLite 資料庫檔案路徑。
+            max_bytes (int): 壓縮後資料的總大小上限（位元組）。
+        """
+        self.store = ResultCache(path, max_bytes)
+
+    @staticmethod
+    def _namespace(source_lang, target_lang, precision="fp32"):
+        # 量化模型的譯文可能與 fp32 略有不同，分開保存；fp32 沿用原本的 namespace
+        suffix = "" if precision == "fp32" else f":{precision}"
+        return f"tm:{source_lang}-{target_lang}{suffix}"
+
+    def lookup(self, source_lang, target_lang, sentences, precision="fp32"):
+        """
+        查詢多個句子的譯文
+
+        Args:
+            source_lang (str): 原文語言代碼。
+            target_lang (str): 目標語言代碼。
+            sentences (list): 已正規化的句子。
+            precision (str): 翻譯模型的權重精度。
+
+        Returns:
+            list: 與 sentences 順序相同的譯文；未命中的位置為 None。
+        """
+        keys = [hash_text(s) for s in sentences]
+        found = self.store.get_many(self._namespace(source_lang, target_lang, precision), keys)
+        return [found.get(k) for k in keys]
+
+    def update(self, source_lang, target_lang, pairs, precision="fp32"):
+        """
+        寫入多個 (原句, 譯文)
+
+        Args:
+            source_lang (str): 原文語言代碼。
+            target_lang (str): 目標語言代碼。
+            pairs (list): (正規化後的原句, 譯文) 列表。
+            precision (str): 翻譯模型的權重精度。
+        """
+        if pairs:
+            namespace = self._namespace(source_lang, target_lang, precision)
+            self.store.put_many(namespace, [(hash_text(s), t) for s, t in pairs])
+
+    def hit_rate(self):
+        total = self.store.hits + self.store.misses
+        return self.store.hits / total if total else 0.0
+
+    def stats(self):
+        """
+        Returns:
+            dict: 句子層級的命中/未命中次數、命中率、項目數與總大小。
+        """
+        stats = self.store.stats()
+        stats["hit_rate"] = round(self.hit_rate(), 4)
+        return stats
+
+
+_default_memory = None
+_default_lock = threading.Lock()
+
+
+def get_translation_memory():
+    """
+    取得程序共用的翻譯記憶
+
+    可用環境變數設定：VOICEFLOW_TM_MB（大小上限，預設 256）、VOICEFLOW_TM=0（停用），
+    存放目錄與結果快取相同（VOICEFLOW_CACHE_DIR）。
+
+    Returns:
+        TranslationMemory or None: 停用或無法建立時回傳 None。
+    """
+    global _default_memory
+    if os.environ.get("VOICEFLOW_TM", "1") == "0":
+        return None
+    with _default_lock:
+        if _default_memory is None:
+            try:
+                max_mb = float(os.environ.get("VOICEFLOW_TM_MB", 256))
+                _default_memory = TranslationMemory(os.path.join(default_cache_dir(), "translation_memory.sqlite"), int(max_mb * 2**20))
+            except (OSError, sqlite3.Error) as e:
+                print(f"無法建立翻譯記憶: {str(e)}")
+                return None
+        return _default_memory
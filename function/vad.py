@@ -0,0 +1,163 @@
+# function/vad.py
+import numpy as np
+
+
+def detect_speech_regions(
+    audio,
+    sample_rate=16000,
+    frame_seconds=0.03,
+    threshold_db=None,
+    min_silence_seconds=0.5,
+    min_speech_seconds=0.25,
+    pad_seconds=0.2,
+):
+    """
+    以能量為基礎的簡易語音活動偵測（VAD）
+
+    Args:
+        audio (np.ndarray): 16 kHz float32 單聲道 PCM。
+        sample_rate (int): 取樣率。
+        frame_seconds (float): 計算能量的音框長度（秒）。
+        threshold_db (float): 語音判定門檻（dBFS）；None 表示依音檔的噪音底與音量自動決定。
+        min_silence_seconds (float): 短於此長度的靜音不切開，與前後語音合併。
+        min_speech_seconds (float): 短於此長度的語音視為雜訊並略過。
+        pad_seconds (float): 每段語音前後保留的長度，避免切掉字首字尾。
+
+    Returns:
+        list: 語音區段 (start_sample, end_sample) 列表，依時間排序。
+    """
+    frame = int(frame_seconds * sample_rate)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    frames = audio[: n_frames * frame].reshape(n_frames, frame).astype(np.float64)
+    energy_db = 10 * np.log10(np.mean(frames**2, axis=1) + 1e-10)
+    if threshold_db is None:
+        noise_floor = np.percentile(energy_db, 10)
+        loud = np.percentile(energy_db, 95)
+        if loud - noise_floor < 6:
+            # 整段音量幾乎一致：夠大聲視為全是語音，否則視為全是靜音
+            return [(0, len(audio))] if loud > -50 else []
+        threshold_db = noise_floor + (loud - noise_floor) * 0.3
+    is_speech = energy_db > threshold_db
+
+    # 找出連續的語音音框
+    edges = np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    min_silence = int(min_silence_seconds / frame_seconds)
+    merged = []
+    for start, end in zip(starts, ends):
+        if merged and start - merged[-1][1] < min_silence:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    min_speech = int(min_speech_seconds / frame_seconds)
+    pad = int(pad_seconds * sample_rate)
+    regions = []
+    for start, end in merged:
+        if end - start < min_speech:
+            continue
+        start_sample = max(0, int(start) * frame - pad)
+        end_sample = min(len(audio), int(end) * frame + pad)
+        if regions and start_sample <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end_sample)
+        else:
+            regions.append((start_sample, end_sample))
+    return regions
+
+
+class SpeechChunk:
+    """
+    一個解碼區塊：依序相接的語音區段，區段之間以固定長度的靜音分隔（不包含原本區段之間的靜音），
+    並可將區塊內的時間換算回原音訊的時間
+    """
+
+    def __init__(self, regions, gap):
+        """
+        Args:
+            regions (list): 語音區段 (start_sample, end_sample) 列表，依時間排序。
+            gap (int): 區段之間插入的靜音長度（樣本數）。
+        """
+        self.regions = list(regions)
+        self.gap = gap
+
+    @property
+    def speech_samples(self):
+        return sum(end - start for start, end in self.regions)
+
+    def __len__(self):
+        return self.speech_samples + self.gap * (len(self.regions) - 1)
+
+    def extract(self, audio):
+        """從原音訊取出區塊的 PCM：各語音區段以 gap 長度的靜音相接"""
+        silence = np.zeros(self.gap, dtype=audio.dtype)
+        parts = []
+        for start, end in self.regions:
+            if parts:
+                parts.append(silence)
+            parts.append(audio[start:end])
+        return np.concatenate(parts)
+
+    def source_time(self, seconds, sample_rate=16000, is_end=False):
+        """
+        將區塊內的時間換算為原音訊的時間；落在插入的靜音中時，開始時間對齊到下一個區段的開頭，
+        結束時間（is_end=True）對齊到前一個區段的結尾
+
+        Args:
+            seconds (float): 相對於區塊開頭的時間（秒）。
+            sample_rate (int): 取樣率。
+            is_end (bool): 是否為片段的結束時間。
+
+        Returns:
+            float: 相對於原音訊開頭的時間（秒）。
+        """
+        position = seconds * sample_rate
+        local = 0
+        previous_end = self.regions[0][0]
+        for start, end in self.regions:
+            if position < local:
+                return (previous_end if is_end else start) / sample_rate
+            if position <= local + end - start:
+                return (start + position - local) / sample_rate
+            local += end - start + self.gap
+            previous_end = end
+        return self.regions[-1][1] / sample_rate
+
+
+def merge_into_chunks(regions, sample_rate=16000, max_chunk_seconds=30, gap_seconds=0.3):
+    """
+    將語音區段分組為不超過 max_chunk_seconds 的解碼區塊：區塊只包含語音區段本身，區段之間以 gap_seconds 的靜音相接，
+    不解碼區段之間原本的長靜音；單一區段超過上限時依上限切開
+
+    Args:
+        regions (list): detect_speech_regions 回傳的語音區段。
+        sample_rate (int): 取樣率。
+        max_chunk_seconds (float): 每個區塊的長度上限（秒），Whisper 一次最多處理 30 秒。
+        gap_seconds (float): 區段之間插入的靜音長度（秒），讓模型分辨區段的邊界。
+
+    Returns:
+        list: SpeechChunk 列表，依時間排序。
+    """
+    max_len = int(max_chunk_seconds * sample_rate)
+    gap = int(gap_seconds * sample_rate)
+    chunks = []
+    current, length = [], 0
+    for start, end in regions:
+        while end - start > max_len:
+            if current:
+                chunks.append(SpeechChunk(current, gap))
+                current, length = [], 0
+            chunks.append(SpeechChunk([(start, start + max_len)], gap))
+            start += max_len
+        if current and length + gap + end - start > max_len:
+            chunks.append(SpeechChunk(current, gap))
+            current, length = [], 0
+        length += end - start + (gap if current else 0)
+        current.append((start, end))
+    if current:
+        chunks.append(SpeechChunk(current, gap))
+    return chunks
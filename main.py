@@ -1,7 +1,9 @@
 # main.py
 import os
 import sys
+import time
 import warnings
+_start_time = time.perf_counter()
 warnings.filterwarnings('ignore', category=UserWarning)
 
 conda_prefix = os.environ.get('CONDA_PREFIX', '')
@@ -9,29 +11,82 @@ if conda_prefix:
     qt_plugin_path = os.path.join(conda_prefix, 'lib', 'qt6', 'plugins')
     os.environ['QT_PLUGIN_PATH'] = qt_plugin_path
 
-import shutil
+import importlib
+import subprocess
+import threading
 from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QTimer
 from UI.MainWindow import MainWindow
-import ollama
-
-def remove_pycache_dirs(path):
-    for root, dirs, files in os.walk(path):
-        if '__pycache__' in dirs:
-            pycache_path = os.path.join(root, '__pycache__')
-            try:
-                shutil.rmtree(pycache_path)
-                print(f"已刪除: {pycache_path}")
-            except Exception as e:
-                print(f"刪除 {pycache_path} 時發生錯誤: {e}")
+
+PROFILE_FLAG = "--profile-startup"
+PROFILE_CHILD_FLAG = "--profile-startup-child"
+
+# 視窗顯示後於背景預先載入的模組（依第一次使用的順序），讓第一次操作不必等待 import；
+# 設定 VOICEFLOW_WARMUP=0 可關閉
+WARMUP_MODULES = ["numpy", "opencc", "ollama", "torch", "whisper", "transformers.pipelines"]
+
+def warm_up_modules():
+    timings = []
+    for name in WARMUP_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"預先載入 {name} 失敗: {e}")
+            continue
+        timings.append((name, time.perf_counter() - start))
+    return timings
+
+def start_warm_up():
+    if os.environ.get("VOICEFLOW_WARMUP", "1") != "0":
+        threading.Thread(target=warm_up_modules, name="import-warmup", daemon=True).start()
+
+def profile_startup():
+    # 以 -X importtime 重新啟動程式，彙整各頂層模組的 import 時間（包含視窗顯示後預先載入的模組）
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), PROFILE_CHILD_FLAG],
+        stderr=subprocess.PIPE, text=True,
+    )
+    totals = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            print(line, file=sys.stderr)
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue  # 表頭或巢狀 import（已計入上層模組）
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(cumulative)
+    print("\nimport 時間（依頂層套件累計）:")
+    for package, microseconds in sorted(totals.items(), key=lambda item: -item[1])[:20]:
+        print(f"  {microseconds / 1000:9.1f} ms  {package}")
+    return result.returncode
 
 def main():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    remove_pycache_dirs(base_dir)
-    
+    if PROFILE_FLAG in sys.argv:
+        sys.exit(profile_startup())
+    profiling = PROFILE_CHILD_FLAG in sys.argv
+    if profiling:
+        sys.argv.remove(PROFILE_CHILD_FLAG)
+        print(f"載入 PyQt6 與主視窗模組: {(time.perf_counter() - _start_time) * 1000:.1f} ms")
+
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+
+    def on_shown():
+        if not profiling:
+            start_warm_up()
+            return
+        print(f"視窗顯示: {(time.perf_counter() - _start_time) * 1000:.1f} ms")
+        for name, seconds in warm_up_modules():
+            print(f"背景預先載入 {name}: {seconds * 1000:.1f} ms")
+        window.close()
+        app.quit()
+
+    # 事件迴圈開始後（視窗已繪製）才載入機器學習相關模組
+    QTimer.singleShot(0, on_shown)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
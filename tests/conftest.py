@@ -0,0 +1,7 @@
+# tests/conftest.py
+import os
+import tempfile
+
+# 測試使用獨立的快取目錄並停用指標記錄，不影響使用者的快取與 metrics.jsonl
+os.environ["VOICEFLOW_CACHE_DIR"] = tempfile.mkdtemp(prefix="voiceflow-tests-")
+os.environ["VOICEFLOW_METRICS"] = "0"
@@ -0,0 +1,69 @@
+# tests/test_asr_backends.py
+import os
+
+import numpy as np
+import pytest
+
+from function.asr_backends import BACKENDS, SAMPLE_RATE, ASRBackend, ASRModel, get_backend
+from function.model_prefetch import whisper_cache_dir
+from function.quantization import resolve_precision
+
+
+def synthetic_speech():
+    """兩段 220 Hz 的音調，前後與中間是靜音，共 6 秒"""
+    t = np.arange(int(1.5 * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    return np.concatenate([silence, tone, silence, silence, tone[: SAMPLE_RATE], silence])
+
+
+def load_model(name):
+    backend = BACKENDS[name]
+    if not backend.is_available():
+        pytest.skip(f"未安裝 {backend.requires}")
+    if name == "whisper" and not os.path.exists(os.path.join(whisper_cache_dir(), "tiny.pt")):
+        pytest.skip("沒有 Whisper tiny 的權重（測試環境不下載）")
+    try:
+        return backend.load("tiny", "cpu", "fp32")
+    except Exception as e:
+        pytest.skip(f"無法載入 {name} tiny: {e}")
+
+
+@pytest.mark.parametrize("name", ["fake", "whisper", "faster-whisper"])
+def test_backends_return_the_same_result_shape(name):
+    model = load_model(name)
+    audio = synthetic_speech()
+    result = model.transcribe(audio, language="en")
+    assert set(result) == {"text", "segments", "language"}
+    assert isinstance(result["text"], str)
+    assert result["language"] == "en"
+    for i, seg in enumerate(result["segments"]):
+        assert set(seg) == {"id", "start", "end", "text"}
+        assert seg["id"] == i
+        assert isinstance(seg["start"], float) and isinstance(seg["end"], float)
+        assert 0 <= seg["start"] <= seg["end"] <= len(audio) / SAMPLE_RATE + 0.5
+    if name == "fake":
+        # 以能量 VAD 找出兩段音調（區段前後保留少量邊界）
+        [first, second] = result["segments"]
+        assert first["start"] <= 1.0 and 2.5 <= first["end"] < second["start"] <= 4.5 and 5.5 <= second["end"]
+    # 音訊短於一個視窗時，逐段產生的片段與一次解碼的結果相同（不含空白片段，id 重新編號）
+    streamed = list(model.stream_segments(audio, language="en"))
+    expected = [seg for seg in result["segments"] if seg["text"].strip()]
+    assert [(seg["start"], seg["end"], seg["text"]) for seg in streamed] == \
+        [(seg["start"], seg["end"], seg["text"]) for seg in expected]
+    assert [seg["id"] for seg in streamed] == list(range(len(streamed)))
+
+
+def test_interfaces_are_abstract():
+    with pytest.raises(TypeError):
+        ASRModel(None, "tiny")
+    with pytest.raises(TypeError):
+        ASRBackend()
+
+
+def test_fp16_is_only_used_on_cuda():
+    whisper = get_backend("whisper")
+    assert whisper.resolve_precision("fp16", "cpu") == "fp32"
+    assert whisper.resolve_precision("fp16", "cuda") == "fp16"
+    assert resolve_precision("fp16", 0) == "fp16"
+    assert resolve_precision("fp16", -1) == "fp32"
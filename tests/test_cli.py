@@ -0,0 +1,95 @@
+# tests/test_cli.py
+import json
+import time
+import wave
+
+import numpy as np
+
+from voiceflow.cli import load_completed, load_records, main
+
+
+def write_wav(path, seconds=2.0, rate=16000):
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def run(*args):
+    return main([*map(str, args), "--asr-backend", "fake", "--model", "tiny", "--progress", "none"])
+
+
+def test_resume_reruns_failed_files_without_duplicate_records(tmp_path):
+    good, broken = tmp_path / "a.wav", tmp_path / "b.wav"
+    write_wav(good)
+    broken.write_bytes(b"not audio")
+    output = tmp_path / "results.jsonl"
+    assert run(good, broken, "-o", output) == 1
+    assert [bool(r["errors"]) for r in read_lines(output)] == [False, True]
+
+    write_wav(broken)
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"file": "中斷時寫到一半')
+    assert run(good, broken, "-o", output, "--resume") == 0
+    records = read_lines(output)
+    assert [r["file"] for r in records] == [str(good), str(broken)]
+    assert all(not r["errors"] and r["transcription"] is not None for r in records)
+    assert load_completed(str(output), ["transcription"]) == {str(good), str(broken)}
+
+
+def test_last_record_wins(tmp_path):
+    output = tmp_path / "results.jsonl"
+    lines = [
+        {"file": "a.wav", "errors": {"transcription": "失敗"}},
+        {"file": "b.wav", "errors": {}, "transcription": "b"},
+        {"file": "a.wav", "errors": {}, "transcription": "a"},
+    ]
+    output.write_text("".join(json.dumps(line) + "\n" for line in lines), encoding="utf-8")
+    assert list(load_records(str(output))) == ["b.wav", "a.wav"]
+    assert load_completed(str(output), ["transcription"]) == {"a.wav", "b.wav"}
+    assert load_completed(str(output), ["transcription", "translation"]) == set()
+
+
+def test_interrupted_batch_exits_130_and_can_be_resumed(tmp_path, monkeypatch):
+    import _thread
+
+    from function.SpeechTranslator import SpeechTranslator
+    from voiceflow.cli import BatchRunner
+
+    files = [tmp_path / f"{i}.wav" for i in range(6)]
+    for path in files:
+        write_wav(path, seconds=1.0)
+    output = tmp_path / "results.jsonl"
+
+    speech_to_text = SpeechTranslator.speech_to_text
+
+    def slow_speech_to_text(self, audio_file, *args, **kwargs):
+        time.sleep(0.2)
+        return speech_to_text(self, audio_file, *args, **kwargs)
+
+    finish_stage = BatchRunner.finish_stage
+
+    def interrupt_after_first_file(self, *args, **kwargs):
+        finish_stage(self, *args, **kwargs)
+        if self.succeeded == 1:
+            _thread.interrupt_main()  # 等同在終端機按下 Ctrl-C
+
+    monkeypatch.setattr(SpeechTranslator, "speech_to_text", slow_speech_to_text)
+    monkeypatch.setattr(BatchRunner, "finish_stage", interrupt_after_first_file)
+    assert run(tmp_path, "-o", output) == 130
+    done = read_lines(output)
+    assert 1 <= len(done) < len(files)
+
+    monkeypatch.setattr(BatchRunner, "finish_stage", finish_stage)
+    assert run(tmp_path, "-o", output, "--resume") == 0
+    records = read_lines(output)
+    assert sorted(r["file"] for r in records) == sorted(str(path) for path in files)
+    assert records[:len(done)] == done
@@ -0,0 +1,116 @@
+# tests/test_metrics.py
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from function.metrics import MetricsRecorder, WorkerMetricsListener
+
+
+def _init_worker(directory, metrics_queue):
+    os.environ["VOICEFLOW_METRICS"] = "1"
+    os.environ["VOICEFLOW_METRICS_DIR"] = directory
+    from function.metrics import forward_worker_metrics
+    forward_worker_metrics(metrics_queue)
+
+
+def _record_in_worker(_):
+    from function.metrics import get_metrics
+    get_metrics().record("speech_to_text", 1.0, audio_seconds=10.0)
+    return os.getpid()
+
+
+def test_prometheus_file_is_throttled_and_flushed(tmp_path):
+    path = tmp_path / "metrics.prom"
+    recorder = MetricsRecorder(prometheus_path=str(path), prometheus_interval=0.5)
+    recorder.record("speech_to_text", 1.0)
+    time.sleep(0.2)
+    assert 'voiceflow_operation_seconds_count{operation="speech_to_text"} 1' in path.read_text(encoding="utf-8")
+    for _ in range(5):
+        recorder.record("speech_to_text", 1.0)
+    # 上次寫入後不到 0.5 秒，新的事件尚未寫入
+    assert 'voiceflow_operation_seconds_count{operation="speech_to_text"} 1' in path.read_text(encoding="utf-8")
+    recorder.flush()
+    assert 'voiceflow_operation_seconds_count{operation="speech_to_text"} 6' in path.read_text(encoding="utf-8")
+
+
+def test_concurrent_writers_do_not_share_temp_files(tmp_path):
+    path = tmp_path / "metrics.prom"
+    recorders = [MetricsRecorder(prometheus_path=str(path)) for _ in range(4)]
+    for recorder in recorders:
+        recorder.record("translate_text", 0.1)
+    errors = []
+
+    def write(recorder):
+        for _ in range(50):
+            try:
+                recorder.write_prometheus()
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(r,)) for r in recorders for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for recorder in recorders:
+        recorder.flush()
+    assert errors == []
+    assert os.listdir(tmp_path) == ["metrics.prom"]
+    assert path.read_text(encoding="utf-8").endswith("\n")
+
+
+def test_log_records_events(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    recorder = MetricsRecorder(log_path=str(path))
+    with recorder.timer("speech_to_text", audio_seconds=10.0) as info:
+        info["cache_hit"] = True
+    [event] = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert event["operation"] == "speech_to_text"
+    assert event["cache_hit"] is True
+    assert event["pid"] == os.getpid()
+    assert "rtf" in event
+
+
+def test_worker_events_are_forwarded_to_the_main_log(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    recorder = MetricsRecorder(log_path=str(path))
+    context = multiprocessing.get_context("spawn")
+    listener = WorkerMetricsListener(context, recorder, linger=0.5)
+    pool = context.Pool(2, initializer=_init_worker, initargs=(str(tmp_path), listener.queue))
+    pids = pool.map(_record_in_worker, range(4), chunksize=1)
+    # 正常結束（而非 terminate）的工作程序會先送出佇列中的事件
+    pool.close()
+    pool.join()
+    listener.close(wait=True)
+    # 工作程序不建立自己的檔案，事件都寫入主程序的日誌並計入累計統計
+    assert os.listdir(tmp_path) == ["metrics.jsonl"]
+    events = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert sorted(event["pid"] for event in events) == sorted(pids)
+    assert recorder.snapshot()["speech_to_text"].count == 4
+    assert "辨識 4 次" in recorder.format_summary()
+
+
+def test_current_rss_bytes_without_proc(monkeypatch):
+    import builtins
+    import types
+
+    from function import metrics
+
+    real_open = builtins.open
+
+    def open_without_proc(path, *args, **kwargs):
+        if str(path).startswith("/proc/"):
+            raise OSError("no /proc")
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", open_without_proc)
+    process = types.SimpleNamespace(memory_info=lambda: types.SimpleNamespace(rss=123 * 2**20))
+    monkeypatch.setitem(sys.modules, "psutil", types.SimpleNamespace(Process=lambda: process))
+    assert metrics.current_rss_bytes() == 123 * 2**20
+    # 沒有 psutil、也不是 macOS 或 Windows 時無法取得
+    monkeypatch.setitem(sys.modules, "psutil", None)
+    monkeypatch.setattr(metrics.sys, "platform", "sunos5")
+    assert metrics.current_rss_bytes() == 0
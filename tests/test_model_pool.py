@@ -0,0 +1,157 @@
+# tests/test_model_pool.py
+import threading
+import time
+
+import pytest
+
+from function.model_pool import ModelBudgetError, ModelPool, ResourceManager
+
+MB = 2**20
+
+
+class Dummy:
+    """大小已知的假模型"""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+
+def make_pool(manager, name="whisper", estimate=True):
+    # key 為 (模型名稱, 位元組數)；estimate=False 時載入前估算為 0，只能在載入後以 enforce_budget 修正
+    pool = ModelPool(Dummy, size_fn=lambda model: model.size, name=name,
+                     estimate_fn=(lambda model_name, size: size) if estimate else None)
+    return manager.register(pool)
+
+
+def loaded(manager):
+    return sorted((entry["pool"], entry["key"][0]) for entry in manager.loaded_models())
+
+
+def use(pool, *key):
+    # 確保最後使用時間依呼叫順序遞增
+    time.sleep(0.01)
+    return pool.get(*key)
+
+
+def test_admit_evicts_least_recently_used_idle_models_across_pools():
+    manager = ResourceManager(max_bytes=300 * MB)
+    whisper = make_pool(manager, "whisper")
+    translation = make_pool(manager, "translation")
+    use(whisper, "small", 100 * MB)
+    use(translation, "en-zh", 100 * MB)
+    use(whisper, "base", 100 * MB)
+    use(whisper, "small", 100 * MB)  # small 變成最近使用
+    use(translation, "en-ja", 150 * MB)
+    # 需要 150 MB：依 LRU 先逐出 en-zh，再逐出 base
+    assert loaded(manager) == [("translation", "en-ja"), ("whisper", "small")]
+    assert manager.total_bytes() == 250 * MB
+    assert whisper.evictions == 1 and translation.evictions == 1
+
+
+def test_enforce_budget_corrects_underestimated_models():
+    manager = ResourceManager(max_bytes=300 * MB)
+    pool = make_pool(manager, estimate=False)
+    use(pool, "tiny", 100 * MB)
+    use(pool, "base", 100 * MB)
+    # 載入前估算為 0，載入後實際 200 MB：逐出最久未使用的 tiny，剛載入的 large 保留
+    use(pool, "large", 200 * MB)
+    assert loaded(manager) == [("whisper", "base"), ("whisper", "large")]
+    assert manager.total_bytes() <= manager.max_bytes
+
+
+def test_held_models_are_never_evicted():
+    manager = ResourceManager(max_bytes=300 * MB, queue_timeout=0.3)
+    pool = make_pool(manager)
+    with pool.hold("tiny", 100 * MB):
+        use(pool, "tiny", 100 * MB)
+        use(pool, "base", 100 * MB)
+        use(pool, "small", 200 * MB)
+        # tiny 最久未使用，但使用中，因此逐出 base
+        assert loaded(manager) == [("whisper", "small"), ("whisper", "tiny")]
+        with pool.hold("small", 200 * MB):
+            # 所有模型都在使用中：等待 queue_timeout 後放棄，已載入的模型不受影響
+            with pytest.raises(ModelBudgetError):
+                use(pool, "medium", 100 * MB)
+            assert loaded(manager) == [("whisper", "small"), ("whisper", "tiny")]
+    assert pool.loaded_models()[0]["in_use"] is False
+
+
+def test_waiting_load_proceeds_when_a_held_model_is_released():
+    manager = ResourceManager(max_bytes=200 * MB, queue_timeout=10)
+    pool = make_pool(manager)
+    result = {}
+
+    def load():
+        result["model"] = pool.get("medium", 150 * MB)
+
+    with pool.hold("small", 150 * MB):
+        pool.get("small", 150 * MB)
+        thread = threading.Thread(target=load)
+        thread.start()
+        time.sleep(0.3)
+        assert "model" not in result
+    thread.join(5)
+    assert result["model"].name == "medium"
+    assert loaded(manager) == [("whisper", "medium")]
+
+
+def test_unload_idle_respects_idle_timeout():
+    manager = ResourceManager(idle_timeout=0.3)
+    pool = make_pool(manager)
+    use(pool, "tiny", MB)
+    use(pool, "base", MB)
+    with pool.hold("base", MB):
+        time.sleep(0.35)
+        use(pool, "small", MB)
+        # tiny 閒置超過 0.3 秒；base 使用中；small 剛使用
+        assert manager.unload_idle() == [("whisper", ("tiny", MB))]
+    # base 釋放時更新最後使用時間，重新計算閒置時間
+    assert manager.unload_idle() == []
+    time.sleep(0.35)
+    assert sorted(key for _, key in manager.unload_idle()) == [("base", MB), ("small", MB)]
+    assert manager.loaded_models() == []
+
+
+def test_unload_idle_is_disabled_without_timeout():
+    manager = ResourceManager()
+    pool = make_pool(manager)
+    pool.get("tiny", MB)
+    assert manager.unload_idle() == []
+    assert pool.contains("tiny", MB)
+
+
+def test_concurrent_requests_load_a_key_once_and_do_not_keep_its_lock():
+    calls = []
+
+    def slow_loader(name, size):
+        calls.append(name)
+        time.sleep(0.2)
+        return Dummy(name, size)
+
+    pool = ModelPool(slow_loader, size_fn=lambda model: model.size)
+    results = []
+    barrier = threading.Barrier(2)
+
+    def via_get():
+        barrier.wait()
+        results.append(pool.get("small", MB))
+
+    def via_hold():
+        barrier.wait()
+        with pool.hold("small", MB):
+            results.append(pool.get("small", MB))
+
+    threads = [threading.Thread(target=via_get), threading.Thread(target=via_hold)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert calls == ["small"]
+    assert len(results) == 2 and results[0] is results[1]
+    assert pool.stats()["misses"] == 1
+    # 載入完成後不保留每個 key 的鎖：反覆載入、卸載不同的模型時鎖的數量不會增加
+    for i in range(20):
+        pool.get(f"model-{i}", MB)
+        pool.discard(f"model-{i}", MB)
+    assert pool._key_locks == {}
@@ -0,0 +1,184 @@
+# tests/test_model_prefetch.py
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from function.model_prefetch import DownloadJob, ModelPrefetcher
+
+REPO_ID = "Helsinki-NLP/opus-mt-en-zh"
+COMMIT = "0123456789abcdef0123456789abcdef01234567"
+FILES = {
+    "config.json": b'{"model_type": "marian"}',
+    "vocab.json": b'{"<pad>": 0}',
+    "source.spm": b"spm" * 100,
+    "target.spm": b"spm" * 120,
+    "model.safetensors": b"weights" * 5000,
+    "tf_model.h5": b"unused" * 100,
+}
+
+
+class StubHub:
+    """模擬 Hugging Face Hub 的 /api/models 與 /resolve 端點，並記錄收到的請求"""
+
+    def __init__(self, files=FILES, corrupt=()):
+        self.files = dict(files)
+        self.corrupt = set(corrupt)
+        self.requests = []
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body, head, headers=()):
+                self.send_response(200)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+            def _handle(self, head):
+                hub.requests.append((self.command, self.path))
+                path = self.path.split("?")[0]
+                if path.startswith("/api/models/"):
+                    self._send(json.dumps(hub.model_info()).encode(), head)
+                    return
+                body = hub.files[path.rsplit("/", 1)[-1]]
+                if path.rsplit("/", 1)[-1] in hub.corrupt:
+                    body = body[::-1]
+                self._send(body, head, [("X-Repo-Commit", COMMIT), ("ETag", f'"{hashlib.sha256(body).hexdigest()}"')])
+
+            def do_GET(self):
+                self._handle(False)
+
+            def do_HEAD(self):
+                self._handle(True)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+
+    def model_info(self):
+        siblings = []
+        for name, body in self.files.items():
+            lfs = None
+            if name.endswith((".safetensors", ".h5")):
+                lfs = {"sha256": hashlib.sha256(body).hexdigest(), "size": len(body), "pointerSize": 134}
+            blob_id = hashlib.sha1(b"blob %d\0" % len(body) + body).hexdigest()
+            siblings.append({"rfilename": name, "size": len(body), "blobId": blob_id, "lfs": lfs})
+        return {"id": REPO_ID, "modelId": REPO_ID, "sha": COMMIT, "siblings": siblings}
+
+    @property
+    def url(self):
+        return "http://%s:%d" % self._server.server_address[:2]
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def prefetch(hub, cache_dir):
+    prefetcher = ModelPrefetcher(hf_endpoint=hub.url, hf_cache_dir=str(cache_dir))
+    job = prefetcher.prefetch_translation("en", "zh")
+    job.wait(30)
+    prefetcher.shutdown()
+    return prefetcher, job
+
+
+def test_downloads_weights_config_and_vocabulary(tmp_path):
+    with StubHub() as hub:
+        prefetcher, job = prefetch(hub, tmp_path)
+    assert job.error is None
+    wanted = [name for name in FILES if name != "tf_model.h5"]
+    assert job.completed == job.total == sum(len(FILES[name]) for name in wanted)
+    downloaded = [path.rsplit("/", 1)[-1] for method, path in hub.requests if method == "GET" and "/resolve/" in path]
+    # 權重最後下載
+    assert sorted(downloaded) == sorted(wanted)
+    assert downloaded[-1] == "model.safetensors"
+    snapshot = prefetcher.cached_hf_snapshot(REPO_ID)
+    for name in wanted:
+        with open(os.path.join(snapshot, name), "rb") as f:
+            assert f.read() == FILES[name]
+
+
+def test_hub_downloads_share_the_bandwidth_limit_and_report_byte_progress(tmp_path):
+    wanted = [name for name in FILES if name != "tf_model.h5"]
+    total = sum(len(FILES[name]) for name in wanted)
+    boundaries = {sum(len(FILES[name]) for name in wanted[:i]) for i in range(len(wanted) + 1)}
+    progress = []
+    with StubHub() as hub:
+        prefetcher = ModelPrefetcher(max_bytes_per_second=total / 0.5, chunk_size=1024, hf_endpoint=hub.url,
+                                     hf_cache_dir=str(tmp_path))
+        prefetcher.add_listener(lambda job: progress.append(job.completed))
+        start = time.perf_counter()
+        job = prefetcher.prefetch_translation("en", "zh")
+        assert job.wait(30)
+        elapsed = time.perf_counter() - start
+        prefetcher.shutdown()
+    # 約 0.5 秒的額度（token bucket 一開始是空的）
+    assert elapsed >= 0.4
+    assert progress == sorted(progress)
+    assert progress[-1] == job.total == total
+    # 進度在檔案下載途中也會更新，而不是每個檔案完成時才跳一次
+    assert any(completed not in boundaries for completed in progress)
+
+
+def test_cached_model_does_not_contact_the_hub(tmp_path):
+    with StubHub() as hub:
+        prefetch(hub, tmp_path)
+        hub.requests.clear()
+        _, job = prefetch(hub, tmp_path)
+    assert job.error is None
+    assert job.completed == job.total > 0
+    assert hub.requests == []
+
+
+def test_incomplete_cache_is_downloaded_again(tmp_path):
+    with StubHub() as hub:
+        prefetcher, _ = prefetch(hub, tmp_path)
+        # 模擬權重下載到一半中斷：快照與 blob 中都沒有權重
+        weights = os.path.join(prefetcher.cached_hf_snapshot(REPO_ID), "model.safetensors")
+        os.remove(os.path.realpath(weights))
+        os.remove(weights)
+        assert prefetcher.cached_hf_snapshot(REPO_ID) is None
+        hub.requests.clear()
+        prefetcher, job = prefetch(hub, tmp_path)
+    assert job.error is None
+    assert any(path.endswith("/model.safetensors") for method, path in hub.requests if method == "GET")
+    assert prefetcher.cached_hf_snapshot(REPO_ID) is not None
+
+
+def test_rejects_weights_with_wrong_sha256(tmp_path):
+    with StubHub(corrupt={"model.safetensors"}) as hub:
+        _, job = prefetch(hub, tmp_path)
+    assert isinstance(job.error, IOError)
+    assert "SHA-256" in str(job.error)
+
+
+def test_download_url_verifies_and_reuses_file(tmp_path):
+    body = FILES["model.safetensors"]
+    sha256 = hashlib.sha256(body).hexdigest()
+    path = str(tmp_path / "whisper" / "small.pt")
+    with StubHub() as hub:
+        prefetcher = ModelPrefetcher(chunk_size=1024)
+        url = f"{hub.url}/openai/whisper/resolve/main/model.safetensors"
+        job = DownloadJob(("whisper", "small"), "Whisper small")
+        assert prefetcher.download_url(job, url, path, sha256) == path
+        assert job.completed == job.total == len(body)
+        hub.requests.clear()
+        prefetcher.download_url(DownloadJob(("whisper", "small"), "Whisper small"), url, path, sha256)
+        assert hub.requests == []
+        with pytest.raises(IOError):
+            prefetcher.download_url(job, url, str(tmp_path / "other.pt"), "0" * 64)
+    assert not os.path.exists(tmp_path / "other.pt")
+    assert not os.path.exists(tmp_path / "other.pt.part")
@@ -0,0 +1,161 @@
+# tests/test_ollama_client.py
+import asyncio
+import threading
+import time
+
+import ollama
+import pytest
+
+from benchmarks.ollama_stub import StubOllamaServer
+from function.ollama_client import AsyncOllamaClient, OllamaClient
+
+MODEL = "stub:latest"
+
+
+def make_client(server, **kwargs):
+    return AsyncOllamaClient(preferred_model=MODEL, use_cache=False, host=server.url, **kwargs)
+
+
+def test_retries_busy_server_with_exponential_backoff():
+    with StubOllamaServer(latency=0.01, fail_first=2) as server:
+        client = make_client(server, retries=3, backoff=0.1)
+        start = time.perf_counter()
+        [(key, summary, error)] = client.summarize_all([("a", "第一段內容")])
+        elapsed = time.perf_counter() - start
+    assert error is None
+    assert summary == "摘要：第一段內容"
+    assert server.requests == 3
+    # 兩次重試前分別等待 0.1 與 0.2 秒
+    assert elapsed >= 0.3
+
+
+def test_gives_up_after_retries():
+    with StubOllamaServer(latency=0.01, fail_first=10) as server:
+        client = make_client(server, retries=1, backoff=0.01)
+        [(key, summary, error)] = client.summarize_all([("a", "內容")])
+    assert summary is None
+    assert isinstance(error, ollama.ResponseError)
+    assert error.status_code == 503
+    assert server.requests == 2
+
+
+def test_request_timeout():
+    with StubOllamaServer(latency=3) as server:
+        client = make_client(server, request_timeout=0.2, retries=0)
+        start = time.perf_counter()
+        [(key, summary, error)] = client.summarize_all([("a", "內容")])
+        elapsed = time.perf_counter() - start
+    assert isinstance(error, asyncio.TimeoutError)
+    assert elapsed < 2
+
+
+def test_summarize_many_yields_in_completion_order():
+    class Server(StubOllamaServer):
+        def latency_for(self, prompt):
+            return 0.6 if "慢" in prompt else 0.05
+
+    items = [("slow", "慢的內容"), ("fast1", "快的內容一"), ("fast2", "快的內容二")]
+    with Server() as server:
+        client = make_client(server, max_in_flight=2)
+        results = client.summarize_all(items)
+    assert [key for key, _, _ in results] == ["fast1", "fast2", "slow"]
+    assert {key: summary for key, summary, _ in results} == {key: f"摘要：{text}" for key, text in items}
+    assert server.max_in_flight <= 2
+
+
+def test_blocking_lookups_do_not_stall_the_event_loop():
+    class SlowCatalogClient(AsyncOllamaClient):
+        def select_model(self, model_name):
+            time.sleep(0.3)
+            return super().select_model(model_name)
+
+    with StubOllamaServer(latency=0.01) as server:
+        client = SlowCatalogClient(preferred_model=MODEL, use_cache=False, host=server.url)
+        start = time.perf_counter()
+        results = client.summarize_all([(i, f"內容{i}") for i in range(4)])
+        elapsed = time.perf_counter() - start
+    assert all(error is None for _, _, error in results)
+    # 模型清單的查詢在執行緒池中同時進行，而不是依序阻塞 4 × 0.3 秒
+    assert elapsed < 1.0
+
+
+def test_cancel_stops_pending_summaries():
+    with StubOllamaServer(latency=3) as server:
+        client = make_client(server)
+        cancel_event = threading.Event()
+        threading.Timer(0.2, cancel_event.set).start()
+        start = time.perf_counter()
+        results = client.summarize_all([("a", "內容一"), ("b", "內容二")], cancel_event=cancel_event)
+        elapsed = time.perf_counter() - start
+    assert results == []
+    assert elapsed < 2
+
+
+def test_cancel_aborts_stream_before_first_token():
+    with StubOllamaServer(latency=5) as server:
+        client = OllamaClient(preferred_model=MODEL, use_cache=False, host=server.url)
+        cancel_event = threading.Event()
+        threading.Timer(0.3, cancel_event.set).start()
+        start = time.perf_counter()
+        tokens = list(client.stream_summary("內容", MODEL, cancel_event))
+        elapsed = time.perf_counter() - start
+    assert tokens == []
+    assert client.last_stream_stats["cancelled"]
+    assert elapsed < 2
+
+
+def test_warm_up_uses_the_same_num_ctx_as_short_requests():
+    with StubOllamaServer(latency=0.01, token_delay=0) as server:
+        client = OllamaClient(preferred_model=MODEL, use_cache=False, host=server.url)
+        client.warm_up(MODEL)
+        client.generate_summary("一段不長的語音內容。")
+        client.pin_model(MODEL, ["內容" * 1000])
+        client.warm_up(MODEL)
+        client.generate_summary("一段不長的語音內容。" * 2)
+        client.unpin_model(MODEL)
+    [warm, chat, pinned_warm, pinned_chat, unpin] = [options["num_ctx"] for _, _, options, _ in server.calls]
+    assert warm == chat == 2048
+    assert pinned_warm == pinned_chat == unpin == 4096
+
+
+@pytest.mark.parametrize("cancel", [False, True])
+def test_generate_summary_streams_tokens(cancel):
+    with StubOllamaServer(latency=0.01, token_delay=0.05) as server:
+        client = OllamaClient(preferred_model=MODEL, use_cache=False, host=server.url)
+        cancel_event = threading.Event()
+        tokens = []
+
+        def on_token(token):
+            tokens.append(token)
+            if cancel:
+                cancel_event.set()
+
+        summary = client.generate_summary("內容", on_token=on_token, cancel_event=cancel_event)
+    assert summary == "".join(tokens)
+    assert summary == ("摘" if cancel else "摘要：內容")
+
+
+def test_cancel_falls_back_to_the_next_chunk_without_the_abortable_transport(monkeypatch):
+    import function.abortable_http
+
+    def unavailable():
+        raise AttributeError("httpcore 介面不相容")
+
+    monkeypatch.setattr(function.abortable_http, "AbortableTransport", unavailable)
+    with StubOllamaServer(latency=0.01, token_delay=0.05) as server:
+        client = OllamaClient(preferred_model=MODEL, use_cache=False, host=server.url)
+        cancel_event = threading.Event()
+        tokens = []
+        for token in client.stream_summary("一段比較長的語音內容", MODEL, cancel_event):
+            tokens.append(token)
+            cancel_event.set()
+    assert tokens == ["摘"]
+    assert client.last_stream_stats["cancelled"]
+
+
+def test_stream_errors_are_httpx_errors():
+    import httpx
+
+    client = OllamaClient(preferred_model=MODEL, use_cache=False, host="http://127.0.0.1:9")
+    with pytest.raises(httpx.ConnectError):
+        list(client.stream_summary("內容", MODEL, threading.Event()))
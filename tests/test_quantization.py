@@ -0,0 +1,73 @@
+# tests/test_quantization.py
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+import transformers.pipelines  # noqa: E402
+
+from function import quantization  # noqa: E402
+
+
+def save_tiny_marian(path, seed):
+    torch.manual_seed(seed)
+    config = transformers.MarianConfig(
+        vocab_size=64, d_model=16, encoder_layers=1, decoder_layers=1, encoder_attention_heads=2,
+        decoder_attention_heads=2, encoder_ffn_dim=32, decoder_ffn_dim=32, max_position_embeddings=32,
+        pad_token_id=0, eos_token_id=1, decoder_start_token_id=0,
+    )
+    transformers.MarianMTModel(config).save_pretrained(str(path))
+
+
+@pytest.fixture
+def quantized_dir(tmp_path, monkeypatch):
+    if not quantization.quantization_supported():
+        pytest.skip("torch 沒有可用的量化後端")
+    monkeypatch.setenv("VOICEFLOW_QUANTIZED_DIR", str(tmp_path / "quantized"))
+    # 只測試模型的轉換與快取，不建立 tokenizer 與 pipeline
+    monkeypatch.setattr(transformers.AutoTokenizer, "from_pretrained", lambda *args, **kwargs: None)
+    monkeypatch.setattr(transformers.pipelines, "pipeline", lambda task, model, tokenizer, device: model)
+    conversions = []
+    from_pretrained = transformers.AutoModelForSeq2SeqLM.from_pretrained
+    monkeypatch.setattr(transformers.AutoModelForSeq2SeqLM, "from_pretrained",
+                        lambda name, **kwargs: conversions.append(name) or from_pretrained(name, **kwargs))
+    return tmp_path / "quantized", conversions
+
+
+def test_changed_weights_invalidate_the_quantized_cache(tmp_path, quantized_dir):
+    directory, conversions = quantized_dir
+    model_path = tmp_path / "opus-mt-test"
+    save_tiny_marian(model_path, seed=0)
+    first = quantization.load_quantized_translation(str(model_path))
+    assert len(conversions) == 1 and len(os.listdir(directory)) == 1
+    # 相同版本直接由快取建立
+    cached = quantization.load_quantized_translation(str(model_path))
+    assert len(conversions) == 1
+    for name, tensor in first.state_dict().items():
+        if isinstance(tensor, torch.Tensor):
+            assert torch.equal(tensor, cached.state_dict()[name]), name
+    # 權重更新後重新轉換，不再使用舊的快取
+    save_tiny_marian(model_path, seed=1)
+    weights = model_path / "model.safetensors"
+    os.utime(weights, ns=(os.stat(weights).st_atime_ns, os.stat(weights).st_mtime_ns + 10**9))
+    updated = quantization.load_quantized_translation(str(model_path))
+    assert len(conversions) == 2 and len(os.listdir(directory)) == 2
+    assert not torch.equal(updated.model.shared.weight, first.model.shared.weight)
+
+
+def test_hub_models_use_the_cached_snapshot_commit(tmp_path, monkeypatch):
+    from huggingface_hub import constants
+    monkeypatch.setattr(constants, "HF_HUB_CACHE", str(tmp_path))
+    repo_dir = tmp_path / "models--Helsinki-NLP--opus-mt-en-zh"
+    assert quantization._translation_revision("Helsinki-NLP/opus-mt-en-zh") is None
+    revisions = []
+    for commit in ("a" * 40, "b" * 40):
+        (repo_dir / "snapshots" / commit).mkdir(parents=True)
+        (repo_dir / "snapshots" / commit / "config.json").write_text("{}")
+        (repo_dir / "refs").mkdir(exist_ok=True)
+        (repo_dir / "refs" / "main").write_text(commit)
+        revisions.append(quantization._translation_revision("Helsinki-NLP/opus-mt-en-zh"))
+    assert revisions == ["a" * 12, "b" * 12]
+    paths = {quantization._cache_path("translation", "Helsinki-NLP/opus-mt-en-zh", r) for r in revisions}
+    assert len(paths) == 2
@@ -0,0 +1,117 @@
+# tests/test_result_cache.py
+import os
+import shutil
+import time
+import zlib
+
+from function.result_cache import ResultCache, make_key
+from function.SpeechTranslator import SpeechTranslator
+from tests.test_cli import write_wav
+from tests.test_translation_batching import StubPipeline
+
+
+def make_translator(tmp_path, pipeline, **kwargs):
+    translator = SpeechTranslator(whisper_model_name="tiny", source_lang="zh", target_lang="en",
+                                  use_translation_memory=False, asr_backend="fake", translator_device="cpu", **kwargs)
+    translator.result_cache = ResultCache(str(tmp_path / "results.sqlite"))
+    translator.translator = pipeline
+    return translator
+
+
+def test_make_key_depends_on_every_part_and_their_order():
+    key = make_key("hash", "small", "fp32", {"language": "en", "beam_size": 1})
+    assert key == make_key("hash", "small", "fp32", {"beam_size": 1, "language": "en"})
+    assert len({
+        key,
+        make_key("hash", "small", "fp32", {"language": "fr", "beam_size": 1}),
+        make_key("hash", "small", "int8-dynamic", {"language": "en", "beam_size": 1}),
+        make_key("hash", "fp32", "small", {"language": "en", "beam_size": 1}),
+        make_key("hash", "small", "fp32", {"language": "en", "beam_size": 1}, "vad"),
+    }) == 5
+
+
+def test_transcription_key_follows_content_model_and_options(tmp_path):
+    write_wav(tmp_path / "a.wav")
+    shutil.copy(tmp_path / "a.wav", tmp_path / "renamed.wav")
+    write_wav(tmp_path / "b.wav", seconds=3.0)
+    translator = make_translator(tmp_path, StubPipeline())
+    key = translator._audio_cache_key(str(tmp_path / "a.wav"))
+    # 依內容而非路徑
+    assert translator._audio_cache_key(str(tmp_path / "renamed.wav")) == key
+    assert translator._audio_cache_key(str(tmp_path / "b.wav")) != key
+    # 長音訊模式、模型、精度、解碼選項與辨識引擎都會改變 key
+    variants = {translator._audio_cache_key(str(tmp_path / "a.wav"), "vad")}
+    for name, value in [("whisper_model_name", "base"), ("whisper_precision", "int8-dynamic"),
+                        ("transcribe_options", {"language": "en"}), ("asr_backend", "whisper")]:
+        other = make_translator(tmp_path, StubPipeline())
+        setattr(other, name, value)
+        variants.add(other._audio_cache_key(str(tmp_path / "a.wav")))
+    assert key not in variants and len(variants) == 5
+
+
+def test_translation_key_includes_languages_chunking_and_precision(tmp_path):
+    pipeline = StubPipeline()
+    text = "first sentence here. second one."
+    first = make_translator(tmp_path, pipeline)
+    assert first.translate_text(text) == "T:first sentence here. second one."
+    calls = len(pipeline.batches)
+    # 相同設定直接取用快取
+    assert make_translator(tmp_path, pipeline).translate_text(text) == first.translate_text(text)
+    assert len(pipeline.batches) == calls
+    # 區塊大小、精度或語言組合不同時重新翻譯
+    make_translator(tmp_path, pipeline).translate_text(text, max_tokens=3)
+    make_translator(tmp_path, pipeline, translator_precision="int8-dynamic").translate_text(text)
+    other_lang = make_translator(tmp_path, pipeline)
+    other_lang.source_lang = "fr"
+    other_lang.translate_text(text)
+    assert len(pipeline.batches) >= calls + 3
+
+
+def test_failed_translations_are_not_cached(tmp_path):
+    text = "works fine. boom here."
+    failing = make_translator(tmp_path, StubPipeline(fail="boom"))
+    result = failing.translate_text(text)
+    # 失敗的句子以原文代替，整段結果不寫入快取
+    assert "boom here." in result
+    assert failing.result_cache.stats()["entries"] == 0
+    fixed = make_translator(tmp_path, StubPipeline())
+    assert fixed.translate_text(text) == "T:works fine. boom here."
+    assert fixed.result_cache.stats()["entries"] == 1
+
+
+def test_evicts_least_recently_accessed_entries(tmp_path):
+    value = "x" * 400
+    size = len(zlib.compress(value.encode("utf-8")))  # 上限以壓縮後的大小計算
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_bytes=size * 4, evict_every=1)
+    for i in range(4):
+        cache.put("ns", f"k{i}", value)
+        time.sleep(0.01)
+    assert cache.get("ns", "k0") == value  # k0 變成最近存取
+    time.sleep(0.01)
+    cache.put("ns", "k4", value)
+    # 超過上限：逐出到上限的 90%，依存取時間先逐出 k1、k2
+    remaining = {key for key in ["k0", "k1", "k2", "k3", "k4"] if cache.contains("ns", key)}
+    assert remaining == {"k0", "k3", "k4"}
+    assert cache.stats()["total_bytes"] <= cache.max_bytes * ResultCache.EVICT_TARGET
+
+
+def test_eviction_is_checked_every_n_writes(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_bytes=10**6, evict_every=5)
+    checks = []
+    original = cache._evict
+    cache._evict = lambda conn: (checks.append(1), original(conn))
+    for i in range(12):
+        cache.put("ns", f"k{i}", "value")
+    cache.put_many("ns", [(f"m{i}", "value") for i in range(3)])
+    assert len(checks) == 3
+    # 單次寫入超過上限的 5% 時立即檢查
+    cache.put("ns", "big", os.urandom(120000).hex())
+    assert len(checks) == 4
+
+
+def test_shrinking_the_limit_evicts_when_opened(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(path)
+    cache.put_many("ns", [(f"k{i}", f"value {i}") for i in range(50)])
+    total = cache.stats()["total_bytes"]
+    assert ResultCache(path, max_bytes=total // 2).stats()["total_bytes"] <= total // 2
@@ -0,0 +1,60 @@
+# tests/test_stage_pipeline.py
+import threading
+import time
+
+import pytest
+
+from function.stage_pipeline import StagePipeline
+
+
+def make_pipeline(child_delay=0.2):
+    pipeline = StagePipeline(queue_size=1)
+    pipeline.add_stage("root", lambda item: item)
+    pipeline.add_stage("child", lambda value: time.sleep(child_delay) or value, after="root")
+    return pipeline
+
+
+def run_in_thread(pipeline, items, **callbacks):
+    outcome = {}
+
+    def target():
+        try:
+            pipeline.run(items, **callbacks)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive(), "StagePipeline.run 沒有返回"
+    return outcome.get("error")
+
+
+def test_runs_every_item_through_every_stage():
+    results = []
+    pipeline = make_pipeline(child_delay=0)
+    assert run_in_thread(pipeline, range(20), on_result=lambda item, stage, result: results.append((stage, item))) is None
+    assert sorted(results) == sorted([("root", i) for i in range(20)] + [("child", i) for i in range(20)])
+
+
+@pytest.mark.parametrize("error_type", [RuntimeError, KeyboardInterrupt])
+def test_run_returns_when_the_item_iterator_raises_while_workers_are_blocked(error_type):
+    def items():
+        yield from range(10)
+        time.sleep(0.3)  # 根階段的工作執行緒此時卡在寫入已滿的下游佇列
+        raise error_type("中斷")
+
+    error = run_in_thread(make_pipeline(), items())
+    assert isinstance(error, error_type)
+
+
+def test_stage_errors_skip_only_downstream_stages():
+    errors = []
+    pipeline = StagePipeline(queue_size=1)
+    pipeline.add_stage("root", lambda item: 1 / item)
+    pipeline.add_stage("child", lambda value: value, after="root")
+    results = []
+    run_in_thread(pipeline, [1, 0, 2], on_result=lambda item, stage, result: results.append((stage, item)),
+                  on_error=lambda item, stage, error: errors.append((stage, item)))
+    assert errors == [("root", 0)]
+    assert sorted(results) == [("child", 1), ("child", 2), ("root", 1), ("root", 2)]
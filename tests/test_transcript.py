@@ -0,0 +1,61 @@
+# tests/test_transcript.py
+import pytest
+
+from function.transcript import Transcript
+
+
+def spans(transcript):
+    return [(seg["text"], seg["start"], seg["end"]) for seg in transcript.segments]
+
+
+def timed_transcript():
+    return Transcript.from_segments([{"start": 0.0, "end": 2.0, "text": "aaaa"}, {"start": 2.0, "end": 4.0, "text": "bbbb"}])
+
+
+def test_text_without_timestamps_cannot_be_exported():
+    transcript = Transcript()
+    transcript.apply_edit("Hello world.\nSecond line.")
+    assert spans(transcript) == [("Hello world.", None, None), ("Second line.", None, None)]
+    assert not transcript.has_timestamps()
+    with pytest.raises(ValueError, match="時間戳記"):
+        transcript.to_srt()
+
+
+def test_line_inserted_between_adjacent_segments_shares_the_previous_span():
+    transcript = timed_transcript()
+    assert transcript.apply_edit("aaaa\nnew\nbbbb") == [2]
+    assert spans(transcript) == [("aaaa", 0.0, 1.14), ("new", 1.14, 2.0), ("bbbb", 2.0, 4.0)]
+
+
+def test_lines_inserted_at_the_edges():
+    transcript = timed_transcript()
+    transcript.apply_edit("head\naaaa\nbbbb\ntail")
+    assert spans(transcript) == [("head", 0.0, 1.0), ("aaaa", 1.0, 2.0), ("bbbb", 2.0, 3.0), ("tail", 3.0, 4.0)]
+
+
+def test_line_inserted_into_a_gap_uses_the_gap():
+    transcript = Transcript.from_segments([{"start": 1.0, "end": 2.0, "text": "aaaa"}, {"start": 3.0, "end": 4.0, "text": "bbbb"}])
+    transcript.apply_edit("aaaa\ngap\nbbbb")
+    assert spans(transcript)[1] == ("gap", 2.0, 3.0)
+
+
+def test_exported_cues_are_never_empty_after_edits():
+    transcript = timed_transcript()
+    transcript.apply_edit("aaaa\none\ntwo\nbbbb\nthree")
+    assert transcript.has_timestamps()
+    assert all(seg["end"] > seg["start"] for seg in transcript.segments)
+    assert transcript.to_vtt().startswith("WEBVTT")
+
+
+def test_only_edited_segments_are_retranslated():
+    transcript = timed_transcript()
+    calls = []
+
+    def translate(texts):
+        calls.append(list(texts))
+        return [text.upper() for text in texts]
+
+    assert transcript.retranslate(translate) == "AAAA\nBBBB"
+    transcript.apply_edit("aaaa\nbbbb!")
+    assert transcript.retranslate(translate) == "AAAA\nBBBB!"
+    assert calls == [["aaaa", "bbbb"], ["bbbb!"]]
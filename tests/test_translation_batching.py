@@ -0,0 +1,74 @@
+# tests/test_translation_batching.py
+import pytest
+
+from function.SpeechTranslator import SpeechTranslator
+
+
+class StubTokenizer:
+    """每個字詞一個 token，再加上結尾的 </s>"""
+
+    def __call__(self, texts):
+        return {"input_ids": [[0] * (len(text.split()) + 1) for text in texts]}
+
+
+class StubPipeline:
+    """記錄每次送入的批次，譯文為「T:原文」；包含 fail 的批次拋出例外"""
+
+    def __init__(self, fail=None):
+        self.tokenizer = StubTokenizer()
+        self.fail = fail
+        self.batches = []
+
+    def __call__(self, texts, batch_size=None, max_length=None):
+        texts = [texts] if isinstance(texts, str) else texts
+        self.batches.append(list(texts))
+        if self.fail and any(self.fail in text for text in texts):
+            raise RuntimeError("模擬翻譯失敗")
+        return [{"translation_text": f"T:{text}"} for text in texts]
+
+
+def make_translator(pipeline):
+    translator = SpeechTranslator(whisper_model_name="tiny", source_lang="zh", target_lang="en", use_cache=False,
+                                  use_translation_memory=False, asr_backend="fake", translator_device="cpu")
+    translator.translator = pipeline
+    return translator
+
+
+def words(n, word="w"):
+    return " ".join(f"{word}{i}" for i in range(n)) + "."
+
+
+@pytest.mark.parametrize("max_tokens", [4, 8, 16])
+def test_pack_sentences_respects_the_token_cap_and_keeps_order(max_tokens):
+    translator = make_translator(StubPipeline())
+    sentences = [words(n, word=chr(ord("a") + i)) for i, n in enumerate([3, 1, 7, 25, 2, 15, 5])]
+    chunks = translator.pack_sentences(sentences, max_tokens)
+    assert all(n <= max_tokens for n in translator.count_tokens(chunks))
+    # 依序串接後與原文相同（沒有遺漏、重複或改變順序）
+    assert " ".join(chunks).split() == " ".join(sentences).split()
+
+
+def test_translate_batch_sorts_by_length_and_restores_order():
+    pipeline = StubPipeline()
+    translator = make_translator(pipeline)
+    chunks = [words(n, word=chr(ord("a") + i)) for i, n in enumerate([9, 2, 6, 1, 12, 4, 3])]
+    assert translator.translate_batch(chunks, batch_size=3) == [f"T:{chunk}" for chunk in chunks]
+    # 依 token 數分桶：每批最多 3 段，整體由短到長送入
+    lengths = [len(text.split()) for batch in pipeline.batches for text in batch]
+    assert lengths == sorted(lengths)
+    assert [len(batch) for batch in pipeline.batches] == [3, 3, 1]
+
+
+def test_translate_batch_keeps_positions_when_a_chunk_fails():
+    pipeline = StubPipeline(fail="boom")
+    translator = make_translator(pipeline)
+    chunks = ["c0 c1 c2.", "boom.", "a0.", "b0 b1 b2 b3 b4."]
+    assert translator.translate_batch(chunks, batch_size=2) == ["T:c0 c1 c2.", None, "T:a0.", "T:b0 b1 b2 b3 b4."]
+
+
+def test_translate_text_keeps_sentence_order():
+    pipeline = StubPipeline()
+    translator = make_translator(pipeline)
+    sentences = [words(n, word=chr(ord("a") + i)) for i, n in enumerate([10, 2, 7, 1, 4])]
+    result = translator.translate_text(" ".join(sentences), batch_size=2, max_tokens=12)
+    assert result.replace("T:", "").split() == " ".join(sentences).split()
@@ -0,0 +1,45 @@
+# tests/test_translation_memory.py
+from function.SpeechTranslator import SpeechTranslator
+from function.translation_memory import TranslationMemory
+from tests.test_translation_batching import StubPipeline
+
+
+def make_translator(memory, pipeline, **kwargs):
+    translator = SpeechTranslator(whisper_model_name="tiny", source_lang="zh", target_lang="en", use_cache=False,
+                                  asr_backend="fake", translator_device="cpu", **kwargs)
+    translator.translation_memory = memory
+    translator.translator = pipeline
+    return translator
+
+
+def test_entries_are_keyed_by_language_pair_and_precision(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.sqlite"))
+    memory.update("en", "zh", [("Hello.", "你好。")])
+    memory.update("en", "zh", [("Hello.", "哈囉。")], precision="int8-dynamic")
+    assert memory.lookup("en", "zh", ["Hello.", "Bye."]) == ["你好。", None]
+    assert memory.lookup("en", "zh", ["Hello."], precision="int8-dynamic") == ["哈囉。"]
+    assert memory.lookup("en", "ja", ["Hello."]) == [None]
+    assert memory.lookup("zh", "en", ["Hello."]) == [None]
+    assert memory.stats()["entries"] == 2
+
+
+def test_repeated_sentences_skip_the_model(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.sqlite"))
+    pipeline = StubPipeline()
+    translator = make_translator(memory, pipeline)
+    assert translator.translate_text("one. two. one.") == "T:one. T:two. T:one."
+    # 重複的句子只送入模型一次
+    assert sorted(text for batch in pipeline.batches for text in batch) == ["one.", "two."]
+    pipeline.batches.clear()
+    assert translator.translate_text("two. three.") == "T:two. T:three."
+    assert [text for batch in pipeline.batches for text in batch] == ["three."]
+
+
+def test_failed_sentences_are_not_remembered(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.sqlite"))
+    translator = make_translator(memory, StubPipeline(fail="boom"))
+    assert translator.translate_text("fine. boom.") == "T:fine. boom."
+    assert memory.lookup("zh", "en", ["fine.", "boom."]) == ["T:fine.", None]
+    translator.translator = StubPipeline()
+    assert translator.translate_text("fine. boom.") == "T:fine. T:boom."
+    assert memory.lookup("zh", "en", ["boom."]) == ["T:boom."]
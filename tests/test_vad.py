@@ -0,0 +1,73 @@
+# tests/test_vad.py
+import numpy as np
+import pytest
+
+from function.SpeechTranslator import SpeechTranslator
+from function.vad import detect_speech_regions, merge_into_chunks
+
+RATE = 16000
+
+
+def synthetic(spans, seconds):
+    """在 seconds 秒的靜音（含微弱噪音）中，於 spans 的各 (開始, 結束) 秒放入音調"""
+    rng = np.random.default_rng(0)
+    audio = (0.001 * rng.standard_normal(int(seconds * RATE))).astype(np.float32)
+    for start, end in spans:
+        t = np.arange(int((end - start) * RATE)) / RATE
+        audio[int(start * RATE) : int(start * RATE) + len(t)] += 0.3 * np.sin(2 * np.pi * 220 * t)
+    return audio
+
+
+def test_chunks_contain_only_the_voiced_regions():
+    spans = [(1, 2), (22, 24), (40, 41)]
+    audio = synthetic(spans, 45)
+    regions = detect_speech_regions(audio, RATE)
+    assert len(regions) == 3
+    [chunk] = merge_into_chunks(regions, RATE, max_chunk_seconds=30)
+    # 區段之間長達十幾秒的靜音不在區塊中：區塊長度只有語音加上兩個 0.3 秒的間隔
+    assert chunk.regions == regions
+    assert len(chunk) == sum(end - start for start, end in regions) + 2 * int(0.3 * RATE)
+    piece = chunk.extract(audio)
+    assert len(piece) == len(chunk) < 8 * RATE
+    first = regions[0][1] - regions[0][0]
+    np.testing.assert_array_equal(piece[:first], audio[regions[0][0] : regions[0][1]])
+    np.testing.assert_array_equal(piece[first : first + chunk.gap], 0)
+
+
+def test_source_time_maps_back_to_the_original_audio():
+    regions = [(1 * RATE, 2 * RATE), (22 * RATE, 24 * RATE)]
+    [chunk] = merge_into_chunks(regions, RATE, gap_seconds=0.5)
+    assert chunk.source_time(0.0, RATE) == 1.0
+    assert chunk.source_time(0.5, RATE) == 1.5
+    assert chunk.source_time(1.0, RATE) == 2.0
+    # 落在插入的靜音中：開始時間對齊下一段的開頭，結束時間對齊前一段的結尾
+    assert chunk.source_time(1.2, RATE) == 22.0
+    assert chunk.source_time(1.2, RATE, is_end=True) == 2.0
+    assert chunk.source_time(2.0, RATE) == 22.5
+    assert chunk.source_time(10.0, RATE) == 24.0
+
+
+def test_chunks_respect_the_length_limit_and_keep_order():
+    regions = [(i * 15 * RATE, (i * 15 + 5) * RATE) for i in range(10)] + [(160 * RATE, 230 * RATE)]
+    chunks = merge_into_chunks(regions, RATE, max_chunk_seconds=30)
+    assert all(len(chunk) <= 30 * RATE for chunk in chunks)
+    covered = [region for chunk in chunks for region in chunk.regions]
+    assert covered == sorted(covered)
+    assert sum(end - start for start, end in covered) == sum(end - start for start, end in regions)
+    # 5 秒的區段加上間隔，每個區塊最多 5 段；70 秒的區段切成 30、30、10 秒
+    assert [len(chunk.regions) for chunk in chunks[:2]] == [5, 5]
+    assert [len(chunk) // RATE for chunk in chunks[2:]] == [30, 30, 10]
+
+
+def test_long_audio_segments_land_on_the_original_timeline():
+    spans = [(1, 3), (25, 27), (50, 52)]
+    audio = synthetic(spans, 55)
+    translator = SpeechTranslator(whisper_model_name="tiny", use_cache=False, use_translation_memory=False,
+                                  asr_backend="fake")
+    segments = translator.transcribe_long_audio(audio)
+    assert translator.last_transcribe_stats["chunks"] == 1
+    assert translator.last_transcribe_stats["speech_seconds"] < 10
+    assert len(segments) == len(spans)
+    for segment, (start, end) in zip(segments, spans):
+        assert segment["start"] == pytest.approx(start, abs=0.5)
+        assert segment["end"] == pytest.approx(end, abs=0.5)
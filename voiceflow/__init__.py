@@ -0,0 +1,2 @@
+# voiceflow/__init__.py
+# 命令列入口（python -m voiceflow），不依賴 PyQt6，可在沒有圖形介面的伺服器或排程中執行
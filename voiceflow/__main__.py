@@ -0,0 +1,6 @@
+# voiceflow/__main__.py
+import sys
+from voiceflow.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
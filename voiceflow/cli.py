@@ -0,0 +1,342 @@
+# voiceflow/cli.py
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+from function.asr_backends import BACKENDS
+from function.quantization import PRECISIONS, default_precision
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a")
+# 命令列的階段名稱對應到結果欄位（與 MainWindow.results 的 key 相同）
+STAGES = {"transcribe": "transcription", "translate": "translation", "summarize": "summary"}
+
+
+def collect_files(inputs, recursive=True):
+    """
+    展開輸入的目錄、glob 樣式與檔案路徑
+
+    Args:
+        inputs (list): 目錄、glob 樣式（支援 **）或檔案路徑。
+        recursive (bool): 目錄是否包含子目錄中的音訊檔案。
+
+    Returns:
+        list: 去除重複後的絕對路徑，依輸入順序與檔名排序。
+    """
+    files = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            for root, dirs, names in os.walk(pattern):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith(AUDIO_EXTENSIONS))
+                if not recursive:
+                    break
+        elif any(c in pattern for c in "*?["):
+            files.extend(path for path in sorted(glob.glob(pattern, recursive=True)) if os.path.isfile(path))
+        elif os.path.isfile(pattern):
+            files.append(pattern)
+        else:
+            raise FileNotFoundError(f"找不到輸入: {pattern}")
+    return list(dict.fromkeys(os.path.abspath(f) for f in files))
+
+
+def load_records(output_path):
+    """
+    讀取既有的 JSONL 結果；同一檔案有多筆記錄時以最後一筆為準
+
+    Args:
+        output_path (str): JSONL 結果檔。
+
+    Returns:
+        dict: 檔案路徑對應到其最後一筆記錄，依記錄寫入的順序排列。
+    """
+    records = {}
+    if not os.path.exists(output_path):
+        return records
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 上次中斷時寫到一半的行
+            records.pop(record["file"], None)
+            records[record["file"]] = record
+    return records
+
+
+def load_completed(output_path, result_keys, records=None):
+    """讀取既有的 JSONL 結果（或已讀取的 records），回傳所有要求的階段都已成功完成的檔案；以每個檔案的最後一筆記錄為準"""
+    if records is None:
+        records = load_records(output_path)
+    return {file_path for file_path, record in records.items()
+            if not record.get("errors") and all(record.get(key) is not None for key in result_keys)}
+
+
+def rewrite_results(output_path, records):
+    """
+    以 records 取代結果檔的內容（先寫入暫存檔再改名，中斷時不會留下不完整的結果檔）
+
+    Args:
+        output_path (str): JSONL 結果檔。
+        records (iterable): 要保留的記錄。
+    """
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(temp_path, output_path)
+
+
+class ProgressReporter:
+    """
+    進度輸出：
+      - "text"：給人看的進度文字
+      - "jsonl"：每個事件一行 JSON（event、time 與事件欄位），供其他程式解析
+      - "none"：不輸出
+    """
+
+    def __init__(self, mode="text", stream=None):
+        self.mode = mode
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        if self.mode == "none":
+            return
+        if self.mode == "jsonl":
+            line = json.dumps({"event": event, "time": round(time.time(), 3), **fields}, ensure_ascii=False)
+        else:
+            line = self.format_text(event, fields)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    @staticmethod
+    def format_text(event, fields):
+        name = os.path.basename(fields.get("file", ""))
+        if event == "start":
+            return f"共 {fields['total']} 個檔案，略過已完成的 {fields['skipped']} 個，階段：{', '.join(fields['stages'])}"
+        if event == "file_start":
+            return f"[{fields['index']}/{fields['total']}] 開始處理 {name}"
+        if event == "stage_done":
+            return f"  {name}：{fields['stage']} 完成（{fields['seconds']:.1f} 秒）"
+        if event == "stage_error":
+            return f"  {name}：{fields['stage']} 失敗：{fields['error']}"
+        if event == "file_done":
+            return f"[{fields['completed']}/{fields['total']}] 完成 {name}"
+        if event == "finish":
+            text = f"處理完成：成功 {fields['succeeded']} 個，失敗 {fields['failed']} 個，共 {fields['seconds']:.1f} 秒"
+            return text + (f"\n  {fields['metrics']}" if fields.get("metrics") else "")
+        return f"{event}: {fields}"
+
+
+class BatchRunner:
+    """以 StagePipeline 串接辨識、翻譯與總結，每個檔案所有階段結束後寫入一行 JSONL"""
+
+    def __init__(self, args, reporter, output):
+        """
+        Args:
+            args (argparse.Namespace): 命令列參數。
+            reporter (ProgressReporter): 進度輸出。
+            output (file): 已開啟的 JSONL 輸出檔。
+        """
+        self.args = args
+        self.reporter = reporter
+        self.output = output
+        self.result_keys = [STAGES[stage] for stage in args.stages]
+        self.records = {}
+        self.started = {}
+        self.succeeded = 0
+        self.failed = 0
+        self.total = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.parallel = None
+        self.pipeline = None
+
+    def build_pipeline(self):
+        from function.SpeechTranslator import SpeechTranslator
+        from function.stage_pipeline import StagePipeline
+        args = self.args
+        translator = SpeechTranslator(
+            whisper_model_name=args.model, whisper_device=args.device,
+            whisper_precision=args.precision, translator_precision=args.precision, asr_backend=args.asr_backend,
+        )
+        if args.long_audio:
+            transcribe = lambda f: translator.speech_to_text(f, long_audio=True, workers=args.workers)
+            transcribe_workers = 1
+        elif args.workers > 1:
+            from function.parallel_transcriber import ParallelTranscriber
+            self.parallel = ParallelTranscriber(
+                args.model, workers=args.workers, whisper_device=args.device or "cpu", whisper_precision=args.precision,
+                asr_backend=args.asr_backend,
+            ).start()
+            transcribe = self.parallel.transcribe_file
+            transcribe_workers = args.workers
+        else:
+            transcribe = translator.speech_to_text
+            transcribe_workers = 1
+
+        self.pipeline = StagePipeline(queue_size=max(4, args.workers))
+        self.pipeline.add_stage("transcription", self.timed(transcribe), workers=transcribe_workers)
+        if "translate" in args.stages:
+            translator.set_translation_params(args.source_lang, args.target_lang, args.traditional)
+
+            def translate(text):
+                result = translator.translate_text(text)
+                if result is None:
+                    raise RuntimeError("翻譯失敗")
+                return result
+            self.pipeline.add_stage("translation", self.timed(translate), after="transcription")
+        if "summarize" in args.stages:
+            from function.ollama_client import OllamaClient
+            client = OllamaClient(preferred_model=args.summary_model, host=args.ollama_host)
+
+            def summarize(text):
+                result = client.generate_summary(text, args.summary_model)
+                if result.startswith(("無法生成總結", "總結生成失敗")):
+                    raise RuntimeError(result)
+                return result
+            self.pipeline.add_stage("summary", self.timed(summarize), after="transcription", workers=args.summary_workers)
+        return self.pipeline
+
+    def timed(self, fn):
+        # StagePipeline 在同一個工作執行緒中先執行階段函式再呼叫 on_result/on_error，因此以執行緒區域變數傳遞耗時
+        def run(value):
+            start = time.perf_counter()
+            try:
+                return fn(value)
+            finally:
+                self._local.seconds = time.perf_counter() - start
+        return run
+
+    def on_start(self, index, file_path):
+        with self._lock:
+            self.started[file_path] = time.perf_counter()
+            self.records[file_path] = {"file": file_path, "errors": {}}
+        self.reporter.emit("file_start", file=file_path, index=index, total=self.total)
+
+    def on_result(self, file_path, stage, result):
+        self.reporter.emit("stage_done", file=file_path, stage=stage, seconds=round(self._local.seconds, 3))
+        self.finish_stage(file_path, stage, result=result)
+
+    def on_error(self, file_path, stage, error):
+        self.reporter.emit("stage_error", file=file_path, stage=stage, error=str(error))
+        self.finish_stage(file_path, stage, error=error)
+
+    def finish_stage(self, file_path, stage, result=None, error=None):
+        with self._lock:
+            record = self.records[file_path]
+            if error is None:
+                record[stage] = result
+            else:
+                record["errors"][stage] = str(error)
+            # 辨識失敗時下游階段不會執行，直接結束此檔案
+            done = stage == "transcription" and error is not None
+            done = done or all(key in record or key in record["errors"] for key in self.result_keys)
+            if not done:
+                return
+            del self.records[file_path]
+            record["seconds"] = round(time.perf_counter() - self.started.pop(file_path), 3)
+            self.output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.output.flush()
+            if record["errors"]:
+                self.failed += 1
+            else:
+                self.succeeded += 1
+            completed = self.succeeded + self.failed
+        self.reporter.emit("file_done", file=file_path, completed=completed, total=self.total, ok=not record["errors"])
+
+    def run(self, files):
+        self.total = len(files)
+        start = time.perf_counter()
+        pipeline = self.build_pipeline()
+        try:
+            pipeline.run(files, on_start=self.on_start, on_result=self.on_result, on_error=self.on_error)
+        except KeyboardInterrupt:
+            pipeline.stop()
+            self.reporter.emit("interrupted", completed=self.succeeded + self.failed, total=self.total)
+            return 130
+        finally:
+            if self.parallel is not None:
+                self.parallel.stop()
+                self.parallel.close()
+        from function.metrics import get_metrics
+        self.reporter.emit("finish", succeeded=self.succeeded, failed=self.failed, seconds=round(time.perf_counter() - start, 3),
+                           metrics=get_metrics().format_summary())
+        return 1 if self.failed else 0
+
+
+def parse_stages(value):
+    stages = [s.strip() for s in value.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"未知的階段: {', '.join(unknown)}（可用: {', '.join(STAGES)}）")
+    # 翻譯與總結都以辨識結果為輸入，因此一定包含辨識
+    return ["transcribe"] + [s for s in ("translate", "summarize") if s in stages]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m voiceflow",
+        description="VoiceFlow 命令列批次處理：語音辨識、翻譯與總結，結果寫入 JSONL（不需要圖形介面）",
+    )
+    parser.add_argument("inputs", nargs="+", help="音訊檔案、目錄或 glob 樣式（例如 'talks/**/*.m4a'）")
+    parser.add_argument("-o", "--output", default="voiceflow_results.jsonl", help="JSONL 結果檔（預設 voiceflow_results.jsonl）")
+    parser.add_argument("--stages", type=parse_stages, default=["transcribe"],
+                        help="以逗號分隔的處理階段：transcribe,translate,summarize（預設 transcribe）")
+    parser.add_argument("--model", default="medium.en", help="Whisper 模型名稱（預設 medium.en）")
+    parser.add_argument("--asr-backend", choices=list(BACKENDS), default=None,
+                        help="語音辨識引擎：whisper、faster-whisper（需安裝 faster-whisper）或 fake（測試用；預設 VOICEFLOW_ASR_BACKEND 或 whisper）")
+    parser.add_argument("--device", default=None, help="Whisper 推論裝置（cpu、cuda；預設自動選擇）")
+    parser.add_argument("--precision", choices=PRECISIONS, default=default_precision(),
+                        help="Whisper 與翻譯模型的推論精度：fp32 或 int8-dynamic（僅 CPU；預設 VOICEFLOW_PRECISION 或 fp32）")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="平行辨識的工作程序數（預設 1）")
+    parser.add_argument("--long-audio", action="store_true", help="長音訊模式：VAD 切分並以 --workers 個程序平行解碼單一檔案")
+    parser.add_argument("--source-lang", default="en", help="原文語言代碼（預設 en）")
+    parser.add_argument("--target-lang", default="zh", help="翻譯目標語言代碼（預設 zh）")
+    parser.add_argument("--traditional", action="store_true", help="目標語言為中文時輸出繁體")
+    parser.add_argument("--summary-model", default="deepseek-r1:14b", help="Ollama 總結模型（預設 deepseek-r1:14b）")
+    parser.add_argument("--summary-workers", type=int, default=2, help="同時進行的總結請求數（預設 2）")
+    parser.add_argument("--ollama-host", default=None, help="Ollama 伺服器位址（預設 OLLAMA_HOST 或 127.0.0.1:11434）")
+    parser.add_argument("--no-recursive", action="store_true", help="目錄輸入不包含子目錄")
+    parser.add_argument("--resume", action="store_true",
+                        help="略過結果檔中已成功完成所有階段的檔案；其餘檔案的舊記錄會從結果檔移除，新結果附加到結果檔")
+    parser.add_argument("--progress", choices=["text", "jsonl", "none"], default="text",
+                        help="進度輸出格式：text（預設）、jsonl（每個事件一行 JSON）或 none")
+    parser.add_argument("--progress-file", default=None, help="進度輸出的檔案（預設 stderr）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        files = collect_files(args.inputs, recursive=not args.no_recursive)
+    except FileNotFoundError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+
+    result_keys = [STAGES[stage] for stage in args.stages]
+    records = load_records(args.output) if args.resume else {}
+    completed = load_completed(args.output, result_keys, records)
+    pending = [f for f in files if f not in completed]
+    if args.resume and os.path.exists(args.output):
+        # 移除將重新處理的檔案的舊記錄（以及重複或寫到一半的行），每個檔案在結果檔中只有一筆記錄
+        rerun = set(pending)
+        rewrite_results(args.output, [record for file_path, record in records.items() if file_path not in rerun])
+
+    progress_stream = open(args.progress_file, "a", encoding="utf-8") if args.progress_file else sys.stderr
+    try:
+        reporter = ProgressReporter(args.progress, progress_stream)
+        reporter.emit("start", total=len(pending), skipped=len(files) - len(pending), stages=result_keys, output=os.path.abspath(args.output))
+        if not pending:
+            reporter.emit("finish", succeeded=0, failed=0, seconds=0.0)
+            return 0
+        with open(args.output, "a" if args.resume else "w", encoding="utf-8") as output:
+            return BatchRunner(args, reporter, output).run(pending)
+    finally:
+        if progress_stream is not sys.stderr:
+            progress_stream.close()